@@ -1,5 +1,7 @@
 import os
 import random
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from faker import Faker
 from datetime import datetime, timedelta
 from reportlab.lib.pagesizes import A4
@@ -8,22 +10,38 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from PIL import Image, ImageDraw, ImageFont
 import numpy as np
-import pandas as pd
 from tqdm import tqdm
 
+import metadata_store
+
 # Reģistrējam Unicode fontu PDF ģenerēšanai
 pdfmetrics.registerFont(TTFont('DejaVuSans', 'DejaVuSans.ttf'))
 
-# Izveidojam mapes struktūru
-os.makedirs("invoices/pdf", exist_ok=True)
-os.makedirs("invoices/images", exist_ok=True)
-os.makedirs("invoices/dataset", exist_ok=True)
-
 # Inicializējam Faker dažādām valodām
 fake_lv = Faker('lv_LV')
 fake_en = Faker('en_US')
 fake_ru = Faker('ru_RU')
 
+# Datums, no kura tiek atskaitīti pavadzīmju datumi (fiksējams atkārtojamam korpusam)
+REFERENCE_DATE = datetime.now()
+
+# Attēlu fonts - ielādējam vienreiz katrā procesā, nevis katram attēlam
+_image_font = None
+
+# Formāts -> (mape, attēla formāts, faila numura nobīde)
+FORMATS = {
+    'pdf': ('pdf', None, 0),
+    'jpg': ('images', 'JPEG', 0),
+    'png': ('images', 'PNG', 1)   # PNG numurējam pēc JPG, kā sākotnējā korpusā (invoice_200.png...)
+}
+
+SHARD_SIZE = 500  # Dokumentu skaits vienā uzdevumā un metadatu daļā
+
+def seed_generators(seed):
+    """Fiksē random un Faker sēklu, lai korpuss būtu atkārtojams"""
+    random.seed(seed)
+    Faker.seed(seed)
+
 def generate_invoice_data(language):
     """Ģenerē pavadzīmes datus noteiktā valodā"""
     if language == 'lv':
@@ -47,7 +65,7 @@ def generate_invoice_data(language):
     
     company = fake.company()
     invoice_number = f"INV-{random.randint(1000, 9999)}-{random.randint(100, 999)}"
-    date = (datetime.now() - timedelta(days=random.randint(0, 365))).strftime("%d.%m.%Y")
+    date = (REFERENCE_DATE - timedelta(days=random.randint(0, 365))).strftime("%d.%m.%Y")
     amount = round(random.uniform(10, 10000), 2)
     
     items = []
@@ -105,15 +123,22 @@ def create_pdf_invoice(data, filename):
 
     c.save()
 
+def get_image_font():
+    """Atgriež attēlu fontu (ielādē tikai pirmajā izsaukumā)"""
+    global _image_font
+    if _image_font is None:
+        try:
+            _image_font = ImageFont.truetype("DejaVuSans.ttf", 20)
+        except:
+            _image_font = ImageFont.load_default()
+    return _image_font
+
 def create_image_invoice(data, filename, img_format='JPEG'):
     """Izveido attēla formāta pavadzīmi (JPG/PNG)"""
     img = Image.new('RGB', (800, 1200), color=(255, 255, 255))
     d = ImageDraw.Draw(img)
 
-    try:
-        font = ImageFont.truetype("DejaVuSans.ttf", 20)
-    except:
-        font = ImageFont.load_default()
+    font = get_image_font()
 
     d.text((50, 50), data['company'], fill=(0, 0, 0), font=font)
     d.text((50, 100), f"{data['invoice_text']} {data['invoice_number']}", fill=(0, 0, 0), font=font)
@@ -137,39 +162,115 @@ def create_image_invoice(data, filename, img_format='JPEG'):
 
     img.save(filename, img_format)
 
-# Ģenerējam 200 pavadzīmes katram formātam
-dataset = []
-
-print("Ģenerē PDF pavadzīmes...")
-for i in tqdm(range(200)):
-    lang = random.choice(['lv', 'en', 'ru'])
-    data = generate_invoice_data(lang)
-    pdf_path = f"invoices/pdf/invoice_{i}.pdf"
-    create_pdf_invoice(data, pdf_path)
-    data['file_path'] = pdf_path
-    data['file_type'] = 'pdf'
-    dataset.append(data)
-
-print("Ģenerē JPG pavadzīmes...")
-for i in tqdm(range(200)):
-    lang = random.choice(['lv', 'en', 'ru'])
-    data = generate_invoice_data(lang)
-    jpg_path = f"invoices/images/invoice_{i}.jpg"
-    create_image_invoice(data, jpg_path, 'JPEG')
-    data['file_path'] = jpg_path
-    data['file_type'] = 'jpg'
-    dataset.append(data)
-
-print("Ģenerē PNG pavadzīmes...")
-for i in tqdm(range(200)):
-    lang = random.choice(['lv', 'en', 'ru'])
-    data = generate_invoice_data(lang)
-    png_path = f"invoices/images/invoice_{200+i}.png"
-    create_image_invoice(data, png_path, 'PNG')
-    data['file_path'] = png_path
-    data['file_type'] = 'png'
-    dataset.append(data)
-
-df = pd.DataFrame(dataset)
-df.to_csv("invoices/dataset/invoices_metadata.csv", index=False)
-print("Visas pavadzīmes veiksmīgi ģenerētas un saglabātas!")
+# =============================================
+# PARALĒLA ĢENERĒŠANA
+# =============================================
+
+def generate_shard(file_type, start, stop, count, seed, reference_date, output_dir, first_number=0):
+    """
+    Ģenerē dokumentus [start, stop) vienam formātam un pievieno to metadatus krātuvei kā savu daļu.
+    Sēkla ir atkarīga tikai no (seed, formāts, pirmā faila numurs), tāpēc rezultāts nav atkarīgs no
+    procesu skaita, un papildināšana ar to pašu --seed neatkārto jau esošās pavadzīmes ar citiem nosaukumiem.
+    first_number: pirmais failu numurs (invoice_<numurs>) - papildinot korpusu, aiz jau esošajiem
+    """
+    global REFERENCE_DATE
+    REFERENCE_DATE = reference_date
+    folder, img_format, offset = FORMATS[file_type]
+    base = first_number + offset * count   # Šī formāta pirmā faila numurs
+    seed_generators(f"{seed}:{file_type}:{base + start}")
+
+    records = []
+    for i in range(start, stop):
+        data = generate_invoice_data(random.choice(['lv', 'en', 'ru']))
+        file_path = f"{output_dir}/{folder}/invoice_{base + i}.{file_type}"
+        if file_type == 'pdf':
+            create_pdf_invoice(data, file_path)
+        else:
+            create_image_invoice(data, file_path, img_format)
+        data['file_path'] = file_path
+        data['file_type'] = file_type
+        records.append(data)
+
+    # Daļa parādās krātuvē tikai pilnībā uzrakstīta
+    part_name = f"{file_type}_{base + start:08d}"
+    return metadata_store.append(records, metadata_path(output_dir), part_name=part_name)
+
+def metadata_path(output_dir):
+    """Korpusa metadatu krātuve (Parquet, nodalīta pēc valodas un faila tipa)"""
+    return os.path.join(output_dir, "dataset", "metadata")
+
+def next_file_number(store_path):
+    """Pirmais brīvais failu numurs (aiz lielākā invoice_<numurs> krātuvē)"""
+    number = -1
+    for path in metadata_store.read(store_path, columns=["file_path"]).column("file_path").to_pylist():
+        match = re.search(r"invoice_(\d+)\.", path or "")
+        if match:
+            number = max(number, int(match.group(1)))
+    return number + 1
+
+def generate_corpus(count=200, formats=('pdf', 'jpg', 'png'), seed=None, workers=None,
+                    output_dir="invoices", reference_date=None, shard_size=SHARD_SIZE, overwrite=False):
+    """
+    Ģenerē count pavadzīmes katram formātam procesu pūlā un atgriež metadatu krātuves ceļu.
+    Noklusēti korpuss tiek papildināts (jauni faili aiz esošajiem, metadati - jaunas daļas);
+    overwrite: numurē no 0 un pārraksta ģenerējamo formātu failus un to metadatu nodalījumus
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 32)
+        print(f"Sēkla: {seed} (atkārtošanai izmantojiet --seed {seed})")
+    reference_date = reference_date or datetime.now()
+
+    for folder in ("pdf", "images", "dataset"):
+        os.makedirs(os.path.join(output_dir, folder), exist_ok=True)
+    if overwrite:
+        # Faili tiks pārrakstīti ar tiem pašiem nosaukumiem - dzēšam tikai šo formātu metadatus
+        metadata_store.remove_parts(metadata_path(output_dir), file_types=formats)
+        first_number = 0
+    else:
+        first_number = next_file_number(metadata_path(output_dir))
+
+    tasks = [(file_type, start, min(start + shard_size, count))
+             for file_type in formats for start in range(0, count, shard_size)]
+
+    with tqdm(total=count * len(formats)) as progress:
+        if workers == 1:
+            # Bez procesu pūla (piem., ja modulis ielādēts ar importlib un nav importējams apakšprocesā)
+            for file_type, start, stop in tasks:
+                progress.update(generate_shard(file_type, start, stop, count, seed, reference_date, output_dir,
+                                               first_number))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(generate_shard, file_type, start, stop, count, seed,
+                                       reference_date, output_dir, first_number)
+                           for file_type, start, stop in tasks]
+                for future in as_completed(futures):
+                    progress.update(future.result())
+
+    return metadata_path(output_dir)
+
+# =============================================
+# GALVENĀ IZPILDES DAĻA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Sintētisku pavadzīmju ģenerēšana')
+    parser.add_argument('--count', type=int, default=200, help='Pavadzīmju skaits katram formātam')
+    parser.add_argument('--formats', nargs='+', default=list(FORMATS), choices=list(FORMATS))
+    parser.add_argument('--seed', type=int, default=None, help='Sēkla atkārtojamam korpusam')
+    parser.add_argument('--workers', type=int, default=None, help='Procesu skaits (noklusēti - CPU kodolu skaits)')
+    parser.add_argument('--output-dir', default="invoices", help='Izvades mape')
+    parser.add_argument('--reference-date', default=None,
+                        help='Datums (GGGG-MM-DD), no kura atskaita pavadzīmju datumus (noklusēti - šodiena)')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Dokumenti vienā metadatu daļā')
+    parser.add_argument('--overwrite', action='store_true',
+                        help='Pārrakstīt esošo korpusu (noklusēti jaunās pavadzīmes tiek pievienotas)')
+    args = parser.parse_args()
+
+    reference_date = datetime.strptime(args.reference_date, "%Y-%m-%d") if args.reference_date else None
+
+    print(f"Ģenerē {args.count} pavadzīmes formātiem: {', '.join(args.formats)}...")
+    store_path = generate_corpus(args.count, args.formats, args.seed, args.workers,
+                                 args.output_dir, reference_date, args.shard_size, args.overwrite)
+    print(f"Visas pavadzīmes veiksmīgi ģenerētas un saglabātas! Metadati: {store_path}")
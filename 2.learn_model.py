@@ -1,85 +1,25 @@
-import os
-import pandas as pd
-import pytesseract
-from pdf2image import convert_from_path
 import spacy
-from spacy.training.example import Example
-from sklearn.model_selection import train_test_split
-from tqdm import tqdm
-import cv2
-import numpy as np
-import random
-from PIL import Image
 
-# =============================================
-# KONFIGURĀCIJA - LABOT ATBILSTOŠI SAVAI SISTĒMAI
-# =============================================
-
-# Norādiet pilno ceļu uz Tesseract
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-
-# Norādiet pilno ceļu uz Poppler
-poppler_path = r"C:\Program Files\poppler-24.08.0\Library\bin"
-
-# OCR valodu konfigurācija
-tesseract_langs = 'lav+eng+rus'
-
-# =============================================
-# PALĪGFUNKCIJAS
-# =============================================
-
-def preprocess_image(image):
-    """Attēlu priekšapstrāde OCR uzlabošanai"""
-    # Konvertēšana uz pelēko toņu
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    
-    # Adaptīvs slieksnis
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-    
-    # Trokšņu mazināšana
-    denoised = cv2.fastNlMeansDenoising(thresh, h=10)
-    
-    return denoised
-
-def extract_text_from_file(file_path, file_type):
-    """Iegūst tekstu no PDF, JPG vai PNG faila"""
-    try:
-        if file_type.lower() == 'pdf':
-            # PDF apstrāde ar Poppler
-            images = convert_from_path(file_path, poppler_path=poppler_path)
-            full_text = ""
-            
-            for img in images:
-                img_np = np.array(img)
-                # Konvertē no RGB uz BGR (OpenCV formāts)
-                img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-                processed_img = preprocess_image(img_np)
-                text = pytesseract.image_to_string(processed_img, lang=tesseract_langs)
-                full_text += text + "\n"
-            
-            return full_text.strip()
-        
-        else:  # Attēlu formāti (JPG/PNG)
-            img = cv2.imread(file_path)
-            if img is None:
-                raise ValueError(f"Neizdevās nolasīt attēlu no {file_path}")
-                
-            processed_img = preprocess_image(img)
-            text = pytesseract.image_to_string(processed_img, lang=tesseract_langs)
-            return text.strip()
-            
-    except Exception as e:
-        print(f"Kļūda apstrādājot {file_path}: {str(e)}")
-        return ""
+from invoice_ocr import extract_texts_parallel, get_cache
+from annotation import training_entities
+from training_corpus import CORPUS_DIR, CorpusWriter, content_digest, is_stale, iter_examples
+from ner_training import CHECKPOINT_PATH, PATIENCE, evaluate, load_dev_docs, train_epochs
+from model_registry import publish
+from metadata_store import ANNOTATION_COLUMNS, DEFAULT_STORE_PATH, ensure_store, iter_records, read
 
 # =============================================
 # GALVENĀ APSTRĀDES FUNKCIJA
 # =============================================
 
-def prepare_training_data(metadata_path):
-    """Sagatavo apmācības datus no metadatu faila"""
-    # Ielādējam metadatus
-    df = pd.read_csv(metadata_path)
+def prepare_training_data(metadata_path=DEFAULT_STORE_PATH, workers=None, corpus_dir=CORPUS_DIR,
+                          languages=None, file_types=None):
+    """
+    Sagatavo apmācības datus no metadatu krātuves un pievieno tos DocBin korpusam.
+    Faili, kas jau ir korpusā ar tādu pašu saturu (kontrolsummu), netiek apstrādāti atkārtoti;
+    mainītie faili tiek anotēti no jauna un vecā anotācija vairs netiek izmantota.
+    languages/file_types - anotē tikai šo nodalījumu failus (apmācības kopu ierobežo partition_files)
+    """
+    ensure_store(metadata_path)
     
     # Inicializējam Spacy modeli
     nlp = spacy.blank("xx")  # Daudzvalodu modelis
@@ -95,117 +35,112 @@ def prepare_training_data(metadata_path):
         ner.add_label(label)
     
     # Sagatavojam apmācības datus
-    TRAIN_DATA = []
     skipped_files = 0
     
     print("\nSākam datu sagatavošanu...")
-    for idx, row in tqdm(df.iterrows(), total=len(df)):
-        try:
-            text = extract_text_from_file(row['file_path'], row['file_type'])
-            
-            if not text:
-                skipped_files += 1
-                continue
-                
-            entities = []
-            
-            # Uzņēmuma nosaukums
-            company_start = text.find(row['company'])
-            if company_start != -1:
-                entities.append((company_start, company_start + len(row['company']), "COMPANY"))
-            
-            # Pavadzīmes numurs
-            inv_start = text.find(row['invoice_number'])
-            if inv_start != -1:
-                entities.append((inv_start, inv_start + len(row['invoice_number']), "INVOICE_NUMBER"))
-            
-            # Datums
-            date_start = text.find(row['date'])
-            if date_start != -1:
-                entities.append((date_start, date_start + len(row['date']), "DATE"))
-            
-            # Summa un valūta
-            amount_str = f"{row['total_amount']:.2f}"
-            amount_start = text.find(amount_str)
-            if amount_start != -1:
-                entities.append((amount_start, amount_start + len(amount_str), "AMOUNT"))
+    with CorpusWriter(nlp, corpus_dir) as writer:
+        # Nolasām tikai anotēšanai vajadzīgās kolonnas (bez preču rindām)
+        rows = []
+        for row in iter_records(metadata_path, ANNOTATION_COLUMNS, languages, file_types):
+            row['digest'] = content_digest(row['file_path'])
+            if is_stale(writer.files, row['file_path'], row['digest']):
+                rows.append(row)
+        print(f"Korpusā jau ir {len(writer.files)} dokumenti, jāapstrādā (jauni vai mainīti): {len(rows)}")
+        
+        # OCR paralēli visiem failiem; rezultāti tādā pašā secībā kā rows
+        ocr_results = extract_texts_parallel(((row['file_path'], row['file_type'], row['digest']) for row in rows),
+                                             workers=workers)
+        
+        for row, (text, error) in zip(rows, ocr_results):
+            try:
+                if error:
+                    print(f"Kļūda apstrādājot {row['file_path']}: {error}")
                 
-                # Valūta
-                currency_start = text.find(row['currency'], amount_start)
-                if currency_start != -1:
-                    entities.append((currency_start, currency_start + len(row['currency']), "CURRENCY"))
-            
-            if entities:
-                TRAIN_DATA.append((text, {"entities": entities}))
+                if not text:
+                    skipped_files += 1
+                    continue
+                    
+                # Visas metadatu vērtības vienā teksta caurskatē (pieļaujot OCR kļūdas)
+                entities = training_entities(text, row)
                 
-        except Exception as e:
-            print(f"\nKļūda apstrādājot {row['file_path']}: {str(e)}")
-            skipped_files += 1
+                if not (entities and writer.add(text, entities, row['file_path'], row['digest'])):
+                    skipped_files += 1
+                    
+            except Exception as e:
+                print(f"\nKļūda apstrādājot {row['file_path']}: {str(e)}")
+                skipped_files += 1
     
-    print(f"\nDatu sagatavošana pabeigta. Izlaistie faili: {skipped_files}/{len(df)}")
-    return nlp, TRAIN_DATA
+    print(f"\nDatu sagatavošana pabeigta. Izlaistie faili: {skipped_files}/{len(rows)}")
+    print(get_cache().report())
+    return nlp
+
+def partition_files(metadata_path=DEFAULT_STORE_PATH, languages=None, file_types=None):
+    """Izvēlēto nodalījumu failu ceļi (None - bez ierobežojuma, ja nodalījumi nav norādīti)"""
+    if not languages and not file_types:
+        return None
+    table = read(metadata_path, ["file_path"], languages, file_types)
+    return set(table.column("file_path").to_pylist())
 
 # =============================================
 # MODEĻA APMĀCĪBA
 # =============================================
 
-def train_model(nlp, train_data, test_size=0.2, epochs=20):
-    """Apmāca NER modeli"""
-    # Sadalām datus apmācībai un testēšanai
-    train_data, test_data = train_test_split(train_data, test_size=test_size, random_state=42)
-    
+def train_model(nlp, corpus_dir=CORPUS_DIR, epochs=20, patience=PATIENCE, checkpoint_path=CHECKPOINT_PATH,
+                only=None):
+    """
+    Apmāca NER modeli, straumējot piemērus no DocBin korpusa; apstājas, kad dev F1 vairs neuzlabojas.
+    only: apmācības un dev kopā tikai šo failu dokumenti (partition_files)
+    """
     print("\nSākam modeļa apmācību...")
     optimizer = nlp.begin_training()
-    
-    # Epohu skaits
-    for epoch in range(epochs):
-        random.shuffle(train_data)
-        losses = {}
-        
-        # Batch apstrāde
-        batch_size = 8
-        batches = [train_data[i:i + batch_size] for i in range(0, len(train_data), batch_size)]
-        
-        for batch in tqdm(batches, desc=f"Epoha {epoch + 1}/{epochs}"):
-            examples = []
-            for text, annotations in batch:
-                doc = nlp.make_doc(text)
-                example = Example.from_dict(doc, annotations)
-                examples.append(example)
-            
-            nlp.update(examples, drop=0.3, losses=losses, sgd=optimizer)
-        
-        print(f"Epoha {epoch + 1}, Zaudējumi: {losses}")
-    
-    # Testējam modeli
-    print("\nTestējam modeli...")
-    correct = 0
-    total = 0
-    
-    for text, annotations in tqdm(test_data, desc="Testēšana"):
-        doc = nlp(text)
-        true_entities = set((start, end, label) for start, end, label in annotations["entities"])
-        pred_entities = set((ent.start_char, ent.end_char, ent.label_) for ent in doc.ents)
-        
-        correct += len(true_entities & pred_entities)
-        total += len(true_entities)
-    
-    accuracy = correct / total if total > 0 else 0
-    print(f"\nPrecizitāte: {accuracy:.2%}")
-    
-    return nlp
+    dev_docs = load_dev_docs(nlp.vocab, corpus_dir, only=only)
+    print(f"Dev dokumenti: {len(dev_docs)}")
+    
+    # Piemēri tiek nolasīti pa šķembām, nevis turēti atmiņā
+    train_epochs(nlp, optimizer,
+                 lambda epoch: iter_examples(nlp, corpus_dir, split="train", shuffle=True, seed=epoch, only=only),
+                 dev_docs, epochs, patience, checkpoint_path)
+    
+    # Testējam modeli (labākā epoha)
+    scores = None
+    if dev_docs:
+        print("\nTestējam modeli...")
+        scores = evaluate(nlp, dev_docs)
+        print(f"\nPrecizitāte: {scores['ents_p']:.2%}, pārklājums: {scores['ents_r']:.2%}, F1: {scores['ents_f']:.2%}")
+    
+    return nlp, scores
 
 # =============================================
 # GALVENĀ IZPILDES DAĻA
 # =============================================
 
 if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='NER modeļa apmācība')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='OCR procesu skaits (noklusējums: visi CPU kodoli)')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='DocBin korpusa mape')
+    parser.add_argument('--epochs', type=int, default=20, help='Maksimālais epohu skaits')
+    parser.add_argument('--patience', type=int, default=PATIENCE, help='Epohas bez dev uzlabojuma līdz apstāšanās')
+    parser.add_argument('--force', action='store_true', help='Aktivizēt jauno versiju arī tad, ja dev F1 ir zemāks')
+    parser.add_argument('--metadata', default=DEFAULT_STORE_PATH, help='Metadatu krātuve (Parquet)')
+    parser.add_argument('--languages', nargs='+', default=None, help='Tikai šīs valodas (lv en ru)')
+    parser.add_argument('--file-types', nargs='+', default=None, help='Tikai šie failu tipi (pdf jpg png)')
+    args = parser.parse_args()
+    
     # 1. Sagatavojam datus
-    nlp, train_data = prepare_training_data("invoices/dataset/invoices_metadata.csv")
+    nlp = prepare_training_data(args.metadata, workers=args.workers, corpus_dir=args.corpus,
+                                languages=args.languages, file_types=args.file_types)
     
     # 2. Apmācam modeli
-    trained_nlp = train_model(nlp, train_data)
+    only = partition_files(args.metadata, args.languages, args.file_types)
+    trained_nlp, scores = train_model(nlp, args.corpus, args.epochs, args.patience, only=only)
     
-    # 3. Saglabājam modeli
-    trained_nlp.to_disk("invoice_ner_model")
-    print("\nModelis veiksmīgi saglabāts mapē 'invoice_ner_model'")
\ No newline at end of file
+    # 3. Saglabājam modeli kā jaunu versiju reģistrā
+    version, promoted = publish(trained_nlp, scores, source="2.learn_model.py", force=args.force)
+    if promoted:
+        print(f"\nModelis veiksmīgi saglabāts un aktivizēts: versija '{version}'")
+    else:
+        print(f"\nModelis saglabāts kā versija '{version}', bet NAV aktivizēts - dev F1 zemāks par pašreizējo "
+              f"(aktivizēt: python model_registry.py activate {version})")
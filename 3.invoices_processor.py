@@ -1,164 +1,843 @@
-import pytesseract
-from pdf2image import convert_from_path
-import spacy
-import cv2
-import numpy as np
 import os
-from PIL import Image
+import json
+import tempfile
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from contextlib import nullcontext
+from urllib.parse import urlparse, parse_qs
+
+# Smagās atkarības (spaCy, invoice_ocr ar OpenCV/Tesseract, numpy, asyncio) tiek ielādētas tikai
+# funkcijās, kurām tās vajadzīgas, lai --help, kļūdaini argumenti un veselības pārbaudes startētu ātri
+# (startēšanas laika budžets: benchmarks/startup.py)
+from stage_timing import stage, collect
+from invoice_metrics import MetricsRegistry, document_metrics
+from model_registry import resolve_model_path
+from ocr_cache import file_digest
 
 # =============================================
 # KONFIGURĀCIJA (LABOJAM ATBILSTOŠI SAVAI SISTĒMAI)
 # =============================================
 
-# Ceļi uz nepieciešamajiem komponentiem
-TESSERACT_PATH = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-POPPLER_PATH = r'C:\Program Files\poppler-24.08.0\Library\bin'
+# Tesseract, Poppler un OCR valodas konfigurē invoice_ocr.py
+# Modelis tiek ņemts no versiju reģistra (model_registry.py, aktīvā versija);
+# MODEL_PATH tiek izmantots, kamēr reģistrā vēl nav nevienas versijas
 MODEL_PATH = 'invoice_ner_model'  # Mapē, kur saglabāts apmācītais modelis
 
-# OCR valodu konfigurācija
-OCR_LANGUAGES = 'lav+eng+rus'
+# Servisa režīma konfigurācija
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8080
+MODEL_RELOAD_INTERVAL = 10  # Sekundes starp modeļa izmaiņu pārbaudēm
+
+# Pakešapstrādes konfigurācija
+NLP_BATCH_SIZE = 32
+
+# Nepārtrauktas ienākošās mapes apstrādes konfigurācija (--watch)
+INBOX_POLL_INTERVAL = 2.0   # Sekundes starp ienākošās mapes pārbaudēm
+INBOX_SETTLE_SECONDS = 1.0  # Fails tiek ņemts tikai tad, ja tas nav mainījies vismaz tik ilgi (kopēšana)
+QUEUE_SIZE = 64             # Rindas garums starp posmiem - pilna rinda aptur iepriekšējo posmu
+NER_WORKERS = 1             # Vienlaicīgas NER partijas (katra savā pavedienā)
+NER_BATCH_WAIT = 0.05       # Sekundes, cik NER posms gaida, lai papildinātu partiju
+INBOX_FAILED_DIR = None     # Faili, kuru apstrāde neizdevās (None - mape "failed" blakus ienākošajai mapei)
+
+# Metrikas: posmu ilgumi, lapu skaits, attēlu izmēri rezultātā + Prometheus eksports.
+# Izslēgtā stāvoklī mērījumi netiek veikti.
+METRICS_ENABLED = False
+METRICS_FLUSH_EVERY = 100  # Pakešapstrādē .prom fails tiek atjaunināts ik pēc N dokumentiem
+
+# Dublikātu indekss: identiski faili (satura kontrolsumma) un gandrīz identiski dokumenti
+# (teksta MinHash, piem., tā pati pavadzīme PDF un JPG) saņem jau saglabāto rezultātu bez
+# atkārtotas apstrādes; atkārtots pavadzīmes numurs + uzņēmums citā failā tiek atzīmēts rezultātā
+DEDUP_ENABLED = True
+DEDUP_INDEX_PATH = "invoices/dedup_index.sqlite"
+
+# Preču rindu tabula no vārdu koordinātēm (nepieciešams OCR_MODE = 'layout' invoice_ocr.py) un
+# aritmētiskā pārbaude (daudzums × cena = summa, rindu summa = kopsumma) visai partijai vienlaikus:
+#   'auto' - tikai tad, ja invoice_ocr.OCR_MODE = 'layout', True - vienmēr (ar brīdinājumu), False - nekad
+LINE_ITEMS_ENABLED = 'auto'
+
+# Noteikumu slānis pirms NER (invoice_rules.py): INVOICE_NUMBER, DATE, AMOUNT un CURRENCY ar stingru
+# formātu tiek atrasti ar regulārajām izteiksmēm, modelis aizpilda tikai pārējos laukus (COMPANY u.c.)
+RULES_ENABLED = True
 
 # =============================================
 # PALĪGFUNKCIJAS
 # =============================================
 
-def setup_environment():
+def setup_environment(model_path=None):
     """Inicializē vides mainīgos un pārbauda atkarības"""
-    # Konfigurē Tesseract ceļu
-    pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
+    model_path = model_path or resolve_model_path(fallback=MODEL_PATH)
     
     # Pārbauda, vai modelis eksistē
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"Nevar atrast modeli mapē '{MODEL_PATH}'")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Nevar atrast modeli mapē '{model_path}'")
     
     # Ielādē Spacy modeli
+    import spacy
     try:
-        nlp = spacy.load(MODEL_PATH)
+        nlp = spacy.load(model_path)
     except Exception as e:
         raise RuntimeError(f"Nevar ielādēt modeli: {str(e)}")
     
+    if RULES_ENABLED:
+        import invoice_rules
+        invoice_rules.add_to_pipeline(nlp)
+    
     return nlp
 
-def preprocess_image(image):
-    """Attēlu priekšapstrāde OCR uzlabošanai"""
-    # Konvertē uz pelēko toņu
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+def extract_text_from_file(file_path, digest=None):
+    """
+    Iegūst tekstu no PDF, JPG vai PNG faila (izmantojot OCR kešatmiņu)
+    digest: jau aprēķinātā faila kontrolsumma (dublikātu pārbaudei), lai fails netiktu nolasīts vēlreiz
+    Atgriež: {"text": ..., "pages": [...]} - lapās norādīts, vai teksts nolasīts no PDF teksta slāņa vai ar OCR
+    """
+    from invoice_ocr import extract_document_cached
+    try:
+        return extract_document_cached(file_path, digest=digest)
+    except Exception as e:
+        raise RuntimeError(f"Kļūda apstrādājot {file_path}: {str(e)}")
+
+def build_result(doc, document=None):
+    """
+    Sagatavo rezultātu struktūru no NER apstrādāta dokumenta
+    document: extract_text_from_file rezultāts (lapu avoti, priekšapstrādes profils)
+    """
+    document = document or {}
+    text = doc.text
+    result = {
+        "company": None,
+        "invoice_number": None,
+        "date": None,
+        "amount": None,
+        "currency": None,
+        "raw_text": text[:500] + "..." if len(text) > 500 else text,  # Pirmie 500 simboli
+        "entities": [],
+        "pages": document.get("pages", []),  # Katras lapas teksta avots un priekšapstrāde
+        "preprocess_profile": document.get("preprocess_profile"),
+        "ocr_language": document.get("ocr_language"),  # OCR valoda un tās noteikšanas ticamība
+        "field_sources": {}  # Lauks -> "rules" (invoice_rules.py) vai "ner" (modelis)
+    }
+    if document.get("duplicate_of"):
+        # Līdzīgs jau apstrādāts dokuments, kas netika apstiprināts kā tā pati pavadzīme
+        result["duplicate_of"] = document["duplicate_of"]
     
-    # Adaptīvs slieksnis
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    # Iegūst visas atpazītās entītijas
+    from invoice_rules import entity_source
+    for ent in doc.ents:
+        result["entities"].append({
+            "text": ent.text,
+            "label": ent.label_,
+            "start": ent.start_char,
+            "end": ent.end_char,
+            "source": entity_source(doc, ent)
+        })
     
-    # Trokšņu mazināšana
-    denoised = cv2.fastNlMeansDenoising(thresh, h=10)
+    # Aizpilda galvenos laukus atbilstoši entītiju tipiem (noteikumu atrastie - pirmie)
+    fields = {"COMPANY": "company", "INVOICE_NUMBER": "invoice_number", "DATE": "date",
+              "AMOUNT": "amount", "CURRENCY": "currency"}
+    for entity in sorted(result["entities"], key=lambda e: e["source"] != "rules"):
+        field = fields.get(entity["label"])
+        if field and not result[field]:
+            result[field] = entity["text"]
+            result["field_sources"][field] = entity["source"]
     
-    return denoised
+    return result
 
-def extract_text_from_file(file_path):
-    """Iegūst tekstu no PDF, JPG vai PNG faila"""
+def process_invoice(nlp, file_path, source_name=None):
+    """
+    Apstrādā pavadzīmi un atgriež strukturētus datus.
+    source_name: dokumenta nosaukums dublikātu indeksā, ja file_path ir pagaidu fails (augšupielāde)
+    """
     try:
-        # Noteikt faila tipu
-        file_ext = os.path.splitext(file_path)[1].lower()
-        
-        if file_ext == '.pdf':
-            # PDF apstrāde
-            images = convert_from_path(file_path, poppler_path=POPPLER_PATH)
-            full_text = ""
+        with collect() if METRICS_ENABLED else nullcontext() as timings:
+            start = time.perf_counter()
+
+            digest = None
+            if DEDUP_ENABLED:
+                digest = file_digest(file_path)
+                duplicate = find_duplicate(nlp, source_name or file_path, digest=digest)
+                if duplicate:
+                    return duplicate
             
-            for img in images:
-                img_np = np.array(img)
-                img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-                processed_img = preprocess_image(img_np)
-                text = pytesseract.image_to_string(processed_img, lang=OCR_LANGUAGES)
-                full_text += text + "\n"
+            # Iegūst tekstu no faila
+            document = extract_text_from_file(file_path, digest)
+            text = document["text"]
             
-            return full_text.strip()
-        
-        elif file_ext in ('.jpg', '.jpeg', '.png'):
-            # Attēlu apstrāde
-            img = cv2.imread(file_path)
-            if img is None:
-                raise ValueError(f"Nevar nolasīt attēlu no {file_path}")
-                
-            processed_img = preprocess_image(img)
-            return pytesseract.image_to_string(processed_img, lang=OCR_LANGUAGES).strip()
-        
-        else:
-            raise ValueError(f"Nepareizs faila formāts: {file_ext}")
-            
-    except Exception as e:
-        raise RuntimeError(f"Kļūda apstrādājot {file_path}: {str(e)}")
+            if not text:
+                return {"error": "Neizdevās iegūt tekstu no dokumenta"}
 
-def process_invoice(nlp, file_path):
-    """Apstrādā pavadzīmi un atgriež strukturētus datus"""
-    try:
-        # Iegūst tekstu no faila
-        text = extract_text_from_file(file_path)
-        
-        if not text:
-            return {"error": "Neizdevās iegūt tekstu no dokumenta"}
-        
-        # Apstrādā ar NER modeli
-        doc = nlp(text)
-        
-        # Sagatavo rezultātu struktūru
-        result = {
-            "company": None,
-            "invoice_number": None,
-            "date": None,
-            "amount": None,
-            "currency": None,
-            "raw_text": text[:500] + "..." if len(text) > 500 else text,  # Pirmie 500 simboli
-            "entities": []
-        }
-        
-        # Iegūst visas atpazītās entītijas
-        for ent in doc.ents:
-            result["entities"].append({
-                "text": ent.text,
-                "label": ent.label_,
-                "start": ent.start_char,
-                "end": ent.end_char
-            })
+            if DEDUP_ENABLED:
+                from dedup_index import minhash
+                signature = minhash(text)
+                duplicate = find_duplicate(nlp, source_name or file_path, signature=signature, document=document)
+                if duplicate:
+                    return duplicate
             
-            # Aizpilda galvenos laukus atbilstoši entītiju tipiem
-            if ent.label_ == "COMPANY" and not result["company"]:
-                result["company"] = ent.text
-            elif ent.label_ == "INVOICE_NUMBER" and not result["invoice_number"]:
-                result["invoice_number"] = ent.text
-            elif ent.label_ == "DATE" and not result["date"]:
-                result["date"] = ent.text
-            elif ent.label_ == "AMOUNT" and not result["amount"]:
-                result["amount"] = ent.text
-            elif ent.label_ == "CURRENCY" and not result["currency"]:
-                result["currency"] = ent.text
+            # Apstrādā ar NER modeli
+            with stage("ner"):
+                doc = nlp(text)
+            with stage("postprocess"):
+                result = build_result(doc, document)
+            if line_items_enabled():
+                with stage("line_items"):
+                    add_line_items([result], [document])
+            if DEDUP_ENABLED:
+                register_result(nlp, digest, signature, source_name or file_path, result)
         
+        if METRICS_ENABLED:
+            result["metrics"] = document_metrics(document, timings, time.perf_counter() - start)
         return result
     
     except Exception as e:
         return {"error": str(e)}
 
+_line_items_warned = False
+
+def line_items_enabled():
+    """Vai rezultātiem pievienot preču rindas (sk. LINE_ITEMS_ENABLED)"""
+    if LINE_ITEMS_ENABLED == 'auto':
+        import invoice_ocr
+        return invoice_ocr.OCR_MODE == 'layout'
+    return bool(LINE_ITEMS_ENABLED)
+
+def add_line_items(results, documents):
+    """
+    Pievieno rezultātiem preču rindas ("items") un atrastās neatbilstības ("discrepancies").
+    Pārbaude notiek visai partijai vienlaikus. Dokumentiem bez vārdu koordinātēm rindas netiek pievienotas
+    """
+    global _line_items_warned
+    import invoice_ocr
+    from line_items import extract_line_items, parse_number, validate_batch
+
+    if invoice_ocr.OCR_MODE != 'layout' and not _line_items_warned:
+        _line_items_warned = True
+        print("Brīdinājums: LINE_ITEMS_ENABLED = True, bet invoice_ocr.OCR_MODE ir "
+              f"'{invoice_ocr.OCR_MODE}' - preču rindas netiek izgūtas (vajadzīgs OCR_MODE = 'layout')")
+
+    item_lists = [extract_line_items(document) for document in documents]
+    checks = validate_batch(item_lists, [parse_number(result.get("amount")) for result in results])
+    for result, items, discrepancies in zip(results, item_lists, checks):
+        if items is not None:
+            result["items"] = items
+            result["discrepancies"] = discrepancies
+
+# =============================================
+# DUBLIKĀTI
+# =============================================
+
+_dedup = None
+
+def get_dedup_index():
+    """Procesa kopīgais dublikātu indekss (izveido pēc pieprasījuma)"""
+    global _dedup
+    if _dedup is None:
+        from dedup_index import DedupIndex
+        _dedup = DedupIndex(DEDUP_INDEX_PATH)
+    return _dedup
+
+def _model_key(nlp):
+    """
+    Saglabātie rezultāti derīgi tikai tam modelim un tiem iestatījumiem, ar kuriem tie iegūti
+    (OCR iestatījumi, noteikumu slānis, preču rindas)
+    """
+    import invoice_ocr
+    from ocr_cache import settings_digest
+    settings = {"ocr": invoice_ocr.ocr_settings(), "rules": RULES_ENABLED, "line_items": line_items_enabled()}
+    return f"{nlp.path or ''}:{settings_digest(settings)}"
+
+def confirm_near_duplicate(text, stored):
+    """
+    Vienas veidnes pavadzīmes (tas pats piegādātājs) ir teksta ziņā ļoti līdzīgas, tāpēc līdzīgā
+    dokumenta rezultātu izmantojam tikai tad, ja noteikumi (invoice_rules.py) jaunajā tekstā atrod
+    to pašu pavadzīmes numuru un kopsummu
+    """
+    from dedup_index import invoice_key
+    from invoice_rules import find_fields
+
+    found = {label: text[start:end] for start, end, label in find_fields(text)}
+    for label, field in (("INVOICE_NUMBER", "invoice_number"), ("AMOUNT", "amount")):
+        if not found.get(label) or not stored.get(field):
+            return False
+        if invoice_key(found[label]) != invoice_key(stored[field]):
+            return False
+    return True
+
+def find_duplicate(nlp, file_path, digest=None, signature=None, document=None):
+    """
+    Jau apstrādāta cita dokumenta rezultāts: identisks fails (digest) vai līdzīgs teksts (signature).
+    Tā paša faila (file_path) iepriekšējā apstrāde nav dublikāts - fails tiek apstrādāts no jauna.
+    Līdzīgs teksts tiek pārbaudīts ar confirm_near_duplicate; ja tas neapstiprinās, dokuments tiek
+    apstrādāts parasti un document["duplicate_of"] (ar "confirmed": False) nonāk tikai rezultātā kā norāde.
+    Atgriež rezultātu ar "duplicate_of" vai None
+    """
+    index = get_dedup_index()
+    if signature is None:
+        match, kind = index.find_exact(digest, _model_key(nlp), exclude_path=file_path), "exact"
+    else:
+        match, kind = index.find_similar(signature, _model_key(nlp), exclude_path=file_path), "near"
+    if match is None:
+        return None
+
+    duplicate_of = {"file_path": match["file_path"], "match": kind, "similarity": match["similarity"],
+                    "confirmed": True}
+    result = match["result"]
+    if kind == "near" and not confirm_near_duplicate((document or {}).get("text", ""), result):
+        if document is not None:
+            document["duplicate_of"] = dict(duplicate_of, confirmed=False)
+        return None
+    result["duplicate_of"] = duplicate_of
+    return result
+
+def register_result(nlp, digest, signature, file_path, result):
+    """Saglabā rezultātu indeksā; ja numurs + uzņēmums jau redzēts citā failā, atzīmē to rezultātā"""
+    index = get_dedup_index()
+    stored = {k: v for k, v in result.items() if k not in ("file_path", "metrics", "duplicate_of")}
+    index.add(digest, file_path, signature, stored, _model_key(nlp))
+    first_path = index.register_invoice(result.get("company"), result.get("invoice_number"), digest, file_path)
+    if first_path:
+        result["duplicate_invoice"] = {"file_path": first_path}
+
 # =============================================
 # GALVENĀ INTERFEISA FUNKCIJA
 # =============================================
 
-def analyze_invoice(file_path):
+def analyze_invoice(file_path, nlp=None, source_name=None):
     """
     Galvenā funkcija pavadzīmju apstrādei
+    Ja nlp nav norādīts, tiek ielādēts aktīvais modelis no reģistra (vai MODEL_PATH)
+    source_name: sk. process_invoice
     Atgriež: vārdnīcu ar rezultātiem vai kļūdu
     """
     try:
-        # Inicializē vidi un ielādē modeli
-        nlp = setup_environment()
-        
-        # Pārbauda, vai fails eksistē
+        # Pārbauda, vai fails eksistē (pirms modeļa ielādes)
         if not os.path.exists(file_path):
             return {"error": f"Fails '{file_path}' neeksistē"}
+
+        # Inicializē vidi un ielādē modeli
+        if nlp is None:
+            nlp = setup_environment()
         
         # Apstrādā pavadzīmi
-        return process_invoice(nlp, file_path)
+        return process_invoice(nlp, file_path, source_name)
     
     except Exception as e:
         return {"error": f"Sistēmas kļūda: {str(e)}"}
 
+# =============================================
+# PAKEŠAPSTRĀDE
+# =============================================
+
+def pipe_result(doc, file_path, meta):
+    """process_invoice formāta rezultāts dokumentam, kas apstrādāts ar nlp.pipe partijā"""
+    t0 = time.perf_counter()
+    result = build_result(doc, meta)
+    result["file_path"] = file_path
+    if METRICS_ENABLED:
+        # NER notiek partijās (nlp.pipe), tāpēc dokumenta metrikās ir tikai OCR un pēcapstrāde
+        timings = dict(meta.get("timings", {}), postprocess=time.perf_counter() - t0)
+        result["metrics"] = document_metrics({**meta, "text": doc.text}, timings, sum(timings.values()))
+    return result
+
+def process_batch(inputs, output_path, manifest=None, output_format=None, workers=None,
+                  batch_size=NLP_BATCH_SIZE, n_process=1, resume=True):
+    """
+    Apstrādā daudzas pavadzīmes: OCR procesu pūlā, NER ar nlp.pipe.
+    Rezultāti tiek rakstīti straumē (JSONL/Parquet), apstrādātie faili - kontrolpunktā,
+    lai pārtrauktu darbu varētu atsākt no vietas, kur tas apstājās.
+    """
+    from tqdm import tqdm
+    from batch_io import discover_files, Checkpoint, open_writer
+    from dedup_index import minhash
+    from invoice_ocr import iter_documents_parallel, get_cache
+
+    nlp = setup_environment()
+    files = discover_files(inputs, manifest)
+
+    checkpoint = Checkpoint(output_path + ".checkpoint", resume=resume)
+    todo = [path for path in files if path not in checkpoint.done]
+    print(f"Atrasti {len(files)} faili, jau apstrādāti {len(files) - len(todo)}, atlikuši {len(todo)}")
+
+    failed = []
+    duplicates = []     # Jau apstrādātu dokumentu rezultāti (bez OCR/NER)
+    dedup_keys = {}     # Faila ceļš -> (satura kontrolsumma, teksta paraksts) reģistrēšanai pēc NER
+    registry = MetricsRegistry()
+    metrics_path = output_path + ".prom"
+
+    order = deque()     # OCR nodoto failu ceļi tādā pašā secībā, kādā pūls atgriež rezultātus
+
+    def ocr_files():
+        """
+        OCR uzdevumi (ģenerators - pūls tos paņem pa porcijām, tāpēc pirmie rezultāti ir uzreiz).
+        Identiskiem jau apstrādātiem failiem OCR neveicam; kontrolsumma tiek nodota arī OCR kešatmiņai
+        """
+        for file_path in todo:
+            digest = None
+            if DEDUP_ENABLED:
+                digest = dedup_keys[file_path] = file_digest(file_path)
+                duplicate = find_duplicate(nlp, file_path, digest=digest)
+                if duplicate:
+                    duplicates.append(dict(duplicate, file_path=file_path))
+                    continue
+            order.append(file_path)
+            yield file_path, None, digest
+
+    def ocr_stage():
+        """Padod NER posmam tikai veiksmīgi nolasītos tekstus; kļūdas uzkrāj atsevišķi"""
+        documents = iter_documents_parallel(ocr_files(), workers, collect_timings=METRICS_ENABLED)
+        for document, error in documents:
+            file_path = order.popleft()
+            if error:
+                failed.append({"file_path": file_path, "error": f"Kļūda apstrādājot {file_path}: {error}"})
+            elif not document["text"]:
+                failed.append({"file_path": file_path, "error": "Neizdevās iegūt tekstu no dokumenta"})
+            else:
+                if DEDUP_ENABLED:
+                    signature = minhash(document["text"])
+                    duplicate = find_duplicate(nlp, file_path, signature=signature, document=document)
+                    if duplicate:
+                        duplicates.append(dict(duplicate, file_path=file_path))
+                        continue
+                    dedup_keys[file_path] = (dedup_keys[file_path], signature)
+                meta = {k: v for k, v in document.items() if k != "text"}
+                yield document["text"], (file_path, meta)
+
+    def write(result):
+        writer.write(result)
+        registry.observe(result)
+        progress.update()
+        if METRICS_ENABLED and progress.n % METRICS_FLUSH_EVERY == 0:
+            registry.write(metrics_path)
+
+    start = time.perf_counter()
+    errors = 0
+    with open_writer(output_path, output_format, append=resume, checkpoint=checkpoint) as writer, \
+            tqdm(total=len(todo), desc="Pavadzīmes") as progress:
+        pending = []
+
+        def write_pending():
+            """Preču rindu pārbaude visai NER partijai, tad reģistrēšana un rakstīšana"""
+            if line_items_enabled():
+                add_line_items([result for result, _ in pending], [meta for _, meta in pending])
+            for result, _ in pending:
+                if DEDUP_ENABLED:
+                    register_result(nlp, *dedup_keys.pop(result["file_path"]), result["file_path"], result)
+                write(result)
+            pending.clear()
+
+        docs = nlp.pipe(ocr_stage(), as_tuples=True, batch_size=batch_size, n_process=n_process)
+        for doc, (file_path, meta) in docs:
+            while failed:
+                write(failed.pop(0))
+                errors += 1
+            while duplicates:
+                write(duplicates.pop(0))
+
+            pending.append((pipe_result(doc, file_path, meta), meta))
+            if len(pending) >= batch_size:
+                write_pending()
+
+        write_pending()
+        while failed:
+            write(failed.pop(0))
+            errors += 1
+        while duplicates:
+            write(duplicates.pop(0))
+
+    checkpoint.close()
+    elapsed = time.perf_counter() - start
+    print(f"\nApstrādātas {len(todo)} pavadzīmes {elapsed:.1f}s "
+          f"({len(todo) / elapsed if elapsed else 0:.2f} dok./s), kļūdas: {errors}")
+    print(get_cache().report())
+    print(f"Rezultāti: {writer.path}")
+    if METRICS_ENABLED:
+        registry.write(metrics_path)
+        print(f"Metrikas (Prometheus): {metrics_path}")
+
+# =============================================
+# NEPĀRTRAUKTA IENĀKOŠĀS MAPES APSTRĀDE
+# =============================================
+#
+# Posmi: failu atrašana -> OCR (procesu pūls) -> NER (nlp.pipe partijas) -> rakstītājs.
+# Starp posmiem ir ierobežota garuma rindas: ja NER vai rakstīšana atpaliek,
+# OCR un failu atrašana gaida, nevis krāj dokumentus atmiņā.
+
+def _ocr_task(file_path, collect_timings=False, digest=None):
+    """OCR posma uzdevums procesu pūlā"""
+    with collect() if collect_timings else nullcontext() as timings:
+        document = extract_text_from_file(file_path, digest)
+    if collect_timings:
+        document["timings"] = timings
+    return document
+
+def _ner_error(file_path, error):
+    print(f"NER kļūda {file_path}: {error}")
+    return {"file_path": file_path, "error": f"Kļūda apstrādājot {file_path}: {error}"}
+
+def _ner_batch(nlp, batch):
+    """
+    NER posma partija (izpildās pavedienā, lai notikumu cikls turpinātu darbu).
+    Ja partija neizdodas, dokumenti tiek apstrādāti pa vienam - kļūda skar tikai savu dokumentu
+    (rezultāts ar "error"), pārējā partija un rinda turpina darbu
+    """
+    try:
+        docs = list(nlp.pipe((document["text"] for _, document in batch), batch_size=len(batch)))
+    except Exception:
+        docs = []
+        for _, document in batch:
+            try:
+                docs.append(nlp(document["text"]))
+            except Exception as e:
+                docs.append(e)
+
+    results = []
+    processed = []      # (rezultāta indekss, metadati, dokuments) veiksmīgi apstrādātajiem
+    for doc, (file_path, document) in zip(docs, batch):
+        if isinstance(doc, Exception):
+            results.append(_ner_error(file_path, doc))
+            continue
+        try:
+            meta = {k: v for k, v in document.items() if k not in ("text", "dedup_keys")}
+            results.append(pipe_result(doc, file_path, meta))
+            processed.append((len(results) - 1, meta, document))
+        except Exception as e:
+            results.append(_ner_error(file_path, e))
+
+    if line_items_enabled() and processed:
+        try:
+            add_line_items([results[i] for i, _, _ in processed], [meta for _, meta, _ in processed])
+        except Exception:
+            for i, meta, _ in processed:
+                try:
+                    add_line_items([results[i]], [meta])
+                except Exception as e:
+                    results[i] = _ner_error(results[i]["file_path"], e)
+    for i, _, document in processed:
+        if "dedup_keys" in document and "error" not in results[i]:
+            try:
+                register_result(nlp, *document["dedup_keys"], results[i]["file_path"], results[i])
+            except Exception as e:
+                results[i] = _ner_error(results[i]["file_path"], e)
+    return results
+
+def move_to_failed(file_path, failed_dir):
+    """Pārvieto failu, kura apstrāde neizdevās, uz failed_dir. Atgriež jauno ceļu vai None"""
+    import shutil
+    try:
+        os.makedirs(failed_dir, exist_ok=True)
+        return shutil.move(file_path, os.path.join(failed_dir, os.path.basename(file_path)))
+    except OSError as e:
+        print(f"Neizdevās pārvietot {file_path} uz '{failed_dir}': {str(e)}")
+        return None
+
+async def run_inbox_pipeline(inbox, output_path, output_format=None, ocr_workers=None,
+                             ner_workers=NER_WORKERS, batch_size=NLP_BATCH_SIZE,
+                             queue_size=QUEUE_SIZE, once=False):
+    """
+    Nepārtraukti apstrādā failus, kas parādās mapē inbox, un raksta rezultātus output_path.
+    Apstrādātie faili tiek atzīmēti kontrolpunktā, tāpēc pēc restarta tie netiek apstrādāti atkārtoti.
+    Faili, kuru OCR vai NER neizdevās, tiek pārvietoti uz INBOX_FAILED_DIR (rezultātā - kļūda un "failed_path").
+    once=True - apstrādā tikai pašreizējo mapes saturu un beidz darbu.
+    """
+    import asyncio
+    from concurrent.futures import ProcessPoolExecutor
+    from batch_io import discover_files, Checkpoint, open_writer
+    from dedup_index import minhash
+    from invoice_ocr import _init_worker
+
+    loop = asyncio.get_running_loop()
+    ocr_workers = ocr_workers or os.cpu_count() or 1
+    models = ModelHolder()
+    models.start()
+
+    checkpoint = Checkpoint(output_path + ".checkpoint", resume=True)
+    registry = MetricsRegistry()
+    metrics_path = output_path + ".prom"
+    failed_dir = INBOX_FAILED_DIR or os.path.join(os.path.dirname(os.path.abspath(inbox)), "failed")
+    queued = set()
+    pool = ProcessPoolExecutor(ocr_workers, initializer=_init_worker, initargs=(METRICS_ENABLED,))
+
+    path_queue = asyncio.Queue(queue_size)
+    text_queue = asyncio.Queue(queue_size)
+    result_queue = asyncio.Queue(queue_size)
+    ocr_running = ocr_workers
+
+    async def discover():
+        while True:
+            for file_path in discover_files([inbox]):
+                if file_path in checkpoint.done or file_path in queued:
+                    continue
+                try:
+                    age = time.time() - os.stat(file_path).st_mtime
+                except FileNotFoundError:
+                    continue
+                if age < INBOX_SETTLE_SECONDS and not once:
+                    continue
+                queued.add(file_path)
+                await path_queue.put(file_path)
+            if once:
+                break
+            await asyncio.sleep(INBOX_POLL_INTERVAL)
+        for _ in range(ocr_workers):
+            await path_queue.put(None)
+
+    async def ocr_worker():
+        nonlocal ocr_running
+        while True:
+            file_path = await path_queue.get()
+            if file_path is None:
+                break
+            try:
+                digest = None
+                if DEDUP_ENABLED:
+                    digest = await loop.run_in_executor(None, file_digest, file_path)
+                    duplicate = find_duplicate(models.nlp, file_path, digest=digest)
+                    if duplicate:
+                        await result_queue.put(dict(duplicate, file_path=file_path))
+                        continue
+                document = await loop.run_in_executor(pool, _ocr_task, file_path, METRICS_ENABLED, digest)
+            except Exception as e:
+                await result_queue.put({"file_path": file_path, "error": str(e)})
+                continue
+            if not document["text"]:
+                await result_queue.put({"file_path": file_path, "error": "Neizdevās iegūt tekstu no dokumenta"})
+                continue
+            if DEDUP_ENABLED:
+                signature = minhash(document["text"])
+                duplicate = find_duplicate(models.nlp, file_path, signature=signature, document=document)
+                if duplicate:
+                    await result_queue.put(dict(duplicate, file_path=file_path))
+                    continue
+                document["dedup_keys"] = (digest, signature)
+            await text_queue.put((file_path, document))
+
+        ocr_running -= 1
+        if ocr_running == 0:
+            for _ in range(ner_workers):
+                await text_queue.put(None)
+
+    async def ner_worker():
+        finished = False
+        while not finished:
+            item = await text_queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = loop.time() + NER_BATCH_WAIT
+            while len(batch) < batch_size:
+                try:
+                    item = text_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(text_queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    finished = True
+                    break
+                batch.append(item)
+
+            # Modelis var tikt nomainīts darba laikā - partija izmanto to, kas aktīvs tās sākumā
+            try:
+                results = await loop.run_in_executor(None, _ner_batch, models.nlp, batch)
+            except Exception as e:
+                results = [_ner_error(file_path, e) for file_path, _ in batch]
+            for result in results:
+                await result_queue.put(result)
+        await result_queue.put(None)
+
+    async def sink(writer):
+        finished = 0
+        while finished < ner_workers:
+            result = await result_queue.get()
+            if result is None:
+                finished += 1
+                continue
+            if result.get("error") and os.path.exists(result["file_path"]):
+                result["failed_path"] = await loop.run_in_executor(None, move_to_failed,
+                                                                   result["file_path"], failed_dir)
+            writer.write(result)
+            registry.observe(result)
+            print(f"{result['file_path']}: {result.get('error') or 'apstrādāts'}")
+            if result_queue.empty():
+                # Dīkstāvē izrakstām arī nepilnu Parquet rindu grupu
+                if hasattr(writer, "flush"):
+                    writer.flush()
+                if METRICS_ENABLED:
+                    registry.write(metrics_path)
+
+    print(f"Gaida failus mapē '{inbox}' (OCR procesi: {ocr_workers}, NER: {ner_workers}, "
+          f"rindas garums: {queue_size}); rezultāti: {output_path}")
+    try:
+        with open_writer(output_path, output_format, append=True, checkpoint=checkpoint) as writer:
+            await asyncio.gather(discover(), *[ocr_worker() for _ in range(ocr_workers)],
+                                 *[ner_worker() for _ in range(ner_workers)], sink(writer))
+    finally:
+        pool.shutdown(wait=False)
+        models.stop()
+        checkpoint.close()
+        if METRICS_ENABLED:
+            registry.write(metrics_path)
+
+# =============================================
+# SERVISA REŽĪMS
+# =============================================
+
+def model_signature(model_path=MODEL_PATH):
+    """Modeļa mapes "nospiedums" - mainās, ja kāds fails tiek pārrakstīts"""
+    signature = []
+    for root, _, files in os.walk(model_path):
+        for name in files:
+            stat = os.stat(os.path.join(root, name))
+            signature.append((os.path.join(root, name), stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(signature))
+
+class ModelHolder:
+    """
+    Tur ielādētu spaCy modeli atmiņā un aizvieto to, kad reģistrā tiek aktivizēta cita versija
+    (vai, ja reģistrs netiek izmantots, kad MODEL_PATH saturs mainās).
+    Pieprasījumi, kas jau izmanto veco modeli, to pabeidz ar veco objektu.
+    """
+
+    def __init__(self, reload_interval=MODEL_RELOAD_INTERVAL):
+        self.model_path = resolve_model_path(fallback=MODEL_PATH)
+        self.nlp = setup_environment(self.model_path)
+        self.signature = model_signature(self.model_path)
+        self.loaded_at = time.time()
+        self.reload_interval = reload_interval
+        self._stop = threading.Event()
+
+    def check_for_update(self):
+        """Pārlādē modeli, ja tas diskā ir mainījies. Kļūdas gadījumā paliek vecais modelis"""
+        try:
+            model_path = resolve_model_path(fallback=MODEL_PATH)
+            signature = model_signature(model_path)
+            if model_path == self.model_path and signature == self.signature:
+                return False
+            if model_path == MODEL_PATH:
+                # Mape tiek pārrakstīta uz vietas - ļaujam rakstītājam pabeigt saglabāšanu pirms ielādes
+                time.sleep(1)
+                if model_signature(model_path) != signature:
+                    return False
+            # Reģistra versijas ir nemainīgas - tās var ielādēt uzreiz
+            nlp = setup_environment(model_path)
+        except Exception as e:
+            print(f"Modeļa pārlāde neizdevās, turpinām ar iepriekšējo: {str(e)}")
+            return False
+
+        self.nlp, self.model_path, self.signature, self.loaded_at = nlp, model_path, signature, time.time()
+        print(f"Modelis pārlādēts no '{model_path}'")
+        return True
+
+    def watch(self):
+        """Fona pavediens, kas periodiski pārbauda modeļa izmaiņas"""
+        while not self._stop.wait(self.reload_interval):
+            self.check_for_update()
+
+    def start(self):
+        threading.Thread(target=self.watch, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+class InvoiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET  /health                          - servisa statuss
+    GET  /metrics                         - metrikas Prometheus teksta formātā
+    POST /process  {"path": "..."}        - apstrādā failu servera diskā
+    POST /process?filename=invoice.pdf    - apstrādā augšupielādētu failu (ķermenī faila baiti)
+    """
+
+    models = None
+    slots = None
+    metrics = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/metrics":
+            body = self.metrics.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if path != "/health":
+            self._send_json(404, {"error": "Nezināms ceļš"})
+            return
+        self._send_json(200, {"status": "ok", "model_path": self.models.model_path,
+                              "model_loaded_at": self.models.loaded_at})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/process":
+            self._send_json(404, {"error": "Nezināms ceļš"})
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        filename = parse_qs(url.query).get("filename", [None])[0]
+        nlp = self.models.nlp
+
+        with self.slots:
+            if filename:
+                result = self._process_upload(nlp, filename, body)
+            else:
+                try:
+                    file_path = json.loads(body or b"{}")["path"]
+                except (ValueError, KeyError):
+                    self._send_json(400, {"error": 'Sagaidīts JSON ar lauku "path" vai parametrs ?filename='})
+                    return
+                result = analyze_invoice(file_path, nlp=nlp)
+
+        self.metrics.observe(result)
+        self._send_json(200 if "error" not in result else 422, result)
+
+    def _process_upload(self, nlp, filename, body):
+        """
+        Saglabā augšupielādēto failu pagaidu mapē un apstrādā to.
+        Dublikātu indeksā tiek saglabāts augšupielādes nosaukums, nevis pagaidu faila ceļš
+        """
+        suffix = os.path.splitext(filename)[1].lower()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "upload" + suffix)
+            with open(file_path, "wb") as f:
+                f.write(body)
+            return analyze_invoice(file_path, nlp=nlp, source_name=f"upload:{os.path.basename(filename)}")
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} - {format % args}")
+
+def serve(host=SERVER_HOST, port=SERVER_PORT, max_concurrent=None):
+    """Palaiž ilgstošu HTTP servisu, kas modeli ielādē tikai vienreiz"""
+    models = ModelHolder()
+    models.start()
+
+    InvoiceRequestHandler.models = models
+    InvoiceRequestHandler.slots = threading.BoundedSemaphore(max_concurrent or os.cpu_count() or 1)
+    InvoiceRequestHandler.metrics = MetricsRegistry()
+
+    server = ThreadingHTTPServer((host, port), InvoiceRequestHandler)
+    print(f"Serviss klausās http://{host}:{port} (modelis: '{models.model_path}')")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nServiss apturēts")
+    finally:
+        models.stop()
+        server.server_close()
+
 # =============================================
 # LIETOŠANAS PIEMĒRS
 # =============================================
@@ -168,11 +847,59 @@ if __name__ == "__main__":
     
     # Argumentu parsēšana
     parser = argparse.ArgumentParser(description='Pavadzīmju apstrādes tools')
-    parser.add_argument('file', help='Ceļš uz pavadzīmes failu (PDF, JPG vai PNG)')
+    parser.add_argument('file', nargs='*',
+                        help='Ceļš uz pavadzīmes failu (PDF, JPG vai PNG); --batch režīmā arī mapes vai glob šabloni')
+    parser.add_argument('--serve', action='store_true', help='Palaist kā ilgstošu HTTP servisu')
+    parser.add_argument('--watch', metavar='INBOX',
+                        help='Nepārtraukti apstrādāt failus, kas parādās norādītajā mapē')
+    parser.add_argument('--once', action='store_true',
+                        help='--watch režīmā apstrādāt tikai pašreizējo mapes saturu un beigt darbu')
+    parser.add_argument('--batch', action='store_true', help='Pakešapstrāde: daudzi faili, rezultāti failā')
+    parser.add_argument('--manifest', help='Fails ar apstrādājamo failu sarakstu (rindās vai CSV ar file_path)')
+    parser.add_argument('--output', default='results.jsonl', help='Rezultātu fails (.jsonl vai .parquet)')
+    parser.add_argument('--format', choices=['jsonl', 'parquet'], default=None,
+                        help='Izvades formāts (noklusējums: pēc --output paplašinājuma)')
+    parser.add_argument('--workers', type=int, default=None, help='OCR procesu skaits')
+    parser.add_argument('--batch-size', type=int, default=NLP_BATCH_SIZE, help='nlp.pipe batch_size')
+    parser.add_argument('--n-process', type=int, default=1, help='nlp.pipe n_process')
+    parser.add_argument('--ner-workers', type=int, default=NER_WORKERS, help='--watch režīmā vienlaicīgas NER partijas')
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE, help='--watch režīmā rindas garums starp posmiem')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='Sākt no jauna, ignorējot iepriekšējo kontrolpunktu')
+    parser.add_argument('--host', default=SERVER_HOST, help='Servisa adrese')
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help='Servisa ports')
+    parser.add_argument('--max-concurrent', type=int, default=None,
+                        help='Maksimālais vienlaicīgi apstrādājamo pieprasījumu skaits')
+    parser.add_argument('--metrics', action='store_true',
+                        help='Pievienot rezultātiem posmu ilgumus un citas metrikas; pakešapstrādē arī .prom failu')
     args = parser.parse_args()
+    METRICS_ENABLED = args.metrics
+    
+    if args.serve:
+        serve(args.host, args.port, args.max_concurrent)
+        raise SystemExit(0)
+    if args.watch:
+        import asyncio
+        try:
+            asyncio.run(run_inbox_pipeline(args.watch, args.output, output_format=args.format,
+                                           ocr_workers=args.workers, ner_workers=args.ner_workers,
+                                           batch_size=args.batch_size, queue_size=args.queue_size,
+                                           once=args.once))
+        except KeyboardInterrupt:
+            print("\nApstrāde apturēta")
+        raise SystemExit(0)
+    if args.batch:
+        if not args.file and not args.manifest:
+            parser.error("--batch režīmā jānorāda faili, mapes, glob šabloni vai --manifest")
+        process_batch(args.file, args.output, manifest=args.manifest, output_format=args.format,
+                      workers=args.workers, batch_size=args.batch_size, n_process=args.n_process,
+                      resume=not args.no_resume)
+        raise SystemExit(0)
+    if len(args.file) != 1:
+        parser.error("jānorāda tieši viens fails (vai --batch / --serve)")
     
     # Apstrādā pavadzīmi
-    result = analyze_invoice(args.file)
+    result = analyze_invoice(args.file[0])
     
     # Rāda rezultātus
     if "error" in result:
@@ -183,6 +910,12 @@ if __name__ == "__main__":
         print(f"Pavadzīmes nr.: {result['invoice_number']}")
         print(f"Datums: {result['date']}")
         print(f"Summa: {result['amount']} {result['currency']}")
+        sources = ", ".join(f"{p['page']}: {p['source']}" + (f" ({p['preprocess']})" if 'preprocess' in p else "")
+                            for p in result["pages"])
+        print(f"Lapu teksta avots: {sources}")
+        if "metrics" in result:
+            stages = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in result["metrics"]["stages_s"].items())
+            print(f"Apstrādes laiks: {result['metrics']['total_s'] * 1000:.0f} ms ({stages})")
         
         print("\n===== VISAS ATPAZĪTĀS ENTĪTIJAS =====")
         for ent in result["entities"]:
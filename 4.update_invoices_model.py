@@ -1,26 +1,32 @@
 import os
-import pandas as pd
-import pytesseract
-from pdf2image import convert_from_path
 import spacy
-from spacy.training.example import Example
 from tqdm import tqdm
-import cv2
-import numpy as np
-import random
 import shutil
+import time
+
+from invoice_ocr import extract_texts_parallel, get_cache
+from annotation import training_entities
+from training_corpus import CORPUS_DIR, CorpusWriter, content_digest, iter_examples
+from ner_training import PATIENCE, evaluate, load_dev_docs, rehearsal_buffer, train_epochs, with_rehearsal
+from metadata_store import ensure_store
+from model_registry import publish, resolve_model_path
+from update_state import DEFAULT_STATE_PATH, UpdateState
 
 # =============================================
 # KONFIGURĀCIJA
 # =============================================
-pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-poppler_path = r"C:\Program Files\poppler-24.08.0\Library\bin"
-tesseract_langs = 'lav+eng+rus'
-
 PDF_DIR = "invoices/newpdf"       # ← mainīts
 IMG_DIR = "invoices/newimages"
 PROCESSED_DIR = "invoices/processed"
-CSV_PATH = "invoices/new_dataset/invoices_metadata.csv"
+METADATA_PATH = "invoices/new_dataset/metadata"   # Parquet krātuve
+# Jauno pavadzīmju metadati: rindas, kas pievienotas šim CSV, katrā pārbaudē tiek pārnestas uz krātuvi
+METADATA_CSV_PATH = "invoices/new_dataset/invoices_metadata.csv"
+STATE_PATH = DEFAULT_STATE_PATH   # Apstrādes stāvoklis (SQLite) - metadati netiek pārrakstīti
+
+# Nepārtrauktās papildināšanas konfigurācija (--watch)
+WATCH_INTERVAL = 30          # Sekundes starp jauno failu pārbaudēm
+UPDATE_MIN_EXAMPLES = 200    # Papildinām modeli, kad uzkrāti tik daudz jaunu piemēru...
+UPDATE_MAX_WAIT = 3600       # ...vai kad vecākais neapmācītais piemērs gaida ilgāk par šo (sekundes)
 
 os.makedirs(PROCESSED_DIR, exist_ok=True)
 
@@ -28,35 +34,6 @@ os.makedirs(PROCESSED_DIR, exist_ok=True)
 # FUNKCIJAS
 # =============================================
 
-def preprocess_image(image):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
-    denoised = cv2.fastNlMeansDenoising(thresh, h=10)
-    return denoised
-
-def extract_text_from_file(file_path, file_type):
-    try:
-        if file_type.lower() == 'pdf':
-            images = convert_from_path(file_path, poppler_path=poppler_path)
-            full_text = ""
-            for img in images:
-                img_np = np.array(img)
-                img_np = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
-                processed_img = preprocess_image(img_np)
-                text = pytesseract.image_to_string(processed_img, lang=tesseract_langs)
-                full_text += text + "\n"
-            return full_text.strip()
-        else:
-            img = cv2.imread(file_path)
-            if img is None:
-                raise ValueError(f"Neizdevās nolasīt attēlu no {file_path}")
-            processed_img = preprocess_image(img)
-            text = pytesseract.image_to_string(processed_img, lang=tesseract_langs)
-            return text.strip()
-    except Exception as e:
-        print(f"Kļūda apstrādājot {file_path}: {str(e)}")
-        return ""
-
 def get_full_file_path(file_name, file_type):
     ext = file_type.lower()
     if ext == "pdf":
@@ -66,9 +43,10 @@ def get_full_file_path(file_name, file_type):
     else:
         return None
 
-def update_model_with_new_invoices(metadata_df):
-    print("\nIelādējam esošo modeli...")
-    nlp = spacy.load("invoice_ner_model")
+def load_model():
+    model_path = resolve_model_path()
+    print(f"\nIelādējam esošo modeli ('{model_path}')...")
+    nlp = spacy.load(model_path)
 
     if "ner" not in nlp.pipe_names:
         ner = nlp.add_pipe("ner")
@@ -78,84 +56,183 @@ def update_model_with_new_invoices(metadata_df):
     for label in ["COMPANY", "INVOICE_NUMBER", "DATE", "AMOUNT", "CURRENCY"]:
         if label not in ner.labels:
             ner.add_label(label)
-
-    TRAIN_DATA = []
+    return nlp
+
+def label_new_invoices(nlp, state, corpus_dir=CORPUS_DIR, workers=None):
+    """
+    Apstrādā gaidošos failus, kas jau ienākuši newpdf/newimages: OCR, anotācija,
+    pievienošana korpusam un pārvietošana uz processed. Atgriež (anotēti, izlaisti)
+    """
+    rows = []
+    for row in state.pending():
+        file_path = get_full_file_path(row['file_path'], row['file_type'])
+        if file_path and os.path.exists(file_path):
+            rows.append((row, file_path))
+    if not rows:
+        return 0, 0
+
+    print(f"Apstrādājam {len(rows)} jaunās pavadzīmes un attēlus...")
+    ocr_results = extract_texts_parallel(((path, row['file_type']) for row, path in rows), workers=workers)
+
+    # Jaunās anotācijas tiek pievienotas korpusam kā jaunas šķembas
+    writer = CorpusWriter(nlp, corpus_dir)
+    added = []
     skipped = 0
 
-    print("Apstrādājam jaunās pavadzīmes un attēlus...")
-    for _, row in tqdm(metadata_df.iterrows(), total=len(metadata_df)):
+    for (row, file_path), (text, error) in tqdm(zip(rows, ocr_results), total=len(rows)):
         try:
-            file_path = get_full_file_path(row['file_path'], row['file_type'])
-            if not file_path or not os.path.exists(file_path):
-                print(f"Failu nevar atrast: {file_path}")
-                skipped += 1
-                continue
-
-            text = extract_text_from_file(file_path, row['file_type'])
+            if error:
+                print(f"Kļūda apstrādājot {file_path}: {error}")
 
             if not text:
+                state.set_status([row['file_path']], "skipped", error=error or "Tukšs teksts")
                 skipped += 1
                 continue
 
-            entities = []
-            company_start = text.find(row['company'])
-            if company_start != -1:
-                entities.append((company_start, company_start + len(row['company']), "COMPANY"))
-
-            inv_start = text.find(row['invoice_number'])
-            if inv_start != -1:
-                entities.append((inv_start, inv_start + len(row['invoice_number']), "INVOICE_NUMBER"))
-
-            date_start = text.find(row['date'])
-            if date_start != -1:
-                entities.append((date_start, date_start + len(row['date']), "DATE"))
-
-            amount_str = f"{row['total_amount']:.2f}"
-            amount_start = text.find(amount_str)
-            if amount_start != -1:
-                entities.append((amount_start, amount_start + len(amount_str), "AMOUNT"))
-
-                currency_start = text.find(row['currency'], amount_start)
-                if currency_start != -1:
-                    entities.append((currency_start, currency_start + len(row['currency']), "CURRENCY"))
-
-            if entities:
-                TRAIN_DATA.append((text, {"entities": entities}))
-                dest_path = os.path.join(PROCESSED_DIR, row['file_path'])
-                shutil.move(file_path, dest_path)
-                metadata_df = metadata_df.drop(index=_)
+            entities = training_entities(text, row)
+
+            dest_path = os.path.join(PROCESSED_DIR, row['file_path'])
+            if entities and writer.add(text, entities, dest_path, content_digest(file_path)):
+                added.append((row['file_path'], file_path, dest_path))
             else:
+                state.set_status([row['file_path']], "skipped", error="Tekstā nav atrastas metadatu vērtības")
                 skipped += 1
 
         except Exception as e:
             print(f"Kļūda apstrādājot {row['file_path']}: {str(e)}")
+            state.set_status([row['file_path']], "skipped", error=str(e))
             skipped += 1
 
-    if not TRAIN_DATA:
+    # Failus pārvietojam tikai pēc tam, kad to anotācijas ir diskā
+    writer.close()
+    for file_name, file_path, dest_path in added:
+        shutil.move(file_path, dest_path)
+        state.set_status([file_name], "labeled", shard=writer.file_shards[dest_path])
+
+    print(get_cache().report())
+    print(f"Anotēti: {len(added)}, izlaisti: {skipped}")
+    return len(added), skipped
+
+def fine_tune(state, nlp=None, corpus_dir=CORPUS_DIR, epochs=5, patience=PATIENCE, force=False):
+    """Papildina aktīvo modeli ar visiem anotētajiem, vēl neapmācītajiem piemēriem un publicē jaunu versiju"""
+    labeled = state.labeled()
+    if not labeled:
         print("❌ Nav derīgu datu. Treniņš netiks veikts.")
-        return
+        return False
 
-    print(f"\nSākam modeļa papildināšanu ar {len(TRAIN_DATA)} piemēriem...")
-    optimizer = nlp.resume_training()
-    for epoch in range(5):
-        random.shuffle(TRAIN_DATA)
-        losses = {}
-        examples = [Example.from_dict(nlp.make_doc(text), ann) for text, ann in TRAIN_DATA]
-        nlp.update(examples, drop=0.3, losses=losses, sgd=optimizer)
-        print(f"Epoha {epoch + 1}, zaudējumi: {losses}")
+    nlp = nlp or load_model()
+    shards = sorted({shard for _, shard, _ in labeled if shard})
 
-    print("\nSaglabājam atjaunināto modeli...")
-    nlp.to_disk("invoice_ner_model")
-    print(f"✅ Modelis veiksmīgi atjaunināts un saglabāts. Izlaistie faili: {skipped}/{len(metadata_df)}")
+    print(f"\nSākam modeļa papildināšanu ar {len(labeled)} piemēriem...")
+    # Veco piemēru buferis, lai modelis neaizmirstu iepriekš apgūto
+    buffer = rehearsal_buffer(nlp.vocab, corpus_dir, exclude=shards)
+    dev_docs = load_dev_docs(nlp.vocab, corpus_dir)
+    print(f"Atkārtošanas buferis: {len(buffer)}, dev dokumenti: {len(dev_docs)}")
+    # Pašreizējā modeļa rezultāts uz tās pašas dev kopas - jaunais nedrīkst būt sliktāks
+    reference = evaluate(nlp, dev_docs)["ents_f"] if dev_docs else None
 
-    # Saglabājam atjaunināto CSV
-    metadata_df.to_csv(CSV_PATH, index=False)
-    print(f"✅ CSV fails veiksmīgi atjaunināts.")
+    optimizer = nlp.resume_training()
+    train_epochs(nlp, optimizer,
+                 lambda epoch: with_rehearsal(
+                     iter_examples(nlp, corpus_dir, shards=shards, split="train", shuffle=True, seed=epoch),
+                     nlp, buffer, seed=epoch),
+                 dev_docs, epochs, patience)
+
+    print("\nSaglabājam atjaunināto modeli kā jaunu versiju...")
+    scores = evaluate(nlp, dev_docs) if dev_docs else None
+    version, promoted = publish(nlp, scores, reference_score=reference,
+                                source="4.update_invoices_model.py", force=force)
+    # Piemēri paliek korpusā arī tad, ja versija netiek aktivizēta (pilnai pārapmācībai)
+    state.set_status([file_name for file_name, _, _ in labeled], "trained")
+    if promoted:
+        print(f"✅ Modelis veiksmīgi atjaunināts: aktīvā versija '{version}'")
+    else:
+        print(f"❌ Versija '{version}' NAV aktivizēta: dev F1 {scores['ents_f']:.2%} < {reference:.2%} (pašreizējais). "
+              f"Aktīvs paliek iepriekšējais modelis.")
+    return promoted
+
+def sync_state(state, metadata_csv=METADATA_CSV_PATH):
+    """Nolasa jaunās metadatu rindas (arī CSV papildinājumus) un atzīmē jau processed mapē esošos failus"""
+    ensure_store(METADATA_PATH, metadata_csv)
+    added = state.import_metadata(METADATA_PATH)
+    if added:
+        print(f"Metadatos atrasti {added} jauni ieraksti")
+    state.sync_processed_dir(PROCESSED_DIR)
+
+def update_model_with_new_invoices(workers=None, corpus_dir=CORPUS_DIR, epochs=5, patience=PATIENCE,
+                                   force=False, state_path=STATE_PATH, metadata_csv=METADATA_CSV_PATH):
+    """Vienreizēja papildināšana: apstrādā visus pieejamos jaunos failus un uzreiz papildina modeli"""
+    state = UpdateState(state_path)
+    try:
+        sync_state(state, metadata_csv)
+        nlp = load_model()
+        label_new_invoices(nlp, state, corpus_dir, workers)
+        fine_tune(state, nlp, corpus_dir, epochs, patience, force)
+        print(f"Stāvoklis: {state.counts()}")
+    finally:
+        state.close()
+
+def watch_new_invoices(workers=None, corpus_dir=CORPUS_DIR, epochs=5, patience=PATIENCE, force=False,
+                       state_path=STATE_PATH, metadata_csv=METADATA_CSV_PATH, interval=WATCH_INTERVAL,
+                       min_examples=UPDATE_MIN_EXAMPLES, max_wait=UPDATE_MAX_WAIT):
+    """
+    Ilgstošs režīms: periodiski apstrādā jaunos failus newpdf/newimages mapēs un papildina
+    modeli, kad uzkrāti min_examples piemēri vai vecākais gaida ilgāk par max_wait sekundēm
+    """
+    state = UpdateState(state_path)
+    # Tokenizators starp versijām nemainās - anotēšanai pietiek ar vienreiz ielādētu modeli
+    nlp = load_model()
+    print(f"Gaida jaunas pavadzīmes mapēs '{PDF_DIR}', '{IMG_DIR}' "
+          f"(papildināšana pie {min_examples} piemēriem vai ik {max_wait / 60:.0f} min)")
+    try:
+        while True:
+            sync_state(state, metadata_csv)
+            label_new_invoices(nlp, state, corpus_dir, workers)
+
+            labeled = state.labeled()
+            if labeled:
+                waited = time.time() - labeled[0][2]
+                if len(labeled) >= min_examples or waited >= max_wait:
+                    print(f"\nUzkrāti {len(labeled)} piemēri (vecākais gaida {waited / 60:.0f} min) - papildinām modeli")
+                    fine_tune(state, None, corpus_dir, epochs, patience, force)
+                    print(f"Stāvoklis: {state.counts()}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\nPapildināšana apturēta")
+    finally:
+        state.close()
 
 # =============================================
 # GALVENĀ IZPILDE
 # =============================================
 
 if __name__ == "__main__":
-    df = pd.read_csv(CSV_PATH)
-    update_model_with_new_invoices(df)
+    import argparse
+
+    parser = argparse.ArgumentParser(description='NER modeļa papildināšana ar jaunām pavadzīmēm')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='OCR procesu skaits (noklusējums: visi CPU kodoli)')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='DocBin korpusa mape (jaunās anotācijas tiek pievienotas)')
+    parser.add_argument('--epochs', type=int, default=5, help='Maksimālais epohu skaits')
+    parser.add_argument('--patience', type=int, default=PATIENCE, help='Epohas bez dev uzlabojuma līdz apstāšanās')
+    parser.add_argument('--force', action='store_true', help='Aktivizēt jauno versiju arī tad, ja dev F1 ir zemāks')
+    parser.add_argument('--state', default=STATE_PATH, help='Apstrādes stāvokļa datubāze')
+    parser.add_argument('--metadata-csv', default=METADATA_CSV_PATH,
+                        help='Jauno pavadzīmju metadatu CSV (papildinātās rindas tiek pārnestas uz krātuvi)')
+    parser.add_argument('--watch', action='store_true',
+                        help='Ilgstošs režīms: gaidīt jaunus failus un papildināt modeli pēc sliekšņiem')
+    parser.add_argument('--interval', type=float, default=WATCH_INTERVAL, help='--watch: sekundes starp pārbaudēm')
+    parser.add_argument('--min-examples', type=int, default=UPDATE_MIN_EXAMPLES,
+                        help='--watch: piemēru skaits, pie kura papildināt modeli')
+    parser.add_argument('--max-wait', type=float, default=UPDATE_MAX_WAIT,
+                        help='--watch: maksimālais gaidīšanas laiks (sekundes) līdz papildināšanai')
+    args = parser.parse_args()
+
+    if args.watch:
+        watch_new_invoices(workers=args.workers, corpus_dir=args.corpus, epochs=args.epochs,
+                           patience=args.patience, force=args.force, state_path=args.state,
+                           metadata_csv=args.metadata_csv, interval=args.interval, min_examples=args.min_examples, max_wait=args.max_wait)
+    else:
+        update_model_with_new_invoices(workers=args.workers, corpus_dir=args.corpus, epochs=args.epochs,
+                                       patience=args.patience, force=args.force, state_path=args.state,
+                                       metadata_csv=args.metadata_csv)
@@ -0,0 +1,228 @@
+from collections import deque
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+MAX_EDIT_DISTANCE = 2        # Maksimālais rediģēšanas attālums OCR kļūdu pieļaušanai
+FUZZY_CHARS_PER_EDIT = 5     # Viena kļūda atļauta uz katriem 5 vērtības simboliem (īsām vērtībām - neviena)
+MIN_CONFIDENCE = 0.8         # Zemākas ticamības atbilstības apmācības datos neizmantojam
+
+EXACT_CONFIDENCE = 1.0       # Vērtība tekstā atrasta burtiski
+NORMALIZED_CONFIDENCE = 0.95 # Atrasta tikai pēc normalizācijas (atstarpes, 0/O, € -> EUR u.c.)
+CURRENCY_MAX_GAP = 3         # Valūta tiek atzīmēta tikai tad, ja starp to un kopsummu ir ne vairāk simbolu
+
+# Simboli, kurus OCR bieži sajauc - tekstu un vērtības salīdzinām pēc kopīgas formas
+_CONFUSABLES = {
+    'o': '0', 'i': '1', 'l': '1', '|': '1', '!': '1', 's': '5', 'b': '8', 'z': '2',
+    ',': '.', '—': '-', '–': '-',
+    # Kirilicas burti, kas izskatās kā latīņu (Tesseract ar lav+eng+rus tos jauc)
+    'а': 'a', 'е': 'e', 'о': '0', 'р': 'p', 'с': 'c', 'у': 'y', 'х': 'x', 'к': 'k',
+    'м': 'm', 'т': 't', 'н': 'h', 'в': '8'
+}
+_CURRENCY_SYMBOLS = {'€': 'eur', '$': 'usd', '₽': 'rub'}
+
+# =============================================
+# NORMALIZĀCIJA
+# =============================================
+
+def normalize(text):
+    """
+    Normalizē tekstu salīdzināšanai un atgriež (normalizētais teksts, pozīciju karte),
+    kur karte[i] ir normalizētā simbola i pozīcija oriģinālajā tekstā.
+    Atstarpju virknes tiek aizstātas ar vienu atstarpi (tabulas šūnas nesaplūst vienā vērtībā),
+    valūtu simboli izvērsti kodos.
+    """
+    chars = []
+    positions = []
+    space = None
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if chars and space is None:
+                space = i
+            continue
+        if space is not None:
+            chars.append(" ")
+            positions.append(space)
+            space = None
+        ch = ch.casefold()
+        replacement = _CURRENCY_SYMBOLS.get(ch) or _CONFUSABLES.get(ch, ch)
+        for out in replacement:
+            chars.append(_CONFUSABLES.get(out, out))
+            positions.append(i)
+    return "".join(chars), positions
+
+# =============================================
+# AHO-CORASICK AUTOMĀTS
+# =============================================
+
+class _Automaton:
+    """Aho-Corasick automāts: visas vērtības tiek meklētas vienā teksta caurskatē"""
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+        for key, pattern in patterns:
+            state = 0
+            for ch in pattern:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append([])
+                    self.goto[state][ch] = nxt
+                state = nxt
+            self.out[state].append((key, len(pattern)))
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text):
+        """Atgriež (sākums, beigas, atslēga) katrai atbilstībai tekstā"""
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(ch, 0)
+            for key, length in self.out[state]:
+                yield i - length + 1, i + 1, key
+
+# =============================================
+# NEPRECĪZA MEKLĒŠANA
+# =============================================
+
+def _fuzzy_find(pattern, text, max_distance):
+    """
+    Meklē pattern tekstā ar rediģēšanas attālumu <= max_distance (Sellers algoritms).
+    Atgriež nepārklājošās atbilstības (sākums, beigas, attālums), labākās vispirms.
+    """
+    m = len(pattern)
+    # prev[j] = (attālums, sākums) vērtības prefiksam j, kas beidzas pie iepriekšējā simbola
+    prev = [(j, 0) for j in range(m + 1)]
+    candidates = []
+
+    for i, ch in enumerate(text):
+        cur = [(0, i + 1)]
+        for j in range(1, m + 1):
+            cost, start = prev[j - 1]
+            best = (cost + (pattern[j - 1] != ch), start)
+            if prev[j][0] + 1 < best[0]:
+                best = (prev[j][0] + 1, prev[j][1])
+            if cur[j - 1][0] + 1 < best[0]:
+                best = (cur[j - 1][0] + 1, cur[j - 1][1])
+            cur.append(best)
+        if cur[m][0] <= max_distance and cur[m][1] <= i:
+            candidates.append((cur[m][0], cur[m][1], i + 1))
+        prev = cur
+
+    matches = []
+    for distance, start, end in sorted(candidates, key=lambda c: (c[0], -(c[2] - c[1]))):
+        if all(end <= s or start >= e for s, e, _ in matches):
+            matches.append((start, end, distance))
+    return matches
+
+# =============================================
+# ANOTĀCIJA
+# =============================================
+
+def _on_boundary(text, start, end):
+    """Atbilstība nedrīkst sākties vai beigties vārda/skaitļa vidū"""
+    def same_class(a, b):
+        return (a.isalpha() and b.isalpha()) or (a.isdigit() and b.isdigit())
+    if start > 0 and same_class(text[start - 1], text[start]):
+        return False
+    if end < len(text) and same_class(text[end - 1], text[end]):
+        return False
+    return True
+
+def annotate(text, patterns, max_distance=MAX_EDIT_DISTANCE):
+    """
+    Atrod visas vērtību atbilstības tekstā.
+    patterns: {label: [vērtības]}
+    Atgriež [(sākums, beigas, label, ticamība)] oriģinālā teksta pozīcijās.
+    """
+    norm_text, positions = normalize(text)
+    entries = []
+    for label, values in patterns.items():
+        for value in values:
+            norm_value = normalize(str(value))[0]
+            if norm_value:
+                entries.append((label, str(value), norm_value))
+
+    spans = {}
+
+    def add(norm_start, norm_end, label, confidence):
+        start, end = positions[norm_start], positions[norm_end - 1] + 1
+        if not _on_boundary(text, start, end):
+            return
+        key = (start, end, label)
+        spans[key] = max(confidence, spans.get(key, 0.0))
+
+    found = set()
+    automaton = _Automaton((key, norm_value) for key, (_, _, norm_value) in enumerate(entries))
+    for norm_start, norm_end, key in automaton.iter(norm_text):
+        label, value, _ = entries[key]
+        start, end = positions[norm_start], positions[norm_end - 1] + 1
+        exact = text[start:end] == value
+        add(norm_start, norm_end, label, EXACT_CONFIDENCE if exact else NORMALIZED_CONFIDENCE)
+        found.add(key)
+
+    # Vērtības, kas netika atrastas pat pēc normalizācijas - pieļaujam dažas OCR kļūdas
+    for key, (label, _, norm_value) in enumerate(entries):
+        if key in found:
+            continue
+        distance_limit = min(max_distance, len(norm_value) // FUZZY_CHARS_PER_EDIT)
+        if distance_limit < 1:
+            continue
+        for norm_start, norm_end, distance in _fuzzy_find(norm_value, norm_text, distance_limit):
+            # Kļūdas pieļaujam vārda/skaitļa iekšienē, nevis pāri vairākiem tekstā atdalītiem vārdiem
+            if norm_text.count(" ", norm_start, norm_end) > norm_value.count(" "):
+                continue
+            add(norm_start, norm_end, label, NORMALIZED_CONFIDENCE * (1 - distance / len(norm_value)))
+
+    return sorted((start, end, label, round(confidence, 3))
+                  for (start, end, label), confidence in spans.items())
+
+def row_patterns(row):
+    """Metadatu rindas vērtības tādā formā, kādā tās parādās pavadzīmes tekstā"""
+    return {
+        "COMPANY": [row['company']],
+        "INVOICE_NUMBER": [row['invoice_number']],
+        "DATE": [row['date']],
+        "AMOUNT": [f"{row['total_amount']:.2f}"],
+        "CURRENCY": [row['currency']]
+    }
+
+def _next_to_amount(entity, amounts):
+    """Vai entītija atrodas tieši pirms vai aiz kādas kopsummas (ne vairāk par CURRENCY_MAX_GAP simboliem)"""
+    start, end, _ = entity
+    return any(max(start - amount_end, amount_start - end) <= CURRENCY_MAX_GAP
+               for amount_start, amount_end, _ in amounts)
+
+def training_entities(text, row, min_confidence=MIN_CONFIDENCE, max_distance=MAX_EDIT_DISTANCE):
+    """
+    Entītijas apmācībai: visas pietiekami ticamās atbilstības bez pārklāšanās
+    (priekšroka ticamākajai, tad garākajai). Valūta (īsa, atkārtojas preču rindās) - tikai blakus kopsummai
+    """
+    spans = [s for s in annotate(text, row_patterns(row), max_distance) if s[3] >= min_confidence]
+    spans.sort(key=lambda s: (-s[3], -(s[1] - s[0])))
+
+    entities = []
+    for start, end, label, _ in spans:
+        if all(end <= s or start >= e for s, e, _ in entities):
+            entities.append((start, end, label))
+
+    amounts = [entity for entity in entities if entity[2] == "AMOUNT"]
+    return sorted(entity for entity in entities
+                  if entity[2] != "CURRENCY" or _next_to_amount(entity, amounts))
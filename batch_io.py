@@ -0,0 +1,187 @@
+import csv
+import glob
+import json
+import os
+
+from invoice_ocr import IMAGE_EXTENSIONS
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+SUPPORTED_EXTENSIONS = ('.pdf',) + IMAGE_EXTENSIONS
+PARQUET_ROW_GROUP_SIZE = 500
+
+# Kolonnas, kas Parquet failā tiek glabātas atsevišķi; pārējie lauki nonāk "extra" (JSON)
+PARQUET_COLUMNS = ("file_path", "company", "invoice_number", "date", "amount", "currency",
+                   "raw_text", "error")
+
+# =============================================
+# FAILU ATRAŠANA
+# =============================================
+
+def _is_supported(path):
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+def _read_manifest(manifest_path):
+    """Nolasa failu sarakstu: CSV ar kolonnu file_path vai vienkāršs saraksts (viens ceļš rindā)"""
+    with open(manifest_path, encoding="utf-8") as f:
+        first_line = f.readline()
+        f.seek(0)
+        if "file_path" in first_line.split(","):
+            return [row["file_path"] for row in csv.DictReader(f) if row.get("file_path")]
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+def discover_files(inputs, manifest=None):
+    """
+    Atrod apstrādājamos failus no mapēm, glob šabloniem, atsevišķiem failiem un manifesta.
+    Atgriež: sakārtotu, unikālu ceļu sarakstu
+    """
+    candidates = list(inputs or [])
+    if manifest:
+        candidates.extend(_read_manifest(manifest))
+
+    files = []
+    for item in candidates:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                files.extend(os.path.join(root, name) for name in sorted(names) if _is_supported(name))
+        elif glob.has_magic(item):
+            files.extend(path for path in sorted(glob.glob(item, recursive=True)) if _is_supported(path))
+        else:
+            files.append(item)
+
+    seen = set()
+    unique = []
+    for path in map(os.path.normpath, files):
+        if path not in seen:
+            seen.add(path)
+            unique.append(path)
+    return unique
+
+# =============================================
+# ATSĀKŠANAS KONTROLPUNKTS
+# =============================================
+
+class Checkpoint:
+    """Pievienošanas režīmā rakstīts saraksts ar jau apstrādātajiem failiem"""
+
+    def __init__(self, path, resume=True):
+        self.path = path
+        self.done = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+        self._f = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def mark(self, file_paths):
+        for file_path in file_paths:
+            self._f.write(file_path + "\n")
+            self.done.add(file_path)
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+# =============================================
+# REZULTĀTU RAKSTĪTĀJI
+# =============================================
+
+class JSONLWriter:
+    """Raksta katru rezultātu kā JSON rindu uzreiz pēc tā saņemšanas"""
+
+    def __init__(self, path, append=True, checkpoint=None):
+        self.path = path
+        self.checkpoint = checkpoint
+        self._f = open(path, "a" if append else "w", encoding="utf-8")
+
+    def write(self, record):
+        self._f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._f.flush()
+        if self.checkpoint:
+            self.checkpoint.mark([record["file_path"]])
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ParquetWriter:
+    """
+    Raksta rezultātus Parquet failā pa rindu grupām (nepieciešams pyarrow).
+    Atsākot darbu, jauni rezultāti tiek rakstīti nākamajā daļas failā (name.part1.parquet, ...)
+    """
+
+    def __init__(self, path, append=True, checkpoint=None, row_group_size=PARQUET_ROW_GROUP_SIZE):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet formātam nepieciešams pyarrow (pip install pyarrow)")
+
+        self._pa = pa
+        self.schema = pa.schema(
+            [(name, pa.string()) for name in PARQUET_COLUMNS] +
+            [("entities", pa.list_(pa.struct([("text", pa.string()), ("label", pa.string()),
+                                              ("start", pa.int64()), ("end", pa.int64()),
+                                              ("source", pa.string())]))),
+             ("extra", pa.string())]
+        )
+
+        if append and os.path.exists(path):
+            stem, ext = os.path.splitext(path)
+            part = 1
+            while os.path.exists(f"{stem}.part{part}{ext}"):
+                part += 1
+            path = f"{stem}.part{part}{ext}"
+
+        self.path = path
+        self.checkpoint = checkpoint
+        self.row_group_size = row_group_size
+        self._buffer = []
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def _to_row(self, record):
+        row = {name: None if record.get(name) is None else str(record[name]) for name in PARQUET_COLUMNS}
+        row["entities"] = record.get("entities", [])
+        extra = {k: v for k, v in record.items() if k not in PARQUET_COLUMNS and k != "entities"}
+        row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+        return row
+
+    def write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist([self._to_row(r) for r in self._buffer], schema=self.schema)
+        self._writer.write_table(table)
+        # Kontrolpunktu atzīmējam tikai pēc tam, kad dati ir diskā
+        if self.checkpoint:
+            self.checkpoint.mark([r["file_path"] for r in self._buffer])
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_writer(path, output_format=None, append=True, checkpoint=None):
+    """Izveido rakstītāju pēc formāta vai faila paplašinājuma (jsonl/parquet)"""
+    output_format = output_format or ("parquet" if path.lower().endswith(".parquet") else "jsonl")
+    if output_format == "parquet":
+        return ParquetWriter(path, append=append, checkpoint=checkpoint)
+    if output_format == "jsonl":
+        return JSONLWriter(path, append=append, checkpoint=checkpoint)
+    raise ValueError(f"Neatbalstīts izvades formāts: {output_format}")
@@ -0,0 +1,17 @@
+import importlib.util
+import os
+
+import numpy as np
+
+# Projekta sakne - skriptiem ar ciparu prefiksu (1.generate_invoices.py u.c.)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_script(file_name, module_name):
+    """Ielādē projekta skriptu kā moduli (skriptu nosaukumi nav derīgi Python importam)"""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(ROOT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
@@ -0,0 +1,237 @@
+"""
+Pavadzīmju apstrādes veiktspējas mērījums no faila līdz rezultātam.
+
+Ģenerē atkārtojamu korpusu (fiksēta sēkla) ar 1.generate_invoices.py, apstrādā katru
+dokumentu ar process_invoice un mēra posmus atsevišķi: teksta slānis, rasterizācija,
+priekšapstrāde, Tesseract, nlp() un rezultāta sagatavošana.
+Rezultāts: p50/p95/p99 latentums, dok./s un maksimālais RSS (JSON), salīdzinājums ar bāzes līniju.
+
+Palaišana no projekta saknes:
+    python -m benchmarks.pipeline --save-baseline      # saglabā bāzes līniju
+    python -m benchmarks.pipeline                      # salīdzina ar bāzes līniju
+"""
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import spacy
+
+import invoice_ocr
+import invoice_rules
+import metadata_store
+from model_registry import resolve_model_path
+from stage_timing import collect
+from benchmarks.common import load_script, percentile
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+CORPUS_DIR = "benchmarks/corpus"
+BASELINE_PATH = "benchmarks/baseline.json"
+OUTPUT_PATH = "benchmarks/results/pipeline.json"
+MODEL_PATH = resolve_model_path()  # Aktīvā reģistra versija vai invoice_ner_model
+
+STAGES = ("text_layer", "rasterize", "language", "preprocess", "tesseract", "ner", "postprocess", "line_items")
+REGRESSION_TOLERANCE = 0.10  # Pieļaujamā pasliktināšanās salīdzinot ar bāzes līniju
+MIN_COMPARABLE_MS = 0.5      # Īsākus posmus nesalīdzinām - tur dominē mērījumu troksnis
+
+# =============================================
+# KORPUSS
+# =============================================
+
+def build_corpus(corpus_dir=CORPUS_DIR, count=20, seed=1234):
+    """Ģenerē (vai atkārtoti izmanto) fiksētas sēklas korpusu: count dokumenti katram formātam"""
+    metadata_path = os.path.join(corpus_dir, "dataset", "metadata")
+    info_path = os.path.join(corpus_dir, "corpus.json")
+    info = {"count": count, "seed": seed}
+
+    if os.path.exists(info_path) and os.path.exists(metadata_path):
+        with open(info_path, encoding="utf-8") as f:
+            if json.load(f) == info:
+                return metadata_store.read(metadata_path).to_pandas()
+
+    print(f"Ģenerē korpusu ({count} dokumenti katram formātam, sēkla {seed})...")
+    generator = load_script("1.generate_invoices.py", "generate_invoices")
+    generator.generate_corpus(count, seed=seed, workers=1, output_dir=corpus_dir, overwrite=True,
+                              reference_date=datetime(2025, 1, 1))
+    df = metadata_store.read(metadata_path).to_pandas()
+    with open(info_path, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    return df
+
+# =============================================
+# MĒRĪJUMI
+# =============================================
+
+def load_nlp(model_path):
+    """Apmācītais modelis, ja pieejams; citādi neapmācīts modelis ar tādu pašu arhitektūru"""
+    if os.path.exists(model_path):
+        return spacy.load(model_path), model_path
+
+    nlp = spacy.blank("xx")
+    ner = nlp.add_pipe("ner")
+    for label in ["COMPANY", "INVOICE_NUMBER", "DATE", "AMOUNT", "CURRENCY"]:
+        ner.add_label(label)
+    nlp.initialize()
+    return nlp, "blank"
+
+def peak_rss_mb():
+    """Maksimālais RSS (MB) šim procesam un apakšprocesiem (Tesseract, Poppler)"""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    # Linux ru_maxrss ir KB, macOS - baitos
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale
+    }
+
+def summarize(values_s):
+    """Latentuma kopsavilkums milisekundēs"""
+    values = [v * 1000 for v in values_s]
+    return {
+        "count": len(values),
+        "mean_ms": float(np.mean(values)) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99)
+    }
+
+def run_benchmark(df, nlp, warmup=2):
+    """Apstrādā korpusu secīgi un atgriež latentumus pa posmiem"""
+    processor = load_script("3.invoices_processor.py", "invoices_processor")
+
+    # Mērām reālu darbu, nevis kešatmiņu vai dublikātu indeksu
+    invoice_ocr.OCR_CACHE_ENABLED = False
+    processor.DEDUP_ENABLED = False
+    if processor.RULES_ENABLED:
+        invoice_rules.add_to_pipeline(nlp)
+
+    for file_path in df['file_path'][:warmup]:
+        processor.process_invoice(nlp, file_path)
+
+    latencies = []
+    stages = {name: [] for name in STAGES}
+    errors = 0
+
+    start = time.perf_counter()
+    for file_path in df['file_path']:
+        with collect() as timings:
+            t0 = time.perf_counter()
+            result = processor.process_invoice(nlp, file_path)
+            latencies.append(time.perf_counter() - t0)
+
+        if "error" in result:
+            print(f"Kļūda apstrādājot {file_path}: {result['error']}")
+            errors += 1
+        for name, seconds in timings.items():
+            stages.setdefault(name, []).append(seconds)
+    wall_time = time.perf_counter() - start
+
+    return {
+        "documents": len(latencies),
+        "errors": errors,
+        "wall_time_s": wall_time,
+        "docs_per_sec": len(latencies) / wall_time if wall_time else 0.0,
+        "end_to_end": summarize(latencies),
+        "stages": {name: summarize(values) for name, values in stages.items() if values}
+    }
+
+# =============================================
+# SALĪDZINĀJUMS AR BĀZES LĪNIJU
+# =============================================
+
+def compare_with_baseline(report, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Izdrukā izmaiņas pret bāzes līniju un atgriež pasliktinājumu sarakstu"""
+    checks = [("end_to_end." + q, report["end_to_end"][q], baseline["end_to_end"][q], False)
+              for q in ("p50_ms", "p95_ms", "p99_ms")]
+    for name, current in report["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base:
+            checks += [(f"{name}.{q}", current[q], base[q], False) for q in ("p50_ms", "p95_ms")]
+    checks.append(("docs_per_sec", report["docs_per_sec"], baseline["docs_per_sec"], True))
+    if report.get("peak_rss_mb") and baseline.get("peak_rss_mb"):
+        checks.append(("peak_rss_mb.self", report["peak_rss_mb"]["self"],
+                       baseline["peak_rss_mb"]["self"], False))
+
+    regressions = []
+    print(f"\n{'Rādītājs':<24} {'bāze':>10} {'tagad':>10} {'izmaiņa':>9}")
+    for name, current, base, higher_is_better in checks:
+        if not base or (name.endswith("_ms") and base < MIN_COMPARABLE_MS):
+            continue
+        change = (current - base) / base
+        worse = -change if higher_is_better else change
+        flag = "  <-- pasliktinājums" if worse > tolerance else ""
+        print(f"{name:<24} {base:>10.2f} {current:>10.2f} {change:>+9.1%}{flag}")
+        if worse > tolerance:
+            regressions.append(name)
+    return regressions
+
+# =============================================
+# GALVENĀ IZPILDES DAĻA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pavadzīmju apstrādes veiktspējas mērījums')
+    parser.add_argument('--count', type=int, default=20, help='Dokumentu skaits katram formātam')
+    parser.add_argument('--seed', type=int, default=1234, help='Korpusa sēkla')
+    parser.add_argument('--corpus-dir', default=CORPUS_DIR)
+    parser.add_argument('--model', default=MODEL_PATH, help='NER modelis (ja nav, neapmācīts)')
+    parser.add_argument('--warmup', type=int, default=2, help='Iesildīšanās dokumenti (netiek mērīti)')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='JSON rezultātu fails')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Bāzes līnijas JSON')
+    parser.add_argument('--save-baseline', action='store_true', help='Saglabāt rezultātu kā bāzes līniju')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE,
+                        help='Pieļaujamā pasliktināšanās (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    df = build_corpus(args.corpus_dir, args.count, args.seed)
+    nlp, model_name = load_nlp(args.model)
+
+    report = run_benchmark(df, nlp, warmup=args.warmup)
+    report.update({
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "corpus": {"count_per_format": args.count, "seed": args.seed},
+        "model": model_name,
+        "ocr_settings": invoice_ocr.ocr_settings(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "spacy": spacy.__version__},
+        "peak_rss_mb": peak_rss_mb()
+    })
+
+    e2e = report["end_to_end"]
+    print(f"\nDokumenti: {report['documents']}, kļūdas: {report['errors']}, "
+          f"{report['docs_per_sec']:.2f} dok./s")
+    print(f"Latentums: p50 {e2e['p50_ms']:.1f} ms, p95 {e2e['p95_ms']:.1f} ms, p99 {e2e['p99_ms']:.1f} ms")
+    for name, s in report["stages"].items():
+        print(f"  {name:<12} p50 {s['p50_ms']:>9.2f} ms  p95 {s['p95_ms']:>9.2f} ms  ({s['count']} dok.)")
+    if report["peak_rss_mb"]:
+        print(f"Maks. RSS: {report['peak_rss_mb']['self']:.0f} MB "
+              f"(apakšprocesi {report['peak_rss_mb']['children']:.0f} MB)")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nRezultāti saglabāti: {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Bāzes līnija saglabāta: {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_with_baseline(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nVeiktspēja pasliktinājusies: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print(f"Bāzes līnija '{args.baseline}' nav atrasta (izmantojiet --save-baseline)")
@@ -0,0 +1,139 @@
+"""
+Priekšapstrādes profilu salīdzinājums uz ģenerētā korpusa:
+latentums (OCR ar priekšapstrādi) un lauku precizitāte.
+
+Palaišana no projekta saknes:
+    python -m benchmarks.preprocess_profiles --limit 60
+"""
+import json
+import os
+import time
+
+import numpy as np
+import spacy
+
+import invoice_ocr
+import metadata_store
+from model_registry import resolve_model_path
+from benchmarks.common import percentile
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+METADATA_PATH = metadata_store.DEFAULT_STORE_PATH
+MODEL_PATH = resolve_model_path()  # Aktīvā reģistra versija vai invoice_ner_model
+OUTPUT_PATH = "benchmarks/results/preprocess_profiles.json"
+
+FIELDS = {
+    "COMPANY": "company",
+    "INVOICE_NUMBER": "invoice_number",
+    "DATE": "date",
+    "AMOUNT": "total_amount",
+    "CURRENCY": "currency"
+}
+
+# =============================================
+# PALĪGFUNKCIJAS
+# =============================================
+
+def expected_values(row):
+    """Metadatu vērtības tādā formā, kādā tās parādās pavadzīmes tekstā"""
+    values = {label: str(row[column]) for label, column in FIELDS.items()}
+    values["AMOUNT"] = f"{row['total_amount']:.2f}"
+    return values
+
+def run_profile(profile, rows, nlp=None):
+    """Apstrādā paraugu ar vienu profilu un atgriež kopsavilkumu"""
+    invoice_ocr.PREPROCESS_PROFILE = profile
+
+    latencies = []
+    found = total = 0
+    correct = 0
+    denoised_pages = ocr_pages = 0
+    errors = 0
+
+    for _, row in rows.iterrows():
+        start = time.perf_counter()
+        try:
+            document = invoice_ocr.extract_document(row['file_path'], row['file_type'])
+        except Exception as e:
+            print(f"Kļūda apstrādājot {row['file_path']}: {str(e)}")
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+
+        for page in document["pages"]:
+            if page["source"] == "ocr":
+                ocr_pages += 1
+                denoised_pages += page.get("preprocess") == "full"
+
+        text = document["text"]
+        expected = expected_values(row)
+        # OCR līmenis: vai lauka vērtība vispār ir atrodama tekstā
+        found += sum(value in text for value in expected.values())
+        total += len(expected)
+
+        # NER līmenis: vai modelis atrod pareizo vērtību
+        if nlp is not None:
+            predicted = {}
+            for ent in nlp(text).ents:
+                predicted.setdefault(ent.label_, ent.text.strip())
+            correct += sum(predicted.get(label) == value for label, value in expected.items())
+
+    return {
+        "profile": profile,
+        "documents": len(latencies),
+        "errors": errors,
+        "latency_mean_s": float(np.mean(latencies)) if latencies else 0.0,
+        "latency_p50_s": percentile(latencies, 50),
+        "latency_p95_s": percentile(latencies, 95),
+        "docs_per_sec": len(latencies) / sum(latencies) if latencies else 0.0,
+        "field_recall": found / total if total else 0.0,
+        "entity_accuracy": correct / total if nlp is not None and total else None,
+        "denoised_page_share": denoised_pages / ocr_pages if ocr_pages else 0.0
+    }
+
+# =============================================
+# GALVENĀ IZPILDES DAĻA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Priekšapstrādes profilu salīdzinājums')
+    parser.add_argument('--metadata', default=METADATA_PATH, help='Ģenerētā korpusa metadatu krātuve (Parquet)')
+    parser.add_argument('--model', default=MODEL_PATH, help='NER modelis (ja nav, mēra tikai OCR)')
+    parser.add_argument('--profiles', nargs='+', default=list(invoice_ocr.PREPROCESS_PROFILES),
+                        choices=invoice_ocr.PREPROCESS_PROFILES)
+    parser.add_argument('--limit', type=int, default=60, help='Dokumentu skaits paraugā')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=OUTPUT_PATH, help='JSON rezultātu fails')
+    args = parser.parse_args()
+
+    df = metadata_store.read(args.metadata).to_pandas()
+    rows = df.sample(n=min(args.limit, len(df)), random_state=args.seed)
+
+    # PDF ar teksta slāni priekšapstrādi neizmanto - salīdzinājumam visas lapas OCR
+    invoice_ocr.PDF_TEXT_STRATEGY = 'ocr'
+
+    nlp = spacy.load(args.model) if os.path.exists(args.model) else None
+    if nlp is None:
+        print(f"Modelis '{args.model}' nav atrasts - mēram tikai OCR lauku atrodamību")
+
+    results = []
+    for profile in args.profiles:
+        print(f"\nProfils '{profile}'...")
+        results.append(run_profile(profile, rows, nlp))
+
+    print(f"\n{'Profils':<8} {'p50 s':>8} {'p95 s':>8} {'dok./s':>8} {'OCR lauki':>10} {'NER':>8} {'denoise':>8}")
+    for r in results:
+        accuracy = f"{r['entity_accuracy']:.1%}" if r['entity_accuracy'] is not None else "-"
+        print(f"{r['profile']:<8} {r['latency_p50_s']:>8.3f} {r['latency_p95_s']:>8.3f} "
+              f"{r['docs_per_sec']:>8.2f} {r['field_recall']:>10.1%} {accuracy:>8} "
+              f"{r['denoised_page_share']:>8.0%}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"sample_size": len(rows), "seed": args.seed, "results": results}, f, indent=2)
+    print(f"\nRezultāti saglabāti: {args.output}")
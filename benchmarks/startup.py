@@ -0,0 +1,92 @@
+"""
+3.invoices_processor.py startēšanas laika budžets.
+
+Palaiž skriptu ar `python -X importtime` ātrajiem izsaukumiem (--help, neeksistējošs fails),
+kuriem nav jāielādē spaCy, OpenCV, Tesseract u.c. smagās atkarības, un pārbauda:
+  - importu laiku (bez paša Python startēšanas importiem) pret IMPORT_BUDGET_MS,
+  - ka neviens no HEAVY_MODULES netiek ielādēts.
+Ja budžets pārsniegts, beidz darbu ar kodu 1. Tā pati pārbaude ir testā tests/test_startup.py.
+
+Palaišana no projekta saknes:
+    python -m benchmarks.startup
+"""
+import statistics
+import subprocess
+import sys
+
+from benchmarks.common import ROOT_DIR
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+SCRIPT = "3.invoices_processor.py"
+SCENARIOS = {
+    "help": ["--help"],
+    "missing_file": ["neeksistejoss_fails.pdf"]
+}
+IMPORT_BUDGET_MS = 150   # Skripta importu laiks (mediāna), neskaitot Python startēšanu
+HEAVY_MODULES = ("spacy", "thinc", "cv2", "numpy", "pandas", "pyarrow", "pytesseract", "tesserocr",
+                 "pdf2image", "pymupdf", "PIL", "tqdm")
+REPEAT = 5
+
+# =============================================
+# MĒRĪJUMS
+# =============================================
+
+def import_profile(args):
+    """
+    Palaiž Python ar -X importtime. Atgriež (augšējā līmeņa moduļi -> kumulatīvais laiks µs, visi moduļi)
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT_DIR,
+                               capture_output=True, text=True)
+    top_level = {}
+    modules = set()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue  # Virsraksta rinda
+        modules.add(name.strip())
+        if not name[1:].startswith(" "):
+            top_level[name.strip()] = int(cumulative)
+    return top_level, modules
+
+def measure(args, repeat=REPEAT):
+    """Skripta importu laiks (ms, mediāna) un ielādētie smagie moduļi"""
+    interpreter, _ = import_profile(["-c", "pass"])
+    times = []
+    heavy = set()
+    for _ in range(repeat):
+        top_level, modules = import_profile([SCRIPT, *args])
+        times.append(sum(us for name, us in top_level.items() if name not in interpreter) / 1000)
+        heavy |= {m for m in modules if m.split(".")[0] in HEAVY_MODULES}
+    return statistics.median(times), sorted({m.split(".")[0] for m in heavy})
+
+# =============================================
+# GALVENĀ IZPILDES DAĻA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='3.invoices_processor.py startēšanas laika budžets')
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET_MS, help='Importu laika budžets (ms)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='Mērījumu skaits katram scenārijam')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'Scenārijs':<14} {'importi':>10}  smagie moduļi")
+    for name, script_args in SCENARIOS.items():
+        import_ms, heavy = measure(script_args, args.repeat)
+        print(f"{name:<14} {import_ms:>7.1f} ms  {', '.join(heavy) or '-'}")
+        if import_ms > args.budget:
+            failures.append(f"{name}: {import_ms:.1f} ms > {args.budget:.0f} ms")
+        if heavy:
+            failures.append(f"{name}: ielādēti {', '.join(heavy)}")
+
+    if failures:
+        print("\nStartēšanas budžets pārsniegts:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print(f"\nBudžets ievērots (≤ {args.budget:.0f} ms, bez smagajām atkarībām)")
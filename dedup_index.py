@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from ocr_cache import file_digest
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+DEFAULT_INDEX_PATH = "invoices/dedup_index.sqlite"
+
+SHINGLE_SIZE = 5                 # Teksta fragmentu (simbolu n-grammu) garums
+NUM_PERM = 64                    # MinHash paraksta garums
+LSH_BANDS = 8                    # Paraksts sadalīts joslās; kandidāts - ja sakrīt kaut viena josla
+NEAR_DUPLICATE_THRESHOLD = 0.9   # Novērtētā Žakāra līdzība, no kuras dokumentu uzskatām par dublikātu
+MAX_CANDIDATES = 100             # Vienā meklēšanā pārbaudīto kandidātu skaits
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.RandomState(1)
+_PERM_A = _rng.randint(1, _PRIME, NUM_PERM).astype(np.uint64)
+_PERM_B = _rng.randint(0, _PRIME, NUM_PERM).astype(np.uint64)
+
+# =============================================
+# TEKSTA PARAKSTS (MinHash)
+# =============================================
+
+def minhash(text):
+    """MinHash paraksts no teksta simbolu n-grammām (uint32 masīvs) vai None, ja teksts pārāk īss"""
+    norm = " ".join(text.lower().split())
+    grams = {norm[i:i + SHINGLE_SIZE] for i in range(len(norm) - SHINGLE_SIZE + 1)}
+    if not grams:
+        return None
+    x = np.fromiter((zlib.crc32(g.encode("utf-8")) & _PRIME for g in grams), dtype=np.uint64, count=len(grams))
+    return ((np.outer(x, _PERM_A) + _PERM_B) % _PRIME).min(axis=0).astype(np.uint32)
+
+def similarity(a, b):
+    """Novērtētā Žakāra līdzība starp diviem parakstiem"""
+    return float(np.mean(a == b))
+
+def _band_buckets(signature):
+    """Katras joslas vērtību kontrolsumma (SQLite INTEGER) - LSH indeksa atslēgas"""
+    rows = len(signature) // LSH_BANDS
+    buckets = []
+    for band in range(LSH_BANDS):
+        payload = bytes([band]) + signature[band * rows:(band + 1) * rows].tobytes()
+        buckets.append(int.from_bytes(hashlib.blake2b(payload, digest_size=8).digest(), "little", signed=True))
+    return buckets
+
+def invoice_key(value):
+    """Pavadzīmes numura / uzņēmuma salīdzināšanas forma (bez reģistra, atstarpēm un pieturzīmēm)"""
+    return re.sub(r"[\W_]+", "", str(value).lower())
+
+# =============================================
+# DUBLIKĀTU INDEKSS
+# =============================================
+
+class DedupIndex:
+    """
+    Jau apstrādāto dokumentu indekss SQLite datubāzē:
+      - precīzi dublikāti pēc faila satura kontrolsummas,
+      - gandrīz dublikāti (piem., tā pati pavadzīme PDF un skenētā attēlā) pēc teksta MinHash, LSH joslās,
+      - pavadzīmes numura + uzņēmuma pāri, kas jau redzēti citā failā.
+    Visi meklējumi izmanto indeksus, tāpēc paliek ātri arī pie miljoniem ierakstu.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                digest TEXT NOT NULL,
+                model TEXT NOT NULL,
+                file_path TEXT,
+                signature BLOB,
+                result TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (digest, model)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS lsh_buckets (
+                bucket INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (bucket, digest)
+            ) WITHOUT ROWID
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS invoices (
+                company TEXT NOT NULL,
+                invoice_number TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                file_path TEXT,
+                created REAL NOT NULL,
+                PRIMARY KEY (company, invoice_number)
+            ) WITHOUT ROWID
+        """)
+        self._conn.commit()
+
+    def find_exact(self, digest, model="", exclude_path=None):
+        """
+        Rezultāts failam ar tādu pašu saturu: {"file_path", "result", "similarity"} vai None.
+        exclude_path: ieraksts ar šo ceļu (tas pats fails) netiek uzskatīts par dublikātu
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT file_path, result FROM documents WHERE digest = ? AND model = ?", (digest, model)
+            ).fetchone()
+        if row is None or (exclude_path is not None and row[0] == exclude_path):
+            return None
+        return {"file_path": row[0], "result": json.loads(row[1]), "similarity": 1.0}
+
+    def find_similar(self, signature, model="", threshold=NEAR_DUPLICATE_THRESHOLD, exclude_path=None):
+        """
+        Līdzīgākais dokuments ar līdzību >= threshold: {"file_path", "result", "similarity"} vai None.
+        exclude_path: kā find_exact
+        """
+        if signature is None:
+            return None
+        buckets = _band_buckets(signature)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT d.file_path, d.signature, d.result FROM documents d "
+                f"WHERE d.model = ? AND d.digest IN (SELECT digest FROM lsh_buckets WHERE bucket IN "
+                f"({','.join('?' * len(buckets))}) LIMIT ?)",
+                (model, *buckets, MAX_CANDIDATES)
+            ).fetchall()
+
+        best = None
+        for file_path, blob, result in rows:
+            if not blob or (exclude_path is not None and file_path == exclude_path):
+                continue
+            score = similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, file_path, result)
+        if best is None:
+            return None
+        return {"file_path": best[1], "result": json.loads(best[2]), "similarity": round(best[0], 3)}
+
+    def add(self, digest, file_path, signature, result, model=""):
+        """Saglabā dokumenta rezultātu (un teksta parakstu gandrīz dublikātu meklēšanai)"""
+        blob = signature.tobytes() if signature is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (digest, model, file_path, signature, result, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (digest, model, file_path, blob, json.dumps(result, ensure_ascii=False), time.time())
+            )
+            if signature is not None:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO lsh_buckets (bucket, digest) VALUES (?, ?)",
+                    [(bucket, digest) for bucket in _band_buckets(signature)]
+                )
+            self._conn.commit()
+
+    def register_invoice(self, company, invoice_number, digest, file_path):
+        """
+        Reģistrē pavadzīmes numura un uzņēmuma pāri.
+        Atgriež faila ceļu, kurā šis pāris redzēts pirmo reizi, ja tas ir cits fails; citādi None
+        """
+        key = (invoice_key(company), invoice_key(invoice_number))
+        if not all(key):
+            return None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO invoices (company, invoice_number, digest, file_path, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (*key, digest, file_path, time.time())
+            )
+            self._conn.commit()
+            first_digest, first_path = self._conn.execute(
+                "SELECT digest, file_path FROM invoices WHERE company = ? AND invoice_number = ?", key
+            ).fetchone()
+        return first_path if first_digest != digest and first_path != file_path else None
+
+    def invalidate(self, file_paths=None):
+        """
+        Dzēš ierakstus norādītajiem failiem vai visu indeksu. Faili tiek atrasti pēc saglabātā ceļa
+        un, ja fails vēl eksistē, arī pēc satura (tā pati kopija citā ceļā). Atgriež dzēsto dokumentu skaitu
+        """
+        with self._lock:
+            if file_paths is None:
+                removed = self._conn.execute("DELETE FROM documents").rowcount
+                self._conn.execute("DELETE FROM lsh_buckets")
+                self._conn.execute("DELETE FROM invoices")
+            else:
+                file_paths = list(file_paths)
+                digests = {file_digest(p) for p in file_paths if os.path.isfile(p)}
+                for path in file_paths:
+                    digests.update(row[0] for row in self._conn.execute(
+                        "SELECT digest FROM documents WHERE file_path = ?", (path,)))
+                removed = 0
+                for digest in digests:
+                    removed += self._conn.execute("DELETE FROM documents WHERE digest = ?", (digest,)).rowcount
+                    self._conn.execute("DELETE FROM lsh_buckets WHERE digest = ?", (digest,))
+                    self._conn.execute("DELETE FROM invoices WHERE digest = ?", (digest,))
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            return removed
+
+    def counts(self):
+        with self._lock:
+            return {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table in ("documents", "invoices")}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# =============================================
+# KOMANDRINDA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Dublikātu indeksa pārvaldība')
+    parser.add_argument('--path', default=DEFAULT_INDEX_PATH, help='Indeksa datubāzes ceļš')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Parāda indeksa statistiku')
+    subparsers.add_parser('clear', help='Iztīra visu indeksu')
+    invalidate_parser = subparsers.add_parser('invalidate', help='Dzēš ierakstus norādītajiem failiem')
+    invalidate_parser.add_argument('files', nargs='+',
+                                   help='Faili (vai saglabātie nosaukumi, piem., upload:invoice.pdf), kuru rezultāti jādzēš')
+    args = parser.parse_args()
+
+    index = DedupIndex(args.path)
+    if args.command == 'stats':
+        counts = index.counts()
+        print(f"Dokumenti: {counts['documents']}")
+        print(f"Pavadzīmju numuri: {counts['invoices']}")
+    elif args.command == 'clear':
+        print(f"Dzēsti {index.invalidate()} ieraksti")
+    elif args.command == 'invalidate':
+        print(f"Dzēsti {index.invalidate(args.files)} ieraksti")
+    index.close()
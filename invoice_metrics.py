@@ -0,0 +1,128 @@
+import os
+import threading
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+# Histogrammu robežas sekundēs (no milisekundēm līdz minūtei)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# =============================================
+# VIENA REZULTĀTA METRIKAS
+# =============================================
+
+def document_metrics(document, timings, total_seconds):
+    """
+    Sagatavo viena dokumenta metrikas rezultātam:
+    posmu ilgumi, lapu skaits, attēlu izmēri un simbolu skaits
+    """
+    pages = document.get("pages", [])
+    return {
+        "total_s": round(total_seconds, 6),
+        "stages_s": {name: round(seconds, 6) for name, seconds in timings.items()},
+        "page_count": len(pages),
+        "ocr_pages": sum(1 for p in pages if p["source"] == "ocr"),
+        "image_sizes": [[p["width"], p["height"]] for p in pages if "width" in p],
+        "text_chars": len(document.get("text", "")),
+        "ocr_cache_hit": bool(document.get("cache_hit"))
+    }
+
+# =============================================
+# PROMETHEUS METRIKAS
+# =============================================
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += 1
+        self.sum += value
+
+def _labels(**labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+class MetricsRegistry:
+    """Apkopotās metrikas pakešapstrādes un servisa režīmam (Prometheus teksta formātā)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = {}          # status -> skaits
+        self.pages = {}              # source -> skaits
+        self.text_chars = 0
+        self.cache = {}              # hit/miss -> skaits
+        self.document_seconds = _Histogram(DURATION_BUCKETS)
+        self.stage_seconds = {}      # stage -> _Histogram
+
+    def observe(self, result):
+        """Pieskaita viena rezultāta datus (result["metrics"] ir tikai, ja metrikas ieslēgtas)"""
+        status = "error" if "error" in result else "ok"
+        metrics = result.get("metrics")
+        with self._lock:
+            self.documents[status] = self.documents.get(status, 0) + 1
+            for page in result.get("pages", []):
+                self.pages[page["source"]] = self.pages.get(page["source"], 0) + 1
+            if not metrics:
+                return
+
+            self.text_chars += metrics["text_chars"]
+            key = "hit" if metrics["ocr_cache_hit"] else "miss"
+            self.cache[key] = self.cache.get(key, 0) + 1
+            self.document_seconds.observe(metrics["total_s"])
+            for name, seconds in metrics["stages_s"].items():
+                if name not in self.stage_seconds:
+                    self.stage_seconds[name] = _Histogram(DURATION_BUCKETS)
+                self.stage_seconds[name].observe(seconds)
+
+    def render(self):
+        """Atgriež metrikas Prometheus teksta formātā"""
+        lines = []
+
+        def counter(name, help_text, values, label):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for value, count in sorted(values.items()):
+                lines.append(f"{name}{_labels(**{label: value})} {count}")
+
+        def histogram(name, hist, **labels):
+            for bound, count in zip(hist.buckets, hist.counts):
+                lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+            lines.append(f"{name}_bucket{_labels(**labels, le='+Inf')} {hist.total}")
+            lines.append(f"{name}_sum{_labels(**labels)} {hist.sum:.6f}")
+            lines.append(f"{name}_count{_labels(**labels)} {hist.total}")
+
+        with self._lock:
+            counter("invoice_documents_total", "Apstrādātās pavadzīmes pēc statusa", self.documents, "status")
+            counter("invoice_pages_total", "Apstrādātās lapas pēc teksta avota", self.pages, "source")
+            counter("invoice_ocr_cache_lookups_total", "OCR kešatmiņas pieprasījumi", self.cache, "result")
+
+            lines.append("# HELP invoice_text_chars_total Iegūtā teksta simbolu skaits")
+            lines.append("# TYPE invoice_text_chars_total counter")
+            lines.append(f"invoice_text_chars_total {self.text_chars}")
+
+            lines.append("# HELP invoice_document_duration_seconds Viena dokumenta apstrādes ilgums")
+            lines.append("# TYPE invoice_document_duration_seconds histogram")
+            histogram("invoice_document_duration_seconds", self.document_seconds)
+
+            lines.append("# HELP invoice_stage_duration_seconds Apstrādes posma ilgums vienam dokumentam")
+            lines.append("# TYPE invoice_stage_duration_seconds histogram")
+            for name, hist in sorted(self.stage_seconds.items()):
+                histogram("invoice_stage_duration_seconds", hist, stage=name)
+
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Atomāri ieraksta metrikas failā (piem., node_exporter textfile kolektoram)"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
@@ -0,0 +1,571 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import cv2
+import numpy as np
+
+from ocr_backend import create_backend, resolve_backend_name
+from ocr_cache import OCRCache, DEFAULT_CACHE_PATH, DEFAULT_MAX_BYTES
+from stage_timing import stage, collect
+
+# =============================================
+# KONFIGURĀCIJA - LABOT ATBILSTOŠI SAVAI SISTĒMAI
+# =============================================
+
+# Ceļi uz nepieciešamajiem komponentiem
+TESSERACT_PATH = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+POPPLER_PATH = r'C:\Program Files\poppler-24.08.0\Library\bin'
+
+# OCR valodu konfigurācija
+OCR_LANGUAGES = 'lav+eng+rus'
+
+# OCR dzinējs: 'tesserocr' - Tesseract API procesā (katram pavedienam savs inicializēts dzinējs,
+# attēli no atmiņas), 'pytesseract' - tesseract.exe izsaukums katrai lapai, 'auto' - tesserocr, ja instalēts
+OCR_BACKEND = 'auto'
+TESSDATA_PATH = None  # tesserocr: tessdata mape (None - tesserocr noklusējums)
+
+# Valodas noteikšana katram dokumentam: ātra pārbaude (samazināts lapas augšdaļas attēls vai
+# PDF teksta slānis), pēc tam pilns OCR tikai ar vienu valodu. Ja noteikšana nav droša -
+# OCR_LANGUAGES. False - vienmēr OCR_LANGUAGES
+LANGUAGE_DETECTION = True
+LANGUAGE_PROBE_CROP = 0.35      # Pārbaudei izmantotā lapas augšējā daļa
+LANGUAGE_PROBE_SCALE = 0.6      # Pārbaudes attēla mērogs
+LANGUAGE_MIN_LETTERS = 20       # Mazāk burtu - noteikšana nav droša
+LANGUAGE_MIN_CONFIDENCE = 0.8   # Dominējošās rakstības burtu īpatsvars, kas vajadzīgs vienai valodai
+LATVIAN_LETTERS = set("āčēģīķļņšūžĀČĒĢĪĶĻŅŠŪŽ")
+LATVIAN_LETTER_SHARE = 0.08     # Aptuvenais burtu ar diakritiskajām zīmēm īpatsvars latviešu tekstā
+LANGUAGE_LATIN_FALLBACK = 'lav+eng'  # Latīņu rakstība bez skaidrām valodas pazīmēm
+# Bieži angļu vārdi pavadzīmēs (bez tādiem, kas ir arī latviešu vārdi, piem., "no", "to")
+ENGLISH_WORDS = {"invoice", "date", "total", "the", "and", "of", "for", "bill", "amount", "price",
+                 "quantity", "description", "item", "tax", "due", "payment"}
+
+# Priekšapstrādes parametri (ietekmē OCR kešatmiņas atslēgu)
+PDF_DPI = 200           # pdf2image noklusējuma izšķirtspēja
+PDF_RASTER_WINDOW = 1   # Cik lapas rasterizē vienā Poppler izsaukumā (ierobežo atmiņas patēriņu)
+THRESHOLD_METHOD = 'otsu'
+DENOISE_H = 10
+
+# Priekšapstrādes profils:
+#   'none' - attēls tiek padots Tesseract bez izmaiņām (tikai pelēktoņi)
+#   'fast' - pelēktoņi + Otsu slieksnis
+#   'full' - pelēktoņi + Otsu slieksnis + fastNlMeansDenoising (lēns)
+#   'auto' - kā 'fast', bet trokšņus mazina tikai tad, ja attēlā konstatēti trokšņi
+PREPROCESS_PROFILE = 'auto'
+PREPROCESS_PROFILES = ('none', 'fast', 'full', 'auto')
+NOISE_SPECKLE_THRESHOLD = 0.3   # Sīko punktu īpatsvars, virs kura 'auto' mazina trokšņus
+SPECKLE_MAX_AREA = 2            # Savienotas komponentes līdz šim laukumam (px) uzskatām par troksni
+
+# Samazināšana līdz mērķa izšķirtspējai (None - nesamazināt).
+# PDF lapas uzreiz tiek rasterizētas ar šo DPI; attēliem pieņemam IMAGE_SOURCE_DPI.
+TARGET_DPI = None
+IMAGE_SOURCE_DPI = 200
+
+# PDF teksta iegūšanas stratēģija:
+#   'auto' - nolasa iegulto teksta slāni; OCR tikai lapām bez teksta (skenētām)
+#   'ocr'  - vienmēr rasterizē un veic OCR visām lapām
+PDF_TEXT_STRATEGY = 'auto'
+MIN_TEXT_LAYER_CHARS = 20  # Mazāk simbolu lapā nozīmē, ka teksta slāņa praktiski nav
+
+# OCR režīms:
+#   'text'   - image_to_string visai lapai (tikai teksts)
+#   'layout' - image_to_data: teksts + vārdu koordinātes un ticamība lapas informācijā;
+#              ja norādīts OCR_TEMPLATE, OCR tiek veikts tikai šablona reģionos
+OCR_MODE = 'text'
+OCR_TEMPLATE = None
+
+# Reģionu šabloni zināmiem izkārtojumiem. Koordinātes - lapas daļās (x, y, platums, augstums),
+# tāpēc neatkarīgas no DPI. psm/lang: Tesseract --psm un valoda reģionam (None - noklusējums)
+REGION_TEMPLATES = {
+    # 1.generate_invoices.py: create_pdf_invoice (A4)
+    'generated_pdf': [
+        {"name": "header", "box": (0.0, 0.0, 1.0, 0.15), "psm": 6, "lang": None},
+        {"name": "body", "box": (0.0, 0.17, 1.0, 0.45), "psm": 6, "lang": None}
+    ],
+    # 1.generate_invoices.py: create_image_invoice (800x1200)
+    'generated_image': [
+        {"name": "header", "box": (0.0, 0.0, 1.0, 0.14), "psm": 6, "lang": None},
+        {"name": "body", "box": (0.0, 0.15, 1.0, 0.40), "psm": 6, "lang": None}
+    ]
+}
+
+# OCR kešatmiņa
+OCR_CACHE_ENABLED = True
+OCR_CACHE_PATH = DEFAULT_CACHE_PATH
+OCR_CACHE_MAX_BYTES = DEFAULT_MAX_BYTES
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# =============================================
+# PALĪGFUNKCIJAS
+# =============================================
+
+def ocr_settings():
+    """Visi iestatījumi, kas ietekmē OCR rezultātu - izmanto kešatmiņas atslēgā"""
+    return {
+        "dpi": PDF_DPI,
+        "render": "gray",
+        "langs": OCR_LANGUAGES,
+        "lang_detection": {
+            "probe_crop": LANGUAGE_PROBE_CROP,
+            "probe_scale": LANGUAGE_PROBE_SCALE,
+            "min_letters": LANGUAGE_MIN_LETTERS,
+            "min_confidence": LANGUAGE_MIN_CONFIDENCE,
+            "latvian_letters": "".join(sorted(LATVIAN_LETTERS)),
+            "latvian_share": LATVIAN_LETTER_SHARE,
+            "latin_fallback": LANGUAGE_LATIN_FALLBACK,
+            "english_words": sorted(ENGLISH_WORDS)
+        } if LANGUAGE_DETECTION else False,
+        "backend": _backend.name if _backend is not None else resolve_backend_name(OCR_BACKEND),
+        "threshold": THRESHOLD_METHOD,
+        "denoise_h": DENOISE_H,
+        "preprocess": PREPROCESS_PROFILE,
+        "noise_threshold": NOISE_SPECKLE_THRESHOLD if PREPROCESS_PROFILE == 'auto' else None,
+        "target_dpi": TARGET_DPI,
+        "pdf_strategy": PDF_TEXT_STRATEGY,
+        "min_text_layer_chars": MIN_TEXT_LAYER_CHARS,
+        "mode": OCR_MODE,
+        "regions": REGION_TEMPLATES[OCR_TEMPLATE] if OCR_MODE == 'layout' and OCR_TEMPLATE else None
+    }
+
+def detect_file_type(file_path):
+    """Nosaka faila tipu pēc paplašinājuma"""
+    file_ext = os.path.splitext(file_path)[1].lower()
+    if file_ext == '.pdf':
+        return 'pdf'
+    if file_ext in IMAGE_EXTENSIONS:
+        return file_ext[1:]
+    raise ValueError(f"Nepareizs faila formāts: {file_ext}")
+
+def estimate_noise(binary):
+    """
+    Novērtē trokšņu līmeni binarizētā attēlā: sīko (<= SPECKLE_MAX_AREA px) tumšo
+    komponenšu īpatsvars starp visām komponentēm. Tīrā renderējumā tas ir tuvu 0.
+    """
+    count, _, stats, _ = cv2.connectedComponentsWithStats(255 - binary, connectivity=8)
+    if count <= 1:
+        return 0.0
+    areas = stats[1:, cv2.CC_STAT_AREA]  # 0. komponente ir fons
+    return float(np.count_nonzero(areas <= SPECKLE_MAX_AREA)) / len(areas)
+
+def downscale_to_target_dpi(gray, source_dpi):
+    """Samazina attēlu līdz TARGET_DPI (nekad nepalielina)"""
+    if not TARGET_DPI or source_dpi <= TARGET_DPI:
+        return gray
+    scale = TARGET_DPI / source_dpi
+    return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+def preprocess_image(image, profile=None):
+    """
+    Attēlu priekšapstrāde OCR uzlabošanai (pieņem BGR vai jau pelēktoņu attēlu)
+    Atgriež: (apstrādātais attēls, faktiski izmantotais profils)
+    """
+    profile = profile or PREPROCESS_PROFILE
+    if profile not in PREPROCESS_PROFILES:
+        raise ValueError(f"Nezināms priekšapstrādes profils: {profile}")
+
+    # Konvertē uz pelēko toņu
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if profile == 'none':
+        return gray, 'none'
+
+    # Adaptīvs slieksnis
+    thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]
+    if profile == 'fast':
+        return thresh, 'fast'
+    if profile == 'auto' and estimate_noise(thresh) < NOISE_SPECKLE_THRESHOLD:
+        return thresh, 'fast'
+
+    # Trokšņu mazināšana
+    denoised = cv2.fastNlMeansDenoising(thresh, h=DENOISE_H)
+
+    return denoised, 'full'
+
+_backend = None
+
+def get_backend():
+    """Šī procesa OCR dzinējs (izveido pēc pirmā pieprasījuma)"""
+    global _backend
+    if _backend is None:
+        _backend = create_backend(OCR_BACKEND, TESSDATA_PATH, TESSERACT_PATH)
+    return _backend
+
+def ocr_words(image, lang=None, psm=None, offset=(0, 0)):
+    """
+    Tesseract image_to_data: atpazītie vārdi ar koordinātēm (lapas pikseļos) un ticamību
+    Atgriež: [{"text", "conf", "box": [x, y, platums, augstums], "line": (bloks, rindkopa, rinda)}]
+    """
+    data = get_backend().image_to_data(image, lang or OCR_LANGUAGES, psm)
+    words = []
+    for i, text in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not text.strip():
+            continue
+        words.append({
+            "text": text,
+            "conf": round(conf, 1),
+            "box": [data["left"][i] + offset[0], data["top"][i] + offset[1], data["width"][i], data["height"][i]],
+            "line": (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        })
+    return words
+
+def words_to_text(words):
+    """Saliek vārdus rindās tādā secībā, kādā Tesseract tos atgrieza"""
+    lines = []
+    current = None
+    for word in words:
+        if word["line"] != current:
+            lines.append([])
+            current = word["line"]
+        lines[-1].append(word["text"])
+    return "\n".join(" ".join(line) for line in lines)
+
+def ocr_layout(image, lang=None):
+    """
+    OCR ar vārdu koordinātēm. Ja izvēlēts OCR_TEMPLATE, atpazīst tikai šablona reģionus
+    (katram var būt savs --psm un valoda), nevis visu lapu.
+    Atgriež: (teksts, {"words": [...], "regions": [...], "mean_conf": ...})
+    """
+    height, width = image.shape[:2]
+    regions = REGION_TEMPLATES[OCR_TEMPLATE] if OCR_TEMPLATE else [
+        {"name": "page", "box": (0.0, 0.0, 1.0, 1.0), "psm": None, "lang": None}
+    ]
+
+    all_words = []
+    region_info = []
+    for region in regions:
+        rx, ry, rw, rh = region["box"]
+        x0, y0 = int(rx * width), int(ry * height)
+        x1, y1 = min(int((rx + rw) * width), width), min(int((ry + rh) * height), height)
+        words = ocr_words(image[y0:y1, x0:x1], region["lang"] or lang, region["psm"], offset=(x0, y0))
+        for word in words:
+            word["region"] = region["name"]
+        all_words.extend(words)
+        region_info.append({"name": region["name"], "box": [x0, y0, x1 - x0, y1 - y0],
+                            "text": words_to_text(words)})
+
+    for word in all_words:
+        del word["line"]
+    text = "\n".join(r["text"] for r in region_info if r["text"]).strip()
+    mean_conf = sum(w["conf"] for w in all_words) / len(all_words) if all_words else 0.0
+    return text, {"words": all_words, "regions": region_info, "mean_conf": round(mean_conf, 1)}
+
+def language_from_text(text):
+    """
+    Nosaka valodu pēc burtu histogrammas: kirilica -> rus, latīņu ar latviešu diakritiskajām
+    zīmēm -> lav. eng tikai tad, ja atrasti angļu vārdi; tā ticamība zemāka īsam tekstam, kurā
+    diakritisko zīmju trūkums var būt nejaušs (vai pazaudēts mazas izšķirtspējas pārbaudē).
+    Latīņu teksts bez pazīmēm -> LANGUAGE_LATIN_FALLBACK. Atgriež (valoda vai None, ticamība)
+    """
+    letters = [c for c in text if c.isalpha()]
+    if len(letters) < LANGUAGE_MIN_LETTERS:
+        return None, 0.0
+    cyrillic = sum('\u0400' <= c <= '\u04ff' for c in letters) / len(letters)
+    if cyrillic >= 0.5:
+        return 'rus', cyrillic
+    latin = 1.0 - cyrillic
+    if any(c in LATVIAN_LETTERS for c in letters):
+        return 'lav', latin
+    words = "".join(c if c.isalpha() else " " for c in text.lower()).split()
+    if not any(word in ENGLISH_WORDS for word in words):
+        return LANGUAGE_LATIN_FALLBACK, latin
+    # Varbūtība, ka tikpat garā latviešu tekstā nav nevienas diakritiskās zīmes
+    missing = (1.0 - LATVIAN_LETTER_SHARE) ** len(letters)
+    return 'eng', latin * (1.0 - missing)
+
+def detect_language(image=None, text=None):
+    """
+    Izvēlas Tesseract valodu dokumentam: no jau zināma teksta (PDF teksta slānis)
+    vai ātra OCR uz samazinātas lapas augšdaļas ar visām valodām.
+    Atgriež: {"lang", "detected", "confidence", "method", "fallback"}
+    """
+    if not LANGUAGE_DETECTION:
+        return {"lang": OCR_LANGUAGES, "detected": None, "confidence": None, "method": None, "fallback": True}
+
+    method = "text_layer"
+    if text is None:
+        method = "probe"
+        with stage("language"):
+            crop = image[:max(int(image.shape[0] * LANGUAGE_PROBE_CROP), 1)]
+            thumb = cv2.resize(crop, None, fx=LANGUAGE_PROBE_SCALE, fy=LANGUAGE_PROBE_SCALE,
+                               interpolation=cv2.INTER_AREA)
+            text = get_backend().image_to_string(thumb, OCR_LANGUAGES, psm=6)
+
+    detected, confidence = language_from_text(text)
+    if detected is None:
+        lang = OCR_LANGUAGES
+    elif confidence < LANGUAGE_MIN_CONFIDENCE:
+        # Nedrošs eng - vismaz latīņu valodas kopā, lai nepazaudētu garumzīmes
+        lang = LANGUAGE_LATIN_FALLBACK if detected == 'eng' else OCR_LANGUAGES
+    else:
+        lang = detected
+    fallback = lang != detected or lang == LANGUAGE_LATIN_FALLBACK
+    return {"lang": lang, "detected": detected,
+            "confidence": round(confidence, 3), "method": method, "fallback": fallback}
+
+def ocr_image(image, lang=None):
+    """
+    Priekšapstrāde un Tesseract OCR vienam attēlam
+    Atgriež: (teksts, lapas informācija)
+    """
+    with stage("preprocess"):
+        processed_img, profile = preprocess_image(image)
+    height, width = processed_img.shape[:2]
+    info = {"preprocess": profile, "width": width, "height": height}
+    with stage("tesseract"):
+        if OCR_MODE == 'layout':
+            text, layout = ocr_layout(processed_img, lang)
+            info.update(layout)
+        else:
+            text = get_backend().image_to_string(processed_img, lang or OCR_LANGUAGES).strip()
+    info["chars"] = len(text)
+    return text, info
+
+def iter_pdf_pages(file_path, page_numbers=None, dpi=None, window=None):
+    """
+    Rasterizē PDF pa vienai lapai (vai nelielam blakus lapu logam) uzreiz pelēktoņos.
+    Atmiņā vienlaikus ir ne vairāk kā window lapas neatkarīgi no kopējā lapu skaita,
+    un OCR var sākt ar pirmo lapu, kamēr pārējās vēl nav rasterizētas.
+    Atgriež: ģeneratoru ar (page_number, pelēktoņu np.ndarray)
+    """
+    from pdf2image import convert_from_path, pdfinfo_from_path  # Tikai PDF rasterizēšanai
+
+    dpi = dpi or min(PDF_DPI, TARGET_DPI or PDF_DPI)
+    window = window or PDF_RASTER_WINDOW
+
+    if page_numbers is None:
+        page_count = pdfinfo_from_path(file_path, poppler_path=POPPLER_PATH)["Pages"]
+        page_numbers = range(1, page_count + 1)
+    page_numbers = list(page_numbers)
+
+    i = 0
+    while i < len(page_numbers):
+        # Vienā izsaukumā apvienojam tikai secīgas lapas
+        group = [page_numbers[i]]
+        while (len(group) < window and i + len(group) < len(page_numbers)
+               and page_numbers[i + len(group)] == group[-1] + 1):
+            group.append(page_numbers[i + len(group)])
+
+        with stage("rasterize"):
+            images = convert_from_path(file_path, dpi=dpi, first_page=group[0], last_page=group[-1],
+                                       grayscale=True, poppler_path=POPPLER_PATH)
+            arrays = [np.asarray(img) for img in images]
+        del images
+        for number, array in zip(group, arrays):
+            yield number, array
+        del arrays
+        i += len(group)
+
+def extract_pdf(file_path):
+    """
+    Iegūst tekstu no PDF. Lapām ar teksta slāni tekstu nolasa tieši (bez rasterizācijas),
+    pārējām lapām veic OCR. Katrai lapai tiek atzīmēts izmantotais avots.
+    """
+    import pymupdf  # Tikai PDF failiem
+
+    if PDF_TEXT_STRATEGY == 'ocr':
+        texts = []
+        pages = []
+        language = None
+        for number, gray in iter_pdf_pages(file_path):
+            # Valodu nosakām pēc pirmās lapas un izmantojam visam dokumentam
+            language = language or detect_language(gray)
+            text, info = ocr_image(gray, language["lang"])
+            texts.append(text)
+            pages.append({"page": number, "source": "ocr", "lang": language["lang"], **info})
+        return {"text": "\n".join(texts).strip(), "pages": pages,
+                "preprocess_profile": PREPROCESS_PROFILE, "ocr_language": language}
+
+    with stage("text_layer"), pymupdf.open(file_path) as pdf:
+        layer_texts = [page.get_text("text", sort=True).strip() for page in pdf]
+        # Izkārtojuma režīmā arī teksta slāņa vārdu koordinātes (PDF punktos)
+        layer_words = [[{"text": w[4], "conf": 100.0,
+                         "box": [round(w[0]), round(w[1]), round(w[2] - w[0]), round(w[3] - w[1])]}
+                        for w in page.get_text("words", sort=True)] for page in pdf] if OCR_MODE == 'layout' else None
+
+    texts = {}
+    pages = []
+    for number, layer_text in enumerate(layer_texts, start=1):
+        if len(layer_text) >= MIN_TEXT_LAYER_CHARS:
+            texts[number] = layer_text
+            pages.append({"page": number, "source": "text_layer", "chars": len(layer_text)})
+            if layer_words is not None:
+                pages[-1]["words"] = layer_words[number - 1]
+        else:
+            pages.append({"page": number, "source": "ocr"})
+
+    # OCR tikai lapām bez teksta slāņa, rasterizējot tās pa vienai
+    ocr_pages = {p["page"]: p for p in pages if p["source"] == "ocr"}
+    language = None
+    if ocr_pages:
+        # Ja dokumentam ir arī lapas ar teksta slāni, valodu nosakām no tām bez papildu OCR
+        layer_text = "\n".join(texts.values())
+        if texts and language_from_text(layer_text)[0]:
+            language = detect_language(text=layer_text)
+        for number, gray in iter_pdf_pages(file_path, list(ocr_pages)):
+            language = language or detect_language(gray)
+            texts[number], info = ocr_image(gray, language["lang"])
+            ocr_pages[number].update(info, lang=language["lang"])
+
+    return {"text": "\n".join(texts[p["page"]] for p in pages).strip(), "pages": pages,
+            "preprocess_profile": PREPROCESS_PROFILE, "ocr_language": language}
+
+def extract_document(file_path, file_type=None):
+    """
+    Iegūst tekstu no PDF, JPG vai PNG faila (bez kešatmiņas). Kļūdas gadījumā izmet izņēmumu
+    Atgriež: {"text": ..., "preprocess_profile": ..., "ocr_language": {...} vai None (nav OCR lapu),
+              "pages": [{"page": 1, "source": "text_layer" | "ocr", "preprocess": ..., "lang": ...}, ...]}
+    """
+    file_type = (file_type or detect_file_type(file_path)).lower()
+
+    if file_type == 'pdf':
+        return extract_pdf(file_path)
+
+    # Attēlu formāti (JPG/PNG) - nolasām uzreiz pelēktoņos
+    with stage("rasterize"):
+        img = cv2.imread(file_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Neizdevās nolasīt attēlu no {file_path}")
+
+    img = downscale_to_target_dpi(img, IMAGE_SOURCE_DPI)
+    language = detect_language(img)
+    text, info = ocr_image(img, language["lang"])
+    return {"text": text, "pages": [{"page": 1, "source": "ocr", "lang": language["lang"], **info}],
+            "preprocess_profile": PREPROCESS_PROFILE, "ocr_language": language}
+
+# =============================================
+# KEŠOTA TEKSTA IEGŪŠANA
+# =============================================
+
+_cache = None
+
+def get_cache():
+    """Atgriež procesa kopīgo OCR kešatmiņu (izveido pēc pieprasījuma)"""
+    global _cache
+    if _cache is None:
+        _cache = OCRCache(OCR_CACHE_PATH, OCR_CACHE_MAX_BYTES)
+    return _cache
+
+def extract_document_cached(file_path, file_type=None, use_cache=None, digest=None):
+    """
+    Iegūst dokumentu (teksts + lapu informācija), izmantojot OCR kešatmiņu.
+    digest: jau zināmā faila kontrolsumma (ocr_cache.file_digest)
+    """
+    if use_cache is None:
+        use_cache = OCR_CACHE_ENABLED
+    if not use_cache:
+        return extract_document(file_path, file_type)
+    return get_cache().get_or_extract(
+        file_path, ocr_settings(), lambda path: extract_document(path, file_type), digest
+    )
+
+def extract_text_cached(file_path, file_type=None, use_cache=None):
+    """Iegūst tekstu, izmantojot OCR kešatmiņu. Kļūdas gadījumā izmet izņēmumu"""
+    return extract_document_cached(file_path, file_type, use_cache)["text"]
+
+# =============================================
+# PARALĒLA TEKSTA IEGŪŠANA
+# =============================================
+
+_collect_timings = False
+
+def _init_worker(collect_timings=False):
+    """Ierobežo pavedienus katrā procesā, lai procesi nekonkurētu par kodoliem"""
+    global _cache, _backend, _collect_timings
+    # SQLite savienojumu un Tesseract dzinējus nedrīkst mantot no vecākprocesa (fork)
+    _cache = None
+    _backend = None
+    _collect_timings = collect_timings
+    os.environ["OMP_THREAD_LIMIT"] = "1"  # Tesseract OpenMP
+    cv2.setNumThreads(1)
+
+def _extract_worker(task):
+    """Apstrādā vienu failu; kļūda tiek atgriezta, nevis izmesta, lai neapturētu pārējos"""
+    file_path, file_type, *digest = task
+    digest = digest[0] if digest else None
+    try:
+        if not _collect_timings:
+            document = extract_document_cached(file_path, file_type, digest=digest)
+        else:
+            with collect() as timings:
+                document = extract_document_cached(file_path, file_type, digest=digest)
+            document["timings"] = timings
+        return document, None, bool(document.get("cache_hit"))
+    except Exception as e:
+        return {"text": "", "pages": [], "preprocess_profile": PREPROCESS_PROFILE}, str(e), False
+
+def _extract_chunk(chunk):
+    """Apstrādā failu porciju vienā darba procesā"""
+    return [_extract_worker(task) for task in chunk]
+
+def iter_documents_parallel(tasks, workers=None, chunksize=8, prefetch=4, collect_timings=False):
+    """
+    Straumē OCR rezultātus (dokumentus) no procesu pūla, saglabājot tasks secību.
+    Vienlaikus apstrādē ir ne vairāk kā workers * prefetch porcijas,
+    tāpēc atmiņa neaug līdz ar failu skaitu.
+    tasks: [(file_path, file_type), ...] vai (file_path, file_type, kontrolsumma) (var būt ģenerators)
+    collect_timings: pievieno dokumentam "timings" ar OCR posmu ilgumiem
+    Atgriež: ģeneratoru ar (document, error)
+    """
+    global _collect_timings
+    tasks = iter(tasks)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        _collect_timings = collect_timings
+        for task in tasks:
+            document, error, _ = _extract_worker(task)
+            yield document, error
+        return
+
+    cache = get_cache()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(collect_timings,)) as pool:
+        pending = deque()
+
+        def submit_next():
+            chunk = list(islice(tasks, chunksize))
+            if chunk:
+                pending.append(pool.submit(_extract_chunk, chunk))
+            return bool(chunk)
+
+        for _ in range(workers * prefetch):
+            if not submit_next():
+                break
+
+        while pending:
+            outputs = pending.popleft().result()
+            submit_next()
+            for document, error, hit in outputs:
+                # Apkopojam darba procesu kešatmiņas statistiku
+                if hit:
+                    cache.hits += 1
+                else:
+                    cache.misses += 1
+                yield document, error
+
+def extract_texts_parallel(tasks, workers=None, chunksize=None):
+    """
+    Iegūst tekstu no failu saraksta ar procesu pūlu.
+    tasks: [(file_path, file_type), ...]
+    Atgriež: [(text, error), ...] tādā pašā secībā kā tasks
+    """
+    tasks = list(tasks)
+    workers = workers or os.cpu_count() or 1
+    if not tasks:
+        return []
+
+    # Vairāki faili vienā porcijā samazina starpprocesu komunikācijas izmaksas
+    chunksize = chunksize or max(1, len(tasks) // (workers * 4))
+    from tqdm import tqdm
+
+    start = time.perf_counter()
+    results = [(document["text"], error) for document, error in
+               tqdm(iter_documents_parallel(tasks, workers, chunksize),
+                    total=len(tasks), desc=f"OCR ({workers} procesi)")]
+    elapsed = time.perf_counter() - start
+    print(f"OCR pabeigts: {len(tasks)} dokumenti {elapsed:.1f}s "
+          f"({len(tasks) / elapsed:.2f} dok./s, {workers} procesi)")
+
+    return results
@@ -0,0 +1,68 @@
+import re
+
+from spacy.language import Language
+from spacy.util import filter_spans
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+COMPONENT_NAME = "invoice_rules"
+SPANS_KEY = "rules"   # doc.spans[SPANS_KEY] - entītijas, kuras atrada noteikumi (nevis modelis)
+
+# Lauki ar stingru formātu (sk. 1.generate_invoices.py generate_invoice_data)
+INVOICE_NUMBER_PATTERN = re.compile(r"(?<![\w-])INV-\d{4}-\d{3}(?![\w-])")
+DATE_PATTERN = re.compile(r"(?<![\d.])(?:0[1-9]|[12]\d|3[01])\.(?:0[1-9]|1[0-2])\.(?:19|20)\d{2}(?![\d.])")
+# Kopsumma tikai aiz kopsummas vārda (preču rindās arī ir summas; "Subtotal" nav kopsumma); valūta - uzreiz aiz tās
+TOTAL_PATTERN = re.compile(
+    r"\b(?i:Kopsumma|Kopā|Total|Итого)\W{0,4}?"
+    r"(?P<amount>(?<![\d.,])\d+[.,]\d{2}(?![\d.,]))"
+    r"(?:\s?(?P<currency>EUR|USD|RUB|[€$₽])(?!\w))?"
+)
+
+# =============================================
+# NOTEIKUMI
+# =============================================
+
+def find_fields(text):
+    """
+    Lauki, kurus var atrast ar regulārajām izteiksmēm (viena teksta caurskate katram laukam).
+    Atgriež: [(sākums, beigas, kategorija)] - katrai kategorijai pirmā atbilstība
+    """
+    fields = []
+    for label, pattern in (("INVOICE_NUMBER", INVOICE_NUMBER_PATTERN), ("DATE", DATE_PATTERN)):
+        match = pattern.search(text)
+        if match:
+            fields.append((match.start(), match.end(), label))
+
+    match = TOTAL_PATTERN.search(text)
+    if match:
+        fields.append((match.start("amount"), match.end("amount"), "AMOUNT"))
+        if match.group("currency"):
+            fields.append((match.start("currency"), match.end("currency"), "CURRENCY"))
+    return fields
+
+@Language.component(COMPONENT_NAME)
+def invoice_rules(doc):
+    """
+    Atzīmē noteikumu atrastos laukus kā entītijas pirms "ner".
+    "ner" esošās entītijas saglabā un prognozē tikai pārējo (piem., COMPANY).
+    Atbilstības, kas nesakrīt ar tokenu robežām, tiek izlaistas - tās atradīs modelis
+    """
+    spans = [doc.char_span(start, end, label=label) for start, end, label in find_fields(doc.text)]
+    spans = filter_spans([span for span in spans if span is not None])
+    doc.ents = spans
+    doc.spans[SPANS_KEY] = spans
+    return doc
+
+def add_to_pipeline(nlp):
+    """Pievieno noteikumu komponentu pirms "ner" (ja tā vēl nav)"""
+    if COMPONENT_NAME not in nlp.pipe_names:
+        nlp.add_pipe(COMPONENT_NAME, before="ner" if "ner" in nlp.pipe_names else None)
+    return nlp
+
+def entity_source(doc, ent):
+    """"rules", ja entītiju atrada noteikumi, citādi "ner" """
+    if SPANS_KEY not in doc.spans:
+        return "ner"
+    return "rules" if any(span == ent for span in doc.spans[SPANS_KEY]) else "ner"
@@ -0,0 +1,158 @@
+import re
+
+import numpy as np
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+# Tabulas galvenes vārdi (bez reģistra un pieturzīmēm) katrai kolonnai
+HEADER_KEYWORDS = {
+    "name": ("prece", "nosaukums", "item", "description", "товар", "наименование"),
+    "quantity": ("daudzums", "skaits", "quantity", "qty", "количество", "кол"),
+    "price": ("cena", "price", "цена"),
+    "total": ("summa", "total", "amount", "сумма")
+}
+MIN_HEADER_COLUMNS = 3     # Rinda ir tabulas galvene, ja tajā atrasti vismaz tik kolonnu nosaukumi
+LINE_TOLERANCE = 0.5       # Vārdi vienā rindā, ja vertikālie centri atšķiras mazāk par šo vārda augstuma daļu
+AMOUNT_TOLERANCE = 0.01    # Pieļaujamā noapaļošanas kļūda vienai rindai
+
+# =============================================
+# RINDU IZGŪŠANA NO VĀRDU KOORDINĀTĒM
+# =============================================
+
+def parse_number(text):
+    """Skaitlis no teksta ("1 234,56", "1,234.56", "12.50 EUR") vai None"""
+    value = re.sub(r"[^\d,.\-]", "", text or "")
+    if not re.search(r"\d", value):
+        return None
+    if "," in value and "." in value:
+        if value.rfind(",") > value.rfind("."):
+            value = value.replace(".", "").replace(",", ".")
+        else:
+            value = value.replace(",", "")
+    elif "," in value:
+        # Komats kā decimālatdalītājs, ja aiz tā 1-2 cipari; citādi tūkstošu atdalītājs
+        decimals = len(value) - value.rfind(",") - 1
+        value = value.replace(",", ".") if decimals in (1, 2) else value.replace(",", "")
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def _header_word(text):
+    return re.sub(r"[\W_]+", "", text.lower())
+
+def group_lines(words):
+    """Grupē vārdus rindās pēc vertikālā centra (no augšas uz leju, rindā - no kreisās uz labo)"""
+    lines = []
+    for word in sorted(words, key=lambda w: w["box"][1] + w["box"][3] / 2):
+        x, y, width, height = word["box"]
+        center = y + height / 2
+        if lines and abs(center - lines[-1]["center"]) <= LINE_TOLERANCE * max(height, lines[-1]["height"]):
+            lines[-1]["words"].append(word)
+        else:
+            lines.append({"center": center, "height": height, "words": [word]})
+    return [sorted(line["words"], key=lambda w: w["box"][0]) for line in lines]
+
+def _find_header(lines):
+    """Tabulas galvenes rindas numurs un kolonnu sākuma x koordinātes"""
+    for number, line in enumerate(lines):
+        columns = {}
+        for word in line:
+            key = _header_word(word["text"])
+            for column, keywords in HEADER_KEYWORDS.items():
+                if column not in columns and key in keywords:
+                    columns[column] = word["box"][0]
+        if len(columns) >= MIN_HEADER_COLUMNS:
+            return number, columns
+    return None, None
+
+def extract_items(words):
+    """
+    Preču rindas no vienas lapas vārdiem (ar "box": [x, y, platums, augstums]).
+    Kolonnas nosaka pēc tabulas galvenes vārdu novietojuma; tabula beidzas pie pirmās rindas bez skaitļiem.
+    Atgriež: [{"name", "quantity", "price", "total"}] (neatpazīta vērtība - None)
+    """
+    lines = group_lines(words)
+    header, columns = _find_header(lines)
+    if header is None:
+        return []
+
+    columns.setdefault("name", 0)
+    starts = sorted(columns.items(), key=lambda item: item[1])
+    tolerance = np.median([w["box"][3] for w in lines[header]])
+
+    items = []
+    for line in lines[header + 1:]:
+        cells = {}
+        for word in line:
+            # Pēdējā kolonna, kas sākas pirms vārda (ar nelielu pielaidi)
+            column = starts[0][0]
+            for name, start in starts:
+                if word["box"][0] + tolerance >= start:
+                    column = name
+            cells.setdefault(column, []).append(word["text"])
+
+        row = {"name": " ".join(cells.get("name", [])) or None}
+        for column in ("quantity", "price", "total"):
+            row[column] = parse_number(" ".join(cells.get(column, [])))
+        if row["total"] is None or (row["quantity"] is None and row["price"] is None):
+            if items:
+                break
+            continue
+        items.append(row)
+    return items
+
+def extract_line_items(document):
+    """
+    Preču rindas no dokumenta lapām, kurām ir vārdu koordinātes (OCR_MODE='layout').
+    Atgriež sarakstu vai None, ja nevienai lapai nav vārdu koordinātu
+    """
+    pages = [page for page in document.get("pages", []) if page.get("words")]
+    if not pages:
+        return None
+    items = []
+    for page in pages:
+        for item in extract_items(page["words"]):
+            items.append(dict(item, page=page["page"]))
+    return items
+
+# =============================================
+# ARITMĒTISKĀ PĀRBAUDE (VISAI PARTIJAI)
+# =============================================
+
+def validate_batch(item_lists, declared_totals, tolerance=AMOUNT_TOLERANCE):
+    """
+    Pārbauda visas partijas pavadzīmes vienlaikus (NumPy masīvi, nevis cikls pa rindām):
+      - daudzums × cena = rindas summa,
+      - rindu summu kopsumma = pavadzīmes kopsumma (declared_totals, piem., NER atrastā AMOUNT).
+    item_lists: [[{"quantity", "price", "total"}, ...] vai None]; declared_totals: [skaitlis vai None]
+    Atgriež: katrai pavadzīmei neatbilstību sarakstu
+    """
+    counts = np.array([len(items or []) for items in item_lists], dtype=np.int64)
+    doc_index = np.repeat(np.arange(len(item_lists)), counts)
+    rows = [item for items in item_lists for item in (items or [])]
+    row_index = np.concatenate([np.arange(n) for n in counts]) if len(counts) else np.array([], dtype=np.int64)
+
+    def column(name):
+        return np.array([np.nan if item[name] is None else item[name] for item in rows], dtype=np.float64)
+
+    quantity, price, total = column("quantity"), column("price"), column("total")
+    expected = quantity * price
+    incomplete = np.isnan(expected) | np.isnan(total)
+    line_error = ~incomplete & (np.abs(expected - total) > tolerance)
+
+    sums = np.bincount(doc_index, weights=np.nan_to_num(total), minlength=len(item_lists))
+    declared = np.array([np.nan if t is None else t for t in declared_totals], dtype=np.float64)
+    sum_error = (counts > 0) & ~np.isnan(declared) & (np.abs(sums - declared) > tolerance * np.maximum(counts, 1))
+
+    discrepancies = [[] for _ in item_lists]
+    for i in np.flatnonzero(incomplete):
+        discrepancies[doc_index[i]].append({"check": "incomplete", "row": int(row_index[i])})
+    for i in np.flatnonzero(line_error):
+        discrepancies[doc_index[i]].append({"check": "line_total", "row": int(row_index[i]),
+                                            "expected": round(float(expected[i]), 2), "found": float(total[i])})
+    for d in np.flatnonzero(sum_error):
+        discrepancies[d].append({"check": "sum", "expected": float(declared[d]), "found": round(float(sums[d]), 2)})
+    return discrepancies
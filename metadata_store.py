@@ -0,0 +1,206 @@
+import ast
+import glob
+import os
+import time
+
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from pyarrow import fs
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+DEFAULT_STORE_PATH = "invoices/dataset/metadata"
+LEGACY_CSV_PATH = "invoices/dataset/invoices_metadata.csv"
+MIGRATION_CHUNK_SIZE = 100_000   # CSV rindas vienā migrācijas daļā
+
+# Mapju struktūra: <store>/language=lv/file_type=pdf/<daļa>.parquet
+PARTITION_COLUMNS = ("language", "file_type")
+PARTITIONING = ds.partitioning(pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor="hive")
+
+ITEM_TYPE = pa.struct([("name", pa.string()), ("quantity", pa.int64()),
+                       ("price", pa.float64()), ("total", pa.float64())])
+
+# Kolonnas failos (nodalījuma kolonnas glabājas mapju nosaukumos)
+FILE_SCHEMA = pa.schema([
+    ("company", pa.string()),
+    ("invoice_number", pa.string()),
+    ("date", pa.string()),
+    ("items", pa.list_(ITEM_TYPE)),
+    ("total_amount", pa.float64()),
+    ("currency", pa.string()),
+    ("invoice_text", pa.string()),
+    ("date_text", pa.string()),
+    ("total_text", pa.string()),
+    ("file_path", pa.string())
+])
+
+# Kolonnas, kas vajadzīgas anotēšanai (bez preču rindām un veidnes tekstiem)
+ANNOTATION_COLUMNS = ["company", "invoice_number", "date", "total_amount", "currency", "file_path", "file_type"]
+
+# =============================================
+# RAKSTĪŠANA (TIKAI PIEVIENOŠANA)
+# =============================================
+#
+# Katra rakstīšana izveido jaunus daļu failus - esošie faili netiek mainīti.
+# Fails vispirms tiek uzrakstīts ar "." prefiksu (lasītāji to ignorē) un tad atomāri pārsaukts.
+
+def part_files(path=DEFAULT_STORE_PATH):
+    """Visi pabeigtie daļu faili (sakārtoti)"""
+    return sorted(p for p in glob.glob(os.path.join(path, "**", "*.parquet"), recursive=True)
+                  if not os.path.basename(p).startswith("."))
+
+def append(records, path=DEFAULT_STORE_PATH, part_name=None):
+    """
+    Pievieno ierakstus (pavadzīmju metadatu vārdnīcas) kā jaunus daļu failus pa nodalījumiem.
+    part_name: daļas nosaukums (noklusēti - laikspiedols un procesa id). Atgriež ierakstu skaitu
+    """
+    part_name = part_name or f"part-{time.time_ns()}-{os.getpid()}"
+    groups = {}
+    for record in records:
+        key = tuple(str(record.get(name) or "unknown") for name in PARTITION_COLUMNS)
+        groups.setdefault(key, []).append(record)
+
+    for key, rows in groups.items():
+        directory = os.path.join(path, *(f"{name}={value}" for name, value in zip(PARTITION_COLUMNS, key)))
+        os.makedirs(directory, exist_ok=True)
+        table = pa.Table.from_pylist([{name: row.get(name) for name in FILE_SCHEMA.names} for row in rows],
+                                     schema=FILE_SCHEMA)
+        tmp_path = os.path.join(directory, f".{part_name}.parquet.tmp")
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(directory, f"{part_name}.parquet"))
+    return sum(len(rows) for rows in groups.values())
+
+def remove_parts(path=DEFAULT_STORE_PATH, languages=None, file_types=None):
+    """
+    Dzēš nodalījumu daļu failus (tikai apzinātai pārrakstīšanai, piem., 1.generate_invoices.py --overwrite).
+    None nozīmē visas vērtības. Atgriež dzēsto failu skaitu
+    """
+    removed = 0
+    for file_path in part_files(path):
+        partition = dict(part.split("=", 1) for part in os.path.relpath(os.path.dirname(file_path), path).split(os.sep)
+                         if "=" in part)
+        if languages and partition.get("language") not in languages:
+            continue
+        if file_types and partition.get("file_type") not in file_types:
+            continue
+        os.remove(file_path)
+        removed += 1
+    return removed
+
+# =============================================
+# LASĪŠANA
+# =============================================
+
+def open_dataset(path=DEFAULT_STORE_PATH, files=None):
+    """Arrow datu kopa ar atmiņā kartētiem (mmap) failiem; files - tikai norādītās daļas"""
+    filesystem = fs.LocalFileSystem(use_mmap=True)
+    if files is not None:
+        return ds.dataset(list(files), format="parquet", partitioning=PARTITIONING,
+                          partition_base_dir=path, filesystem=filesystem)
+    return ds.dataset(path, format="parquet", partitioning=PARTITIONING, filesystem=filesystem)
+
+def _filter(languages=None, file_types=None):
+    """Nodalījumu filtrs - neatbilstošās mapes netiek lasītas vispār"""
+    expression = None
+    for name, values in (("language", languages), ("file_type", file_types)):
+        if values:
+            condition = ds.field(name).isin(list(values))
+            expression = condition if expression is None else expression & condition
+    return expression
+
+def read(path=DEFAULT_STORE_PATH, columns=None, languages=None, file_types=None):
+    """Nolasa izvēlētās kolonnas (Arrow tabula); filtrē pēc valodas un faila tipa"""
+    if not part_files(path):
+        return pa.table({name: pa.array([], pa.string()) for name in columns or ["file_path"]})
+    return open_dataset(path).to_table(columns=columns, filter=_filter(languages, file_types))
+
+def iter_records(path=DEFAULT_STORE_PATH, columns=None, languages=None, file_types=None, files=None):
+    """Straumē ierakstus kā vārdnīcas (atmiņā vienlaikus tikai viena ierakstu partija)"""
+    if files is None and not part_files(path):
+        return
+    scanner = open_dataset(path, files).scanner(columns=columns, filter=_filter(languages, file_types))
+    for batch in scanner.to_batches():
+        yield from batch.to_pylist()
+
+def count(path=DEFAULT_STORE_PATH):
+    """Ierakstu skaits katrā nodalījumā (no Parquet metadatiem, nelasot datus)"""
+    counts = {}
+    for file_path in part_files(path):
+        key = os.path.relpath(os.path.dirname(file_path), path)
+        counts[key] = counts.get(key, 0) + pq.ParquetFile(file_path).metadata.num_rows
+    return counts
+
+# =============================================
+# MIGRĀCIJA NO CSV
+# =============================================
+
+def _parse_items(value):
+    """CSV "items" kolonna ir Python saraksta teksts (repr)"""
+    if not isinstance(value, str) or not value.strip():
+        return []
+    return [{"name": str(item.get("name")), "quantity": int(item.get("quantity")),
+             "price": float(item.get("price")), "total": float(item.get("total"))}
+            for item in ast.literal_eval(value)]
+
+def migrate_csv(csv_path=LEGACY_CSV_PATH, path=DEFAULT_STORE_PATH, chunk_size=MIGRATION_CHUNK_SIZE):
+    """
+    invoices_metadata.csv pārnešana uz Parquet krātuvi, pa daļām (CSV netiek ielādēts visā apjomā).
+    Tiek pārnestas tikai rindas, kuru file_path krātuvē vēl nav, jaunās daļās ar unikālu nosaukumu -
+    tā CSV var papildināt un migrāciju atkārtot (esošās daļas netiek pārrakstītas, ieraksti netiek dublēti).
+    Atgriež pārnesto ierakstu skaitu
+    """
+    import pandas as pd
+
+    known = set(read(path, columns=["file_path"]).column("file_path").to_pylist())
+    prefix = f"migrated-{time.time_ns()}"
+    total = 0
+    for number, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunk_size, dtype=str, keep_default_na=False)):
+        records = [record for record in chunk.to_dict("records") if record.get("file_path") not in known]
+        for record in records:
+            record["items"] = _parse_items(record.get("items"))
+            record["total_amount"] = float(record["total_amount"]) if record.get("total_amount") else None
+            known.add(record.get("file_path"))
+        total += append(records, path, part_name=f"{prefix}-{number:05d}")
+    return total
+
+def ensure_store(path=DEFAULT_STORE_PATH, csv_path=None):
+    """
+    Pārnes invoices_metadata.csv rindas, kuru krātuvē vēl nav, ja CSV mainīts pēc jaunākās krātuves daļas
+    (tā CSV var turpināt papildināt ar jaunām pavadzīmēm). csv_path: noklusēti blakus krātuves mapei
+    """
+    csv_path = csv_path or os.path.join(os.path.dirname(os.path.normpath(path)), "invoices_metadata.csv")
+    if not os.path.exists(csv_path):
+        return 0
+    parts = part_files(path)
+    if parts and os.path.getmtime(csv_path) <= max(os.path.getmtime(p) for p in parts):
+        return 0
+    migrated = migrate_csv(csv_path, path)
+    if migrated:
+        print(f"Metadati pārnesti no '{csv_path}' uz '{path}': {migrated} ieraksti")
+    return migrated
+
+# =============================================
+# KOMANDRINDA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Pavadzīmju metadatu krātuve (Parquet)')
+    parser.add_argument('--path', default=DEFAULT_STORE_PATH, help='Krātuves mape')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = subparsers.add_parser('migrate', help='Pārnes invoices_metadata.csv rindas, kuru krātuvē vēl nav')
+    migrate_parser.add_argument('csv', nargs='?', default=LEGACY_CSV_PATH)
+    subparsers.add_parser('stats', help='Ierakstu skaits pa nodalījumiem')
+    args = parser.parse_args()
+
+    if args.command == 'migrate':
+        print(f"Pārnesti {migrate_csv(args.csv, args.path)} ieraksti uz '{args.path}'")
+    elif args.command == 'stats':
+        counts = count(args.path)
+        for key, rows in sorted(counts.items()):
+            print(f"{key:<30} {rows:>10}")
+        print(f"{'Kopā':<30} {sum(counts.values()):>10}")
@@ -0,0 +1,214 @@
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+import spacy
+
+from model_registry import resolve_model_path, save_version
+from ner_training import PATIENCE, evaluate, load_dev_docs, train_epochs
+from training_corpus import CORPUS_DIR, CorpusWriter, iter_docs, iter_examples
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+# Mazāka NER modeļa arhitektūra (noklusētais "ner": width 96, depth 4, embed_size 2000, hidden_width 64)
+EXPORT_WIDTH = 64          # tok2vec platums
+EXPORT_DEPTH = 2           # CNN slāņu skaits
+EXPORT_EMBED_SIZE = 1000   # Jaucējtabulas rindas katram atribūtam (NORM, PREFIX, SUFFIX, SHAPE)
+EXPORT_HIDDEN_WIDTH = 32   # Pārejas parsera slēptā slāņa platums
+EXPORT_MAXOUT_PIECES = 2   # tok2vec maxout daļas (noklusēti 3)
+
+PRECISIONS = ("float32", "float16", "int8")
+CHECKPOINT_PATH = "invoice_ner_model-export-best"
+OUTPUT_PATH = "benchmarks/results/model_export.json"
+SPEED_REPEAT = 3           # Ātruma mērījumu skaits (ņemam labāko)
+SPEED_BATCH_SIZE = 32
+
+# =============================================
+# MAZĀKAIS MODELIS
+# =============================================
+
+def build_student(teacher, width=EXPORT_WIDTH, depth=EXPORT_DEPTH, embed_size=EXPORT_EMBED_SIZE,
+                  hidden_width=EXPORT_HIDDEN_WIDTH, maxout_pieces=EXPORT_MAXOUT_PIECES):
+    """Tukšs NER modelis ar mazākiem slāņiem un tām pašām entītiju kategorijām kā teacher"""
+    nlp = spacy.blank(teacher.lang)
+    ner = nlp.add_pipe("ner", config={"model": {
+        "@architectures": "spacy.TransitionBasedParser.v2",
+        "state_type": "ner",
+        "extra_state_tokens": False,
+        "hidden_width": hidden_width,
+        "maxout_pieces": 2,
+        "use_upper": True,
+        "nO": None,
+        "tok2vec": {
+            "@architectures": "spacy.HashEmbedCNN.v2",
+            "pretrained_vectors": None,
+            "width": width,
+            "depth": depth,
+            "embed_size": embed_size,
+            "window_size": 1,
+            "maxout_pieces": maxout_pieces,
+            "subword_features": True
+        }
+    }})
+    for label in teacher.get_pipe("ner").labels:
+        ner.add_label(label)
+    return nlp
+
+def distill_corpus(teacher, corpus_dir, output_dir, batch_size=SPEED_BATCH_SIZE):
+    """
+    Apmācības korpuss ar teacher modeļa atrastajām entītijām zelta anotāciju vietā.
+    Dev kopa netiek mainīta (novērtēšana vienmēr pret zelta anotācijām). Atgriež dokumentu skaitu
+    """
+    docs = ((doc.text, doc.user_data.get("file_path", ""))
+            for doc in iter_docs(teacher.vocab, corpus_dir, split="train"))
+    with CorpusWriter(teacher, output_dir) as writer:
+        for predicted, file_path in teacher.pipe(docs, batch_size=batch_size, as_tuples=True):
+            entities = [(ent.start_char, ent.end_char, ent.label_) for ent in predicted.ents]
+            if entities:
+                writer.add(predicted.text, entities, file_path)
+    return writer.count
+
+def train_student(student, teacher=None, corpus_dir=CORPUS_DIR, epochs=10, patience=PATIENCE,
+                  checkpoint_path=CHECKPOINT_PATH):
+    """Apmāca mazāko modeli; ja norādīts teacher - uz tā prognozēm (destilācija), citādi uz zelta anotācijām"""
+    optimizer = student.begin_training()
+    dev_docs = load_dev_docs(student.vocab, corpus_dir)
+    with tempfile.TemporaryDirectory(prefix="distilled-") as distilled_dir:
+        train_dir = corpus_dir
+        if teacher is not None:
+            print(f"Destilācija: {distill_corpus(teacher, corpus_dir, distilled_dir)} dokumenti ar teacher anotācijām")
+            train_dir = distilled_dir
+        train_epochs(student, optimizer,
+                     lambda epoch: iter_examples(student, train_dir, split="train", shuffle=True, seed=epoch),
+                     dev_docs, epochs, patience, checkpoint_path)
+    return student
+
+# =============================================
+# SVARU PRECIZITĀTE
+# =============================================
+#
+# thinc CPU operācijas rēķina float32, tāpēc float16/int8 šeit nozīmē svaru noapaļošanu līdz
+# attiecīgajai precizitātei (saglabāti joprojām float32). Tā var pārbaudīt, cik F1 zaudē
+# zemākas precizitātes svari, pirms modeli pārnest uz izpildes vidi, kas tos atbalsta.
+
+def _round(weights, precision):
+    if precision == "float16":
+        return weights.astype(np.float16).astype(weights.dtype)
+    scale = float(np.abs(weights).max()) / 127 if weights.size else 0.0
+    if not scale:
+        return weights
+    return (np.round(weights / scale).clip(-127, 127) * scale).astype(weights.dtype)
+
+def round_weights(nlp, precision):
+    """Noapaļo visu komponentu svarus līdz precision ("float16" vai "int8"). Atgriež parametru skaitu"""
+    if precision == "float32":
+        return 0
+    rounded = 0
+    for _, component in nlp.pipeline:
+        model = getattr(component, "model", None)
+        if model is None:
+            continue
+        for node in model.walk():
+            for name in node.param_names:
+                if node.has_param(name):
+                    weights = node.ops.to_numpy(node.get_param(name))
+                    node.set_param(name, node.ops.asarray(_round(weights, precision)))
+                    rounded += weights.size
+    return rounded
+
+# =============================================
+# SALĪDZINĀJUMS
+# =============================================
+
+def words_per_second(nlp, texts, repeat=SPEED_REPEAT, batch_size=SPEED_BATCH_SIZE):
+    """NER ātrums (vārdi sekundē, labākais no repeat mērījumiem)"""
+    words = sum(len(text.split()) for text in texts)
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in nlp.pipe(texts, batch_size=batch_size):
+            pass
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return words / best if best else 0.0
+
+def model_report(name, nlp, dev_docs, texts):
+    """Modeļa izmērs, ātrums un dev F1 vienā ierakstā"""
+    scores = evaluate(nlp, dev_docs) if dev_docs else {}
+    tok2vec = nlp.get_pipe_config("ner")["model"]["tok2vec"]
+    return {
+        "model": name,
+        "width": tok2vec.get("width"),
+        "depth": tok2vec.get("depth"),
+        "size_mb": round(len(nlp.to_bytes()) / 1e6, 2),
+        "words_per_sec": round(words_per_second(nlp, texts)),
+        "ents_f": round(scores.get("ents_f", 0.0), 4)
+    }
+
+def compare(models, corpus_dir=CORPUS_DIR):
+    """Salīdzina modeļus ({nosaukums: nlp}) uz vienas dev kopas. Atgriež ierakstu sarakstu"""
+    first = next(iter(models.values()))
+    dev_docs = load_dev_docs(first.vocab, corpus_dir)
+    texts = [doc.text for doc in dev_docs]
+    return [model_report(name, nlp, dev_docs, texts) for name, nlp in models.items()]
+
+def print_report(rows):
+    base = rows[0]["words_per_sec"] or 1
+    print(f"\n{'Modelis':<32} {'platums':>7} {'dziļums':>7} {'MB':>7} {'vārdi/s':>9} {'paātr.':>7} {'F1':>8}")
+    for row in rows:
+        print(f"{row['model']:<32} {row['width']:>7} {row['depth']:>7} {row['size_mb']:>7.2f} "
+              f"{row['words_per_sec']:>9} {row['words_per_sec'] / base:>6.2f}x {row['ents_f']:>8.2%}")
+
+# =============================================
+# GALVENĀ IZPILDES DAĻA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Mazāka un ātrāka NER modeļa eksports un salīdzinājums')
+    parser.add_argument('--model', default=None, help='Pilnais modelis (noklusēti - aktīvā reģistra versija)')
+    parser.add_argument('--corpus', default=CORPUS_DIR, help='DocBin korpusa mape')
+    parser.add_argument('--width', type=int, default=EXPORT_WIDTH, help='tok2vec platums')
+    parser.add_argument('--depth', type=int, default=EXPORT_DEPTH, help='CNN slāņu skaits')
+    parser.add_argument('--embed-size', type=int, default=EXPORT_EMBED_SIZE, help='Jaucējtabulas rindas')
+    parser.add_argument('--hidden-width', type=int, default=EXPORT_HIDDEN_WIDTH, help='Parsera slēptā slāņa platums')
+    parser.add_argument('--distill', action='store_true', help='Apmācīt uz pilnā modeļa prognozēm (destilācija)')
+    parser.add_argument('--precision', choices=PRECISIONS, default="float32", help='Svaru precizitāte')
+    parser.add_argument('--epochs', type=int, default=10, help='Maksimālais epohu skaits')
+    parser.add_argument('--patience', type=int, default=PATIENCE, help='Epohas bez dev uzlabojuma līdz apstāšanās')
+    parser.add_argument('--compare', metavar='PATH', nargs='+', default=None,
+                        help='Tikai salīdzināt pilno modeli ar jau eksportētiem modeļiem (bez apmācības)')
+    parser.add_argument('--output', default=OUTPUT_PATH, help='JSON atskaites fails')
+    args = parser.parse_args()
+
+    teacher_path = args.model or resolve_model_path()
+    teacher = spacy.load(teacher_path)
+
+    if args.compare:
+        models = {teacher_path: teacher}
+        models.update((path, spacy.load(path)) for path in args.compare)
+        rows = compare(models, args.corpus)
+    else:
+        student = build_student(teacher, args.width, args.depth, args.embed_size, args.hidden_width)
+        train_student(student, teacher if args.distill else None, args.corpus, args.epochs, args.patience)
+        if round_weights(student, args.precision):
+            print(f"Svari noapaļoti līdz {args.precision}")
+
+        name = f"export w{args.width} d{args.depth} {args.precision}" + (" distill" if args.distill else "")
+        rows = compare({teacher_path: teacher, name: student}, args.corpus)
+        export = rows[1]
+        version = save_version(student, {"ents_f": export["ents_f"], "words_per_sec": export["words_per_sec"]},
+                               source=f"model_export.py ({name})")
+        print(f"\nEksportētais modelis saglabāts kā versija '{version}' (NAV aktivizēts; "
+              f"aktivizēt: python model_registry.py activate {version})")
+
+    print_report(rows)
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"teacher": teacher_path, "models": rows}, f, indent=2, ensure_ascii=False)
+    print(f"\nAtskaite saglabāta: {args.output}")
@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import shutil
+import time
+from datetime import datetime
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+REGISTRY_DIR = "models"      # models/versions/<versija>/ + models/CURRENT
+LEGACY_MODEL_PATH = "invoice_ner_model"  # Modelis ārpus reģistra (pirms pirmās publicēšanas)
+KEEP_VERSIONS = 5            # Cik versijas glabāt (pašreizējā netiek dzēsta nekad)
+MAX_SCORE_DROP = 0.01        # Pieļaujamais dev F1 kritums, lai versiju drīkstētu aktivizēt
+
+VERSION_INFO_FILE = "version.json"
+CURRENT_FILE = "CURRENT"
+
+# =============================================
+# VERSIJU GLABĀTUVE
+# =============================================
+#
+# Katra versija ir nemainīga mape. Aktīvā versija tiek norādīta CURRENT failā,
+# kas tiek aizvietots atomāri (os.replace), tāpēc lasītājs vienmēr redz vai nu
+# veco, vai jauno versiju - nekad daļēji uzrakstītu modeli.
+
+def _versions_dir(registry_dir):
+    return os.path.join(registry_dir, "versions")
+
+def _version_order(info):
+    """Izveides laiks, tad nosaukuma skaitļi (lai "...-10" būtu aiz "...-9", nevis pirms tā)"""
+    return info.get("created", 0.0), [int(number) for number in re.findall(r"\d+", info["version"])]
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Versiju apraksti (vecākās vispirms)"""
+    versions_dir = _versions_dir(registry_dir)
+    if not os.path.isdir(versions_dir):
+        return []
+
+    versions = []
+    for name in os.listdir(versions_dir):
+        info_path = os.path.join(versions_dir, name, VERSION_INFO_FILE)
+        if name.startswith(".") or not os.path.exists(info_path):
+            continue
+        with open(info_path, encoding="utf-8") as f:
+            versions.append(json.load(f))
+    return sorted(versions, key=_version_order)
+
+def version_info(version, registry_dir=REGISTRY_DIR):
+    with open(os.path.join(_versions_dir(registry_dir), version, VERSION_INFO_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def current_version(registry_dir=REGISTRY_DIR):
+    """Aktīvās versijas nosaukums vai None"""
+    try:
+        with open(os.path.join(registry_dir, CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def current_path(registry_dir=REGISTRY_DIR):
+    """Aktīvās versijas modeļa mape vai None, ja reģistrs vēl nav izmantots"""
+    version = current_version(registry_dir)
+    return os.path.join(_versions_dir(registry_dir), version) if version else None
+
+def resolve_model_path(registry_dir=REGISTRY_DIR, fallback=LEGACY_MODEL_PATH):
+    """Aktīvās versijas mape; ja reģistrs vēl tukšs - fallback"""
+    return current_path(registry_dir) or fallback
+
+def save_version(nlp, scores=None, source=None, registry_dir=REGISTRY_DIR):
+    """Saglabā modeli kā jaunu nemainīgu versiju (vēl neaktivizējot). Atgriež versijas nosaukumu"""
+    versions_dir = _versions_dir(registry_dir)
+    os.makedirs(versions_dir, exist_ok=True)
+
+    base = datetime.now().strftime("%Y%m%d-%H%M%S")
+    version, n = base, 1
+    while os.path.exists(os.path.join(versions_dir, version)):
+        version, n = f"{base}-{n}", n + 1
+
+    # Rakstām pagaidu mapē un pārsaucam tikai pilnībā saglabātu modeli
+    tmp_dir = os.path.join(versions_dir, f".tmp-{version}")
+    nlp.to_disk(tmp_dir)
+    with open(os.path.join(tmp_dir, VERSION_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "created": time.time(), "scores": scores or {},
+                   "source": source}, f, indent=2)
+    os.replace(tmp_dir, os.path.join(versions_dir, version))
+    return version
+
+def activate(version, registry_dir=REGISTRY_DIR):
+    """Atomāri padara versiju par aktīvo (arī atgriešanai pie vecākas versijas)"""
+    if not os.path.isdir(os.path.join(_versions_dir(registry_dir), version)):
+        raise ValueError(f"Versija '{version}' neeksistē")
+    pointer = os.path.join(registry_dir, CURRENT_FILE)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+
+def passes_gate(scores, reference_score, max_drop=MAX_SCORE_DROP):
+    """Vai jaunā versija nav sliktāka par atskaites rezultātu vairāk nekā max_drop"""
+    score = (scores or {}).get("ents_f")
+    if score is None or reference_score is None:
+        return True
+    return score >= reference_score - max_drop
+
+def publish(nlp, scores=None, reference_score=None, source=None, force=False,
+            registry_dir=REGISTRY_DIR, keep=KEEP_VERSIONS):
+    """
+    Saglabā jaunu versiju un aktivizē to, ja tā iztur novērtējuma pārbaudi.
+    reference_score: pašreizējā modeļa F1 uz tās pašas dev kopas; ja nav norādīts,
+    tiek izmantots aktīvās versijas saglabātais rezultāts.
+    Atgriež (versija, aktivizēta)
+    """
+    if reference_score is None and current_version(registry_dir):
+        reference_score = version_info(current_version(registry_dir), registry_dir)["scores"].get("ents_f")
+
+    version = save_version(nlp, scores, source, registry_dir)
+    promoted = force or passes_gate(scores, reference_score)
+    if promoted:
+        activate(version, registry_dir)
+    prune(registry_dir, keep)
+    return version, promoted
+
+def prune(registry_dir=REGISTRY_DIR, keep=KEEP_VERSIONS):
+    """Dzēš vecākās versijas (un pārtrauktu saglabāšanu atliekas), atstājot keep jaunākās un aktīvo"""
+    versions_dir = _versions_dir(registry_dir)
+    if not os.path.isdir(versions_dir):
+        return []
+
+    current = current_version(registry_dir)
+    removed = []
+    for name in os.listdir(versions_dir):
+        if name.startswith(".tmp-"):
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+
+    names = [v["version"] for v in list_versions(registry_dir)]
+    for name in names[:max(len(names) - keep, 0)]:
+        if name != current:
+            shutil.rmtree(os.path.join(versions_dir, name), ignore_errors=True)
+            removed.append(name)
+    return removed
+
+# =============================================
+# KOMANDRINDA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='NER modeļu versiju pārvaldība')
+    parser.add_argument('--path', default=REGISTRY_DIR, help='Reģistra mape')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='Parāda versijas un to rezultātus')
+    activate_parser = subparsers.add_parser('activate', help='Aktivizē versiju (arī atgriešanai)')
+    activate_parser.add_argument('version')
+    prune_parser = subparsers.add_parser('prune', help='Dzēš vecās versijas')
+    prune_parser.add_argument('--keep', type=int, default=KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        current = current_version(args.path)
+        for v in list_versions(args.path):
+            f1 = v["scores"].get("ents_f")
+            marker = "*" if v["version"] == current else " "
+            print(f"{marker} {v['version']}  F1: {f'{f1:.2%}' if f1 is not None else '-':>7}  {v.get('source') or ''}")
+    elif args.command == 'activate':
+        activate(args.version, args.path)
+        print(f"Aktīvā versija: {args.version}")
+    elif args.command == 'prune':
+        print(f"Dzēstas versijas: {', '.join(prune(args.path, args.keep)) or '-'}")
@@ -0,0 +1,113 @@
+import itertools
+import random
+
+from spacy.util import compounding, minibatch
+from tqdm import tqdm
+
+from training_corpus import CORPUS_DIR, iter_docs, make_example, shard_paths
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+BATCH_START = 4          # Mini-batch izmērs pieaug no BATCH_START līdz BATCH_STOP
+BATCH_STOP = 32
+BATCH_COMPOUND = 1.001
+DROPOUT = 0.3
+
+PATIENCE = 3             # Epohas bez dev rezultāta uzlabojuma, pēc kurām apstājamies
+DEV_LIMIT = 500          # Maksimālais dev dokumentu skaits novērtēšanai katrā epohā
+CHECKPOINT_PATH = "invoice_ner_model-best"  # Labākās epohas modelis
+
+REHEARSAL_SIZE = 500     # Veco piemēru buferis atjaunināšanai (pret "aizmiršanu")
+REHEARSAL_RATIO = 1.0    # Veco piemēru skaits uz katru jauno piemēru
+
+# =============================================
+# NOVĒRTĒŠANA
+# =============================================
+
+def load_dev_docs(vocab, corpus_dir=CORPUS_DIR, limit=DEV_LIMIT, only=None):
+    """Fiksēta dev kopa (ierobežota izmēra), ko novērtē pēc katras epohas; only - tikai šie failu ceļi"""
+    return list(itertools.islice(iter_docs(vocab, corpus_dir, split="dev", only=only), limit))
+
+def evaluate(nlp, dev_docs):
+    """Atgriež entītiju precizitāti, pārklājumu un F1"""
+    scores = nlp.evaluate([make_example(nlp, doc) for doc in dev_docs])
+    return {key: scores.get(key) or 0.0 for key in ("ents_p", "ents_r", "ents_f")}
+
+# =============================================
+# ATKĀRTOŠANAS BUFERIS
+# =============================================
+
+def rehearsal_buffer(vocab, corpus_dir=CORPUS_DIR, exclude=(), size=REHEARSAL_SIZE, seed=0):
+    """Nejaušs vecu apmācības dokumentu paraugs (rezervuāra izlase - atmiņā tikai size dokumenti)"""
+    rng = random.Random(seed)
+    shards = [path for path in shard_paths(corpus_dir) if path not in set(exclude)]
+    buffer = []
+    for i, doc in enumerate(iter_docs(vocab, corpus_dir, shards=shards, split="train")):
+        if len(buffer) < size:
+            buffer.append(doc)
+        else:
+            j = rng.randint(0, i)
+            if j < size:
+                buffer[j] = doc
+    return buffer
+
+def with_rehearsal(examples, nlp, buffer, ratio=REHEARSAL_RATIO, seed=0):
+    """Starp jaunajiem piemēriem iejauc vecos no bufera (vidēji ratio uz katru jauno)"""
+    rng = random.Random(seed)
+    credit = 0.0
+    for example in examples:
+        yield example
+        if not buffer:
+            continue
+        credit += ratio
+        while credit >= 1:
+            yield make_example(nlp, rng.choice(buffer))
+            credit -= 1
+
+# =============================================
+# APMĀCĪBAS CIKLS
+# =============================================
+
+def train_epochs(nlp, optimizer, train_examples, dev_docs, epochs, patience=PATIENCE,
+                 checkpoint_path=CHECKPOINT_PATH, dropout=DROPOUT):
+    """
+    Apmāca ar pieaugošiem mini-batch, novērtē dev kopu pēc katras epohas un apstājas,
+    ja patience epohas nav uzlabojuma. Labākā epoha tiek saglabāta checkpoint_path
+    un beigās ielādēta atpakaļ nlp.
+    train_examples(epoch) -> piemēru iterators (straumēts, nevis saraksts)
+    """
+    batch_sizes = compounding(BATCH_START, BATCH_STOP, BATCH_COMPOUND)
+    best_score = None
+    best_epoch = None
+    stale = 0
+
+    for epoch in range(epochs):
+        losses = {}
+        for batch in tqdm(minibatch(train_examples(epoch), size=batch_sizes),
+                          desc=f"Epoha {epoch + 1}/{epochs}"):
+            nlp.update(batch, drop=dropout, losses=losses, sgd=optimizer)
+
+        if not dev_docs:
+            print(f"Epoha {epoch + 1}, zaudējumi: {losses} (nav dev datu)")
+            nlp.to_disk(checkpoint_path)
+            best_epoch = epoch
+            continue
+
+        scores = evaluate(nlp, dev_docs)
+        print(f"Epoha {epoch + 1}, zaudējumi: {losses}, dev F1: {scores['ents_f']:.2%}")
+
+        if best_score is None or scores["ents_f"] > best_score:
+            best_score, best_epoch, stale = scores["ents_f"], epoch, 0
+            nlp.to_disk(checkpoint_path)
+        else:
+            stale += 1
+            if stale >= patience:
+                print(f"Dev F1 nav uzlabojies {patience} epohas - apstājamies")
+                break
+
+    if best_epoch is not None:
+        nlp.from_disk(checkpoint_path)
+        print(f"Labākā epoha: {best_epoch + 1}" + (f", dev F1: {best_score:.2%}" if best_score is not None else ""))
+    return best_score
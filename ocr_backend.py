@@ -0,0 +1,161 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+BACKENDS = ('tesserocr', 'pytesseract', 'auto')
+MAX_ENGINES_PER_THREAD = 4   # tesserocr: dažādu (valoda, psm) dzinēju skaits vienā pavedienā
+
+# image_to_data atslēgas (pytesseract.Output.DICT formāts)
+DATA_FIELDS = ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf", "text")
+
+# =============================================
+# OCR DZINĒJI
+# =============================================
+#
+# Abiem dzinējiem ir vienāda saskarne:
+#   image_to_string(attēls, valoda, psm) -> teksts
+#   image_to_data(attēls, valoda, psm) -> {lauks: [vērtības]} (DATA_FIELDS)
+# Attēls ir numpy masīvs (pelēktoņu vai BGR, kā no OpenCV).
+
+class PytesseractBackend:
+    """tesseract izpildfaila izsaukums katram attēlam (attēls caur pagaidu failu)"""
+
+    name = "pytesseract"
+
+    def __init__(self, tesseract_cmd=None):
+        import pytesseract  # Ielādē arī pandas, tāpēc tikai tad, kad OCR tiešām vajadzīgs
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        self._pytesseract = pytesseract
+
+    @staticmethod
+    def _config(psm):
+        return f"--psm {psm}" if psm else ""
+
+    def image_to_string(self, image, lang, psm=None):
+        return self._pytesseract.image_to_string(image, lang=lang, config=self._config(psm))
+
+    def image_to_data(self, image, lang, psm=None):
+        return self._pytesseract.image_to_data(image, lang=lang, config=self._config(psm),
+                                               output_type=self._pytesseract.Output.DICT)
+
+    def close(self):
+        pass
+
+class TesserocrBackend:
+    """
+    Tesseract API tajā pašā procesā: katram pavedienam savi inicializēti dzinēji
+    (valodu modeļi tiek ielādēti vienreiz), attēli tiek nodoti no atmiņas.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path=None, max_engines=MAX_ENGINES_PER_THREAD):
+        try:
+            import tesserocr
+        except ImportError:
+            raise RuntimeError("OCR_BACKEND='tesserocr' nepieciešams tesserocr (pip install tesserocr)")
+
+        self._tesserocr = tesserocr
+        self.tessdata_path = tessdata_path
+        self.max_engines = max_engines
+        self._local = threading.local()
+
+    def _engine(self, lang, psm):
+        """Pavediena dzinējs valodai un psm; retāk lietotie tiek aizvērti"""
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = OrderedDict()
+
+        key = (lang, psm)
+        api = engines.get(key)
+        if api is not None:
+            engines.move_to_end(key)
+            return api
+
+        kwargs = {"lang": lang, "psm": psm if psm is not None else self._tesserocr.PSM.AUTO}
+        if self.tessdata_path:
+            kwargs["path"] = self.tessdata_path
+        api = engines[key] = self._tesserocr.PyTessBaseAPI(**kwargs)
+        if len(engines) > self.max_engines:
+            _, oldest = engines.popitem(last=False)
+            oldest.End()
+        return api
+
+    def _recognize(self, image, lang, psm):
+        api = self._engine(lang, psm)
+        if image.ndim == 3:
+            image = image[:, :, ::-1]  # BGR -> RGB
+        image = np.ascontiguousarray(image, dtype=np.uint8)
+        height, width = image.shape[:2]
+        bytes_per_pixel = 1 if image.ndim == 2 else image.shape[2]
+        api.SetImageBytes(image.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+        api.Recognize()
+        return api
+
+    def image_to_string(self, image, lang, psm=None):
+        api = self._recognize(image, lang, psm)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, image, lang, psm=None):
+        api = self._recognize(image, lang, psm)
+        try:
+            tsv = api.GetTSVText(0)
+        finally:
+            api.Clear()
+
+        data = {field: [] for field in DATA_FIELDS}
+        for line in tsv.splitlines():
+            values = line.split("\t")
+            if len(values) < len(DATA_FIELDS) - 1:
+                continue
+            values += [""] * (len(DATA_FIELDS) - len(values))
+            for field, value in zip(DATA_FIELDS, values):
+                if field == "text":
+                    data[field].append(value)
+                elif field == "conf":
+                    data[field].append(float(value))
+                else:
+                    data[field].append(int(value))
+        return data
+
+    def close(self):
+        """Aizver šī pavediena dzinējus"""
+        engines = getattr(self._local, "engines", None) or {}
+        for api in engines.values():
+            api.End()
+        self._local.engines = None
+
+def resolve_backend_name(name='auto'):
+    """Dzinēja nosaukums, ko izvēlētos create_backend (bez tesserocr/pytesseract ielādes)"""
+    if name not in BACKENDS:
+        raise ValueError(f"Nezināms OCR dzinējs: {name} (iespējamie: {', '.join(BACKENDS)})")
+    if name != 'auto':
+        return name
+    import importlib.util
+    return 'tesserocr' if importlib.util.find_spec('tesserocr') else 'pytesseract'
+
+def create_backend(name='auto', tessdata_path=None, tesseract_cmd=None):
+    """
+    OCR dzinējs pēc nosaukuma; 'auto' - tesserocr, ja instalēts, citādi pytesseract.
+    tesseract_cmd: tesseract izpildfaila ceļš (pytesseract)
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Nezināms OCR dzinējs: {name} (iespējamie: {', '.join(BACKENDS)})")
+    if name == 'pytesseract':
+        return PytesseractBackend(tesseract_cmd)
+    try:
+        return TesserocrBackend(tessdata_path)
+    except RuntimeError:
+        if name == 'tesserocr':
+            raise
+        return PytesseractBackend(tesseract_cmd)
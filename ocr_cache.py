@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+DEFAULT_CACHE_PATH = "ocr_cache/ocr_cache.sqlite"
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512 MB teksta
+
+# =============================================
+# PALĪGFUNKCIJAS
+# =============================================
+
+def file_digest(file_path, chunk_size=1024 * 1024):
+    """Aprēķina faila satura SHA-256 kontrolsummu"""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _stored_path(file_path):
+    """Faila ceļš, kā tas tiek glabāts kešatmiņā (absolūts, lai relatīvi ceļi sakristu)"""
+    return os.path.abspath(file_path) if file_path else None
+
+def settings_digest(settings):
+    """Aprēķina OCR iestatījumu kontrolsummu (neatkarīgi no atslēgu secības)"""
+    payload = json.dumps(settings, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+# =============================================
+# OCR KEŠATMIŅA
+# =============================================
+
+class OCRCache:
+    """
+    Diskā glabāta OCR teksta kešatmiņa.
+    Atslēga: faila satura kontrolsumma + priekšapstrādes/OCR iestatījumi.
+    Vērtība: dokuments {"text": ..., ...papildu informācija, piem., "pages"}.
+    Pie ieraksta saglabāts arī pēdējais faila ceļš - lai ierakstu varētu dzēst, kad faila vairs nav.
+    Izmērs ierobežots ar max_bytes, vecākie ieraksti tiek izmesti (LRU).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                file_hash TEXT NOT NULL,
+                settings_hash TEXT NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (file_hash, settings_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries(last_access)")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(entries)")]
+        if "meta" not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN meta TEXT")
+        if "file_path" not in columns:
+            self._conn.execute("ALTER TABLE entries ADD COLUMN file_path TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_file_path ON entries(file_path)")
+        self._conn.commit()
+
+    def get(self, file_hash, settings, file_path=None):
+        """Atgriež kešoto dokumentu vai None. file_path: faila ceļš, ar kuru ieraksts izmantots"""
+        key = settings_digest(settings)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, meta FROM entries WHERE file_hash = ? AND settings_hash = ?",
+                (file_hash, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET last_access = ?, file_path = COALESCE(?, file_path) "
+                "WHERE file_hash = ? AND settings_hash = ?",
+                (time.time(), _stored_path(file_path), file_hash, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            text, meta = row
+            document = json.loads(meta) if meta else {}
+            document["text"] = text
+            return document
+
+    def put(self, file_hash, settings, document, file_path=None):
+        """Saglabā dokumentu kešatmiņā un, ja vajag, izmet vecākos ierakstus"""
+        text = document["text"]
+        meta = json.dumps({k: v for k, v in document.items() if k not in ("text", "cache_hit")},
+                          ensure_ascii=False)
+        size = len(text.encode("utf-8")) + len(meta.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(file_hash, settings_hash, text, size, created, last_access, meta, file_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (file_hash, settings_digest(settings), text, size, now, now, meta, _stored_path(file_path))
+            )
+            self._conn.commit()
+            self._evict()
+
+    def get_or_extract(self, file_path, settings, extract_fn, file_hash=None):
+        """
+        Atgriež dokumentu no kešatmiņas vai izsauc extract_fn un saglabā rezultātu.
+        file_hash: jau aprēķināta faila kontrolsumma (lai failu nelasītu vēlreiz)
+        """
+        file_hash = file_hash or file_digest(file_path)
+        document = self.get(file_hash, settings, file_path)
+        if document is not None:
+            document["cache_hit"] = True
+            return document
+
+        document = extract_fn(file_path)
+        # Tukšu rezultātu nekešojam - tas parasti nozīmē kļūdu
+        if document["text"]:
+            self.put(file_hash, settings, document, file_path)
+        return document
+
+    def invalidate(self, file_paths=None):
+        """
+        Dzēš ierakstus norādītajiem failiem vai visu kešatmiņu. Esošiem failiem - pēc satura,
+        un visiem - pēc saglabātā ceļa (arī, ja fails jau izdzēsts vai mainīts). Atgriež dzēsto skaitu
+        """
+        with self._lock:
+            if file_paths is None:
+                removed = self._conn.execute("DELETE FROM entries").rowcount
+            else:
+                removed = 0
+                for path in file_paths:
+                    if os.path.isfile(path):
+                        removed += self._conn.execute("DELETE FROM entries WHERE file_hash = ?",
+                                                      (file_digest(path),)).rowcount
+                    removed += self._conn.execute("DELETE FROM entries WHERE file_path = ?",
+                                                  (_stored_path(path),)).rowcount
+            self._conn.commit()
+            self._conn.execute("VACUUM")
+            return removed
+
+    def _evict(self):
+        """Izmet vismazāk nesen izmantotos ierakstus, līdz izmērs iekļaujas limitā"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        freed = 0
+        stale = []
+        for file_hash, key, size in self._conn.execute(
+            "SELECT file_hash, settings_hash, size FROM entries ORDER BY last_access"
+        ):
+            stale.append((file_hash, key))
+            freed += size
+            if total - freed <= self.max_bytes:
+                break
+
+        self._conn.executemany("DELETE FROM entries WHERE file_hash = ? AND settings_hash = ?", stale)
+        self._conn.commit()
+
+    def stats(self):
+        """Atgriež kešatmiņas statistiku"""
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "size_bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def report(self):
+        """Īss kopsavilkums izvadei konsolē"""
+        s = self.stats()
+        return (f"OCR kešatmiņa: {s['hits']} trāpījumi, {s['misses']} netrāpījumi "
+                f"({s['hit_rate']:.0%}), {s['entries']} ieraksti, "
+                f"{s['size_bytes'] / 1024 / 1024:.1f}/{s['max_bytes'] / 1024 / 1024:.0f} MB")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# =============================================
+# KOMANDRINDA
+# =============================================
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='OCR kešatmiņas pārvaldība')
+    parser.add_argument('--path', default=DEFAULT_CACHE_PATH, help='Kešatmiņas datubāzes ceļš')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='Parāda kešatmiņas statistiku')
+    subparsers.add_parser('clear', help='Iztīra visu kešatmiņu')
+    invalidate_parser = subparsers.add_parser('invalidate', help='Dzēš ierakstus norādītajiem failiem')
+    invalidate_parser.add_argument('files', nargs='+', help='Faili, kuru OCR rezultāti jādzēš')
+    args = parser.parse_args()
+
+    cache = OCRCache(args.path)
+    if args.command == 'stats':
+        s = cache.stats()
+        print(f"Ieraksti: {s['entries']}")
+        print(f"Izmērs: {s['size_bytes'] / 1024 / 1024:.1f} MB no {s['max_bytes'] / 1024 / 1024:.0f} MB")
+    elif args.command == 'clear':
+        print(f"Dzēsti {cache.invalidate()} ieraksti")
+    elif args.command == 'invalidate':
+        print(f"Dzēsti {cache.invalidate(args.files)} ieraksti")
+    cache.close()
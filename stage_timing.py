@@ -0,0 +1,37 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# =============================================
+# APSTRĀDES POSMU LAIKA MĒRĪŠANA
+# =============================================
+#
+# Posmu laiki tiek uzkrāti tikai collect() blokā un tikai tajā pavedienā,
+# kas to atvēra. Ārpus collect() stage() neko nemēra.
+
+_local = threading.local()
+
+@contextmanager
+def collect():
+    """Uzkrāj posmu ilgumus (sekundēs) šī pavediena izsaukumiem bloka iekšienē"""
+    previous = getattr(_local, "timings", None)
+    timings = {}
+    _local.timings = timings
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+@contextmanager
+def stage(name):
+    """Mēra viena posma ilgumu; atkārtoti izsaukumi (piem., vairākas lapas) tiek summēti"""
+    timings = getattr(_local, "timings", None)
+    if timings is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
@@ -0,0 +1,44 @@
+"""
+Automātiskā anotācija (annotation.py): vērtību atrašana OCR tekstā un apmācības entītijas.
+"""
+from annotation import annotate, normalize, training_entities
+
+ROW = {"company": "SIA Kārkliņš", "invoice_number": "INV-2024-001", "date": "12.03.2024",
+       "total_amount": 1438.45, "currency": "€"}
+
+def labeled(text, entities):
+    return [(label, text[start:end]) for start, end, label in entities]
+
+def test_normalize_collapses_whitespace():
+    norm, positions = normalize("  SIA \n Kārkliņš  €")
+    assert norm == "51a kārk11ņš eur"
+    assert len(norm) == len(positions)
+    assert positions[3] == 5   # Atstarpe norāda uz pirmo atstarpes simbolu oriģinālā
+
+def test_exact_and_ocr_variants():
+    text = "PAVADZĪME INV-2O24-0O1 Datums: 12.03.2024 SIA  Kārkliņš Kopsumma: 1438,45 EUR"
+    assert labeled(text, training_entities(text, ROW)) == [
+        ("INVOICE_NUMBER", "INV-2O24-0O1"), ("DATE", "12.03.2024"), ("COMPANY", "SIA  Kārkliņš"),
+        ("AMOUNT", "1438,45"), ("CURRENCY", "EUR")
+    ]
+
+def test_value_does_not_span_table_cells():
+    # Daudzums "1" un cena "438.45" blakus šūnās nav kopsumma 1438.45
+    text = "Galds   1             438.45 €\nKrēsls 2 500.00 €\nKopsumma: 1438.45 €"
+    entities = labeled(text, training_entities(text, ROW))
+    assert entities == [("AMOUNT", "1438.45"), ("CURRENCY", "€")]
+    assert all(text[start:end] != "1             438.45" for start, end, *_ in annotate(text, {"AMOUNT": ["1438.45"]}))
+
+def test_fuzzy_match_stays_within_one_token():
+    assert annotate("Summa 1438.4 5", {"AMOUNT": ["1438.45"]}) == []
+    assert [span[:3] for span in annotate("Summa 1488.45", {"AMOUNT": ["1438.45"]})] == [(6, 13, "AMOUNT")]
+
+def test_currency_only_next_to_total():
+    text = "Galds 2 50.00 € 100.00 €\nKopsumma: 1438.45 €"
+    currencies = [(start, end) for start, end, label in training_entities(text, ROW) if label == "CURRENCY"]
+    assert currencies == [(len(text) - 1, len(text))]
+    # Bez atrastas kopsummas valūtu neatzīmējam vispār
+    assert training_entities("Galds 2 50.00 €", ROW) == []
+
+def test_no_match_inside_words():
+    assert annotate("INV-2024-0012", {"INVOICE_NUMBER": ["INV-2024-001"]}) == []
@@ -0,0 +1,95 @@
+"""
+Dublikātu indekss (dedup_index.py) un tā atslēga 3.invoices_processor.py:
+MinHash līdzība, tā paša faila atkārtota apstrāde, iestatījumi atslēgā, invalidate.
+"""
+import pytest
+import spacy
+
+from benchmarks.common import load_script
+from dedup_index import NEAR_DUPLICATE_THRESHOLD, DedupIndex, minhash, similarity
+
+TEXT = ("PAVADZĪME INV-2024-001 Datums: 12.03.2024 Piegādātājs: SIA Kārkliņš "
+        "Prece Daudzums Cena Summa Galds 2 50.00 100.00 Krēsls 4 25.00 100.00 Kopsumma: 200.00 EUR")
+
+@pytest.fixture
+def index(tmp_path):
+    index = DedupIndex(str(tmp_path / "dedup.sqlite"))
+    yield index
+    index.close()
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    module = load_script("3.invoices_processor.py", "invoices_processor")
+    monkeypatch.setattr(module, "DEDUP_INDEX_PATH", str(tmp_path / "dedup.sqlite"))
+    monkeypatch.setattr(module, "_dedup", None)
+    yield module
+    if module._dedup is not None:
+        module._dedup.close()
+
+def test_minhash_similarity():
+    assert similarity(minhash(TEXT), minhash(TEXT)) == 1.0
+    assert similarity(minhash(TEXT), minhash(TEXT.replace("Krēsls", "Krēsli"))) >= NEAR_DUPLICATE_THRESHOLD
+    assert similarity(minhash(TEXT), minhash("Pilnīgi cits dokuments bez kopīga teksta")) < 0.5
+    assert minhash("abc") is None
+
+def test_find_similar_threshold(index):
+    index.add("a", "a.pdf", minhash(TEXT), {"invoice_number": "INV-2024-001"})
+    match = index.find_similar(minhash(TEXT.replace("Krēsls", "Krēsli")))
+    assert match["file_path"] == "a.pdf"
+    assert index.find_similar(minhash("Pilnīgi cits dokuments bez kopīga teksta")) is None
+
+def test_same_path_is_not_duplicate(index):
+    index.add("a", "a.pdf", minhash(TEXT), {"invoice_number": "INV-2024-001"})
+    assert index.find_exact("a")["file_path"] == "a.pdf"
+    assert index.find_exact("a", exclude_path="a.pdf") is None
+    assert index.find_similar(minhash(TEXT), exclude_path="a.pdf") is None
+    assert index.register_invoice("SIA Kārkliņš", "INV-2024-001", "a", "a.pdf") is None
+    # Tas pats ceļš ar mainītu saturu - nav dublikāts; cits fails ar to pašu numuru - ir
+    assert index.register_invoice("SIA Kārkliņš", "INV-2024-001", "b", "a.pdf") is None
+    assert index.register_invoice("SIA Kārkliņš", "INV-2024-001", "c", "c.pdf") == "a.pdf"
+
+def test_invalidate(index, tmp_path):
+    existing = tmp_path / "b.pdf"
+    existing.write_bytes(b"saturs")
+    from ocr_cache import file_digest
+    index.add("a", "gone.pdf", minhash(TEXT), {})
+    index.add(file_digest(str(existing)), "kopija.pdf", None, {})
+    index.add("c", "c.pdf", None, {})
+    assert index.invalidate(["gone.pdf", str(existing)]) == 2
+    assert index.find_exact("a") is None
+    assert index.find_similar(minhash(TEXT)) is None
+    assert index.counts()["documents"] == 1
+    assert index.invalidate() == 1
+
+def test_processor_key_tracks_settings(processor, monkeypatch):
+    nlp = spacy.blank("lv")
+    result = {"invoice_number": "INV-2024-001", "amount": "200.00", "company": "SIA Kārkliņš"}
+    processor.register_result(nlp, "a", minhash(TEXT), "a.pdf", dict(result))
+
+    duplicate = processor.find_duplicate(nlp, "kopija.pdf", digest="a")
+    assert duplicate["duplicate_of"]["file_path"] == "a.pdf"
+    assert processor.find_duplicate(nlp, "a.pdf", digest="a") is None
+
+    import invoice_ocr
+    monkeypatch.setattr(invoice_ocr, "OCR_MODE", "layout")
+    assert processor.find_duplicate(nlp, "kopija.pdf", digest="a") is None
+    monkeypatch.setattr(invoice_ocr, "OCR_MODE", "text")
+    monkeypatch.setattr(processor, "RULES_ENABLED", not processor.RULES_ENABLED)
+    assert processor.find_duplicate(nlp, "kopija.pdf", digest="a") is None
+    monkeypatch.setattr(processor, "RULES_ENABLED", not processor.RULES_ENABLED)
+    monkeypatch.setattr(processor, "LINE_ITEMS_ENABLED", True)
+    assert processor.find_duplicate(nlp, "kopija.pdf", digest="a") is None
+
+def test_processor_near_duplicate_needs_confirmation(processor):
+    nlp = spacy.blank("lv")
+    result = {"invoice_number": "INV-2024-001", "amount": "200.00"}
+    processor.register_result(nlp, "a", minhash(TEXT), "a.pdf", dict(result))
+
+    similar = TEXT.replace("Krēsls", "Krēsli")
+    duplicate = processor.find_duplicate(nlp, "b.jpg", signature=minhash(similar), document={"text": similar})
+    assert duplicate["duplicate_of"]["match"] == "near"
+
+    other = TEXT.replace("INV-2024-001", "INV-2024-002")
+    document = {"text": other}
+    assert processor.find_duplicate(nlp, "c.jpg", signature=minhash(other), document=document) is None
+    assert document["duplicate_of"]["confirmed"] is False
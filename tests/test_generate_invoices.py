@@ -0,0 +1,33 @@
+"""
+Korpusa ģenerators (1.generate_invoices.py): papildināšana ar to pašu sēklu neatkārto esošās pavadzīmes.
+"""
+from datetime import datetime
+
+import pytest
+
+import metadata_store
+from benchmarks.common import load_script
+
+@pytest.fixture(scope="module")
+def generator():
+    return load_script("1.generate_invoices.py", "generate_invoices")
+
+def test_append_with_same_seed_makes_new_invoices(generator, tmp_path):
+    output_dir = str(tmp_path / "invoices")
+    for _ in range(2):
+        generator.generate_corpus(count=3, formats=("png",), seed=7, workers=1, output_dir=output_dir,
+                                  reference_date=datetime(2025, 1, 1), shard_size=2)
+
+    rows = metadata_store.read(generator.metadata_path(output_dir),
+                               columns=["file_path", "invoice_number", "company"]).to_pylist()
+    assert len({row["file_path"] for row in rows}) == 6
+    assert len({(row["invoice_number"], row["company"]) for row in rows}) == 6
+
+def test_same_seed_is_reproducible(generator, tmp_path):
+    numbers = []
+    for run in range(2):
+        output_dir = str(tmp_path / f"run{run}")
+        store = generator.generate_corpus(count=3, formats=("png",), seed=7, workers=1, output_dir=output_dir,
+                                          reference_date=datetime(2025, 1, 1), shard_size=2)
+        numbers.append(sorted(metadata_store.read(store, columns=["invoice_number"]).column(0).to_pylist()))
+    assert numbers[0] == numbers[1]
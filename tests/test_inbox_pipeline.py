@@ -0,0 +1,60 @@
+"""
+Ienākošās mapes NER posms (3.invoices_processor.py): kļūda vienā dokumentā neaptur partiju.
+"""
+import pytest
+import spacy
+from spacy.language import Language
+
+from benchmarks.common import load_script
+
+@Language.component("test_fail_on_marker")
+def fail_on_marker(doc):
+    if "KĻŪDA" in doc.text:
+        raise ValueError("bojāts dokuments")
+    return doc
+
+@pytest.fixture
+def processor(monkeypatch):
+    module = load_script("3.invoices_processor.py", "invoices_processor")
+    monkeypatch.setattr(module, "DEDUP_ENABLED", False)
+    monkeypatch.setattr(module, "LINE_ITEMS_ENABLED", False)
+    return module
+
+@pytest.fixture
+def nlp():
+    nlp = spacy.blank("lv")
+    nlp.add_pipe("invoice_rules")
+    nlp.add_pipe("test_fail_on_marker")
+    return nlp
+
+def test_ner_batch_isolates_failing_document(processor, nlp):
+    batch = [("a.pdf", {"text": "Pavadzīme INV-2024-001 Kopsumma: 200.00 EUR", "pages": []}),
+             ("b.pdf", {"text": "KĻŪDA", "pages": []}),
+             ("c.pdf", {"text": "Pavadzīme INV-2024-002", "pages": []})]
+    results = processor._ner_batch(nlp, batch)
+
+    assert [result["file_path"] for result in results] == ["a.pdf", "b.pdf", "c.pdf"]
+    assert results[0]["invoice_number"] == "INV-2024-001" and "error" not in results[0]
+    assert "bojāts dokuments" in results[1]["error"]
+    assert results[2]["invoice_number"] == "INV-2024-002"
+
+def test_ner_batch_isolates_line_item_errors(processor, nlp, monkeypatch):
+    monkeypatch.setattr(processor, "LINE_ITEMS_ENABLED", True)
+    def add_line_items(results, documents):
+        if any(document.get("broken") for document in documents):
+            raise ValueError("bojāta tabula")
+    monkeypatch.setattr(processor, "add_line_items", add_line_items)
+
+    batch = [("a.pdf", {"text": "INV-2024-001", "broken": True}), ("b.pdf", {"text": "INV-2024-002"})]
+    results = processor._ner_batch(nlp, batch)
+    assert "bojāta tabula" in results[0]["error"]
+    assert results[1]["invoice_number"] == "INV-2024-002"
+
+def test_move_to_failed(processor, tmp_path):
+    path = tmp_path / "inbox" / "a.pdf"
+    path.parent.mkdir()
+    path.write_bytes(b"saturs")
+    moved = processor.move_to_failed(str(path), str(tmp_path / "failed"))
+    assert moved == str(tmp_path / "failed" / "a.pdf")
+    assert not path.exists()
+    assert processor.move_to_failed(str(path), str(tmp_path / "failed")) is None
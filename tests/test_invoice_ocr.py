@@ -0,0 +1,30 @@
+"""
+OCR iestatījumi kešatmiņas atslēgā un valodas noteikšana pēc teksta (invoice_ocr.py).
+"""
+import pytest
+
+import invoice_ocr
+from ocr_cache import settings_digest
+
+@pytest.mark.parametrize("name, value", [
+    ("LANGUAGE_PROBE_CROP", 0.5),
+    ("LANGUAGE_PROBE_SCALE", 1.0),
+    ("LANGUAGE_MIN_LETTERS", 50),
+    ("LANGUAGE_MIN_CONFIDENCE", 0.9),
+    ("LATVIAN_LETTER_SHARE", 0.05),
+    ("LANGUAGE_LATIN_FALLBACK", "lav"),
+    ("ENGLISH_WORDS", {"invoice"}),
+    ("LANGUAGE_DETECTION", False)
+])
+def test_language_settings_change_cache_key(monkeypatch, name, value):
+    before = settings_digest(invoice_ocr.ocr_settings())
+    monkeypatch.setattr(invoice_ocr, name, value)
+    assert settings_digest(invoice_ocr.ocr_settings()) != before
+
+def test_language_from_text():
+    assert invoice_ocr.language_from_text("Счет-фактура № 15 Итого к оплате")[0] == "rus"
+    assert invoice_ocr.language_from_text("Pavadzīme Nr. 15 Kopsumma apmaksai")[0] == "lav"
+    assert invoice_ocr.language_from_text("Pavadzime Nr 15 Kopsumma apmaksai")[0] == invoice_ocr.LANGUAGE_LATIN_FALLBACK
+    lang, confidence = invoice_ocr.language_from_text("Invoice number 15 total amount due for payment")
+    assert lang == "eng" and confidence > invoice_ocr.LANGUAGE_MIN_CONFIDENCE
+    assert invoice_ocr.language_from_text("Nr 15") == (None, 0.0)
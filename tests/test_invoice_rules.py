@@ -0,0 +1,38 @@
+"""
+Noteikumu slānis pirms NER (invoice_rules.py).
+"""
+import spacy
+
+import invoice_rules
+from invoice_rules import find_fields
+
+def fields(text):
+    return {label: text[start:end] for start, end, label in find_fields(text)}
+
+def test_fixed_format_fields():
+    text = "PAVADZĪME INV-2024-001\nDatums: 12.03.2024\nGalds 2 50.00 100.00\nKopsumma: 200.00 EUR"
+    assert fields(text) == {"INVOICE_NUMBER": "INV-2024-001", "DATE": "12.03.2024",
+                            "AMOUNT": "200.00", "CURRENCY": "EUR"}
+
+def test_total_keywords():
+    assert fields("Итого: 4025.09 ₽") == {"AMOUNT": "4025.09", "CURRENCY": "₽"}
+    assert fields("TOTAL 15,50") == {"AMOUNT": "15,50"}
+    assert fields("Kopā: 7.00 €")["AMOUNT"] == "7.00"
+
+def test_subtotal_is_not_total():
+    assert fields("Subtotal: 100.00 EUR") == {}
+    assert fields("Subtotal: 100.00 EUR\nTotal: 121.00 EUR")["AMOUNT"] == "121.00"
+
+def test_no_partial_matches():
+    assert fields("INV-2024-0012 32.13.2024 XINV-2024-001") == {}
+
+def test_component_keeps_rule_entities():
+    nlp = spacy.blank("lv")
+    invoice_rules.add_to_pipeline(nlp)
+    invoice_rules.add_to_pipeline(nlp)
+    assert nlp.pipe_names == ["invoice_rules"]
+
+    doc = nlp("Pavadzīme INV-2024-001 Kopsumma: 200.00 EUR")
+    assert [(ent.text, ent.label_) for ent in doc.ents] == [
+        ("INV-2024-001", "INVOICE_NUMBER"), ("200.00", "AMOUNT"), ("EUR", "CURRENCY")]
+    assert all(invoice_rules.entity_source(doc, ent) == "rules" for ent in doc.ents)
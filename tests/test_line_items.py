@@ -0,0 +1,59 @@
+"""
+Preču rindas no vārdu koordinātēm un aritmētiskā pārbaude (line_items.py).
+"""
+import pytest
+
+from benchmarks.common import load_script
+from line_items import extract_items, extract_line_items, parse_number, validate_batch
+
+def word(text, x, y, width=40, height=12):
+    return {"text": text, "conf": 95.0, "box": [x, y, width, height]}
+
+def table(rows, top=100):
+    """Vārdi tabulai ar kolonnām Prece / Daudzums / Cena / Summa (x = 10, 200, 300, 400)"""
+    words = [word("Pavadzīme", 10, 20), word("Prece", 10, top), word("Daudzums", 200, top),
+             word("Cena", 300, top), word("Summa", 400, top)]
+    for number, cells in enumerate(rows, start=1):
+        y = top + number * 20
+        words.extend(word(text, x, y) for text, x in zip(cells, (10, 200, 300, 400)) if text is not None)
+    words.append(word("Kopsumma:", 300, top + (len(rows) + 2) * 20))
+    return words
+
+@pytest.mark.parametrize("text, value", [
+    ("12.50 EUR", 12.5), ("1 234,56", 1234.56), ("1,234.56", 1234.56), ("1.234,56", 1234.56),
+    ("1,234", 1234.0), ("€", None), (None, None)
+])
+def test_parse_number(text, value):
+    assert parse_number(text) == value
+
+def test_extract_items():
+    items = extract_items(table([("Galds", "2", "50.00", "100.00"), ("Krēsls", "4", "25,00", "100,00")]))
+    assert items == [{"name": "Galds", "quantity": 2.0, "price": 50.0, "total": 100.0},
+                     {"name": "Krēsls", "quantity": 4.0, "price": 25.0, "total": 100.0}]
+    assert extract_items([word("Pavadzīme", 10, 20)]) == []
+
+def test_extract_line_items_needs_word_boxes():
+    assert extract_line_items({"pages": [{"page": 1, "source": "ocr"}]}) is None
+    document = {"pages": [{"page": 1, "words": table([("Galds", "2", "50.00", "100.00")])}]}
+    assert extract_line_items(document)[0]["page"] == 1
+
+def test_validate_batch():
+    good = [{"quantity": 2.0, "price": 50.0, "total": 100.0}]
+    wrong_line = [{"quantity": 2.0, "price": 50.0, "total": 90.0}, {"quantity": None, "price": 5.0, "total": 5.0}]
+    checks = validate_batch([good, wrong_line, None, []], [100.0, 100.0, 50.0, None])
+    assert checks[0] == []
+    assert {"check": "line_total", "row": 0, "expected": 100.0, "found": 90.0} in checks[1]
+    assert {"check": "incomplete", "row": 1} in checks[1]
+    assert {"check": "sum", "expected": 100.0, "found": 95.0} in checks[1]
+    assert checks[2] == [] and checks[3] == []
+
+def test_processor_line_items_follow_ocr_mode(monkeypatch):
+    import invoice_ocr
+    processor = load_script("3.invoices_processor.py", "invoices_processor")
+    assert processor.LINE_ITEMS_ENABLED == 'auto'
+    monkeypatch.setattr(invoice_ocr, "OCR_MODE", "text")
+    assert not processor.line_items_enabled()
+    monkeypatch.setattr(invoice_ocr, "OCR_MODE", "layout")
+    assert processor.line_items_enabled()
+    monkeypatch.setattr(processor, "LINE_ITEMS_ENABLED", False)
+    assert not processor.line_items_enabled()
@@ -0,0 +1,118 @@
+"""
+Metadatu krātuve (metadata_store.py) un papildināšanas stāvoklis (update_state.py):
+pievienošana, CSV migrācija un tās atkārtošana pēc CSV papildināšanas.
+"""
+import csv
+import os
+
+import pytest
+
+import metadata_store
+from update_state import UpdateState
+
+COLUMNS = ["company", "invoice_number", "date", "items", "total_amount", "currency", "language",
+           "invoice_text", "date_text", "total_text", "file_path", "file_type"]
+
+def record(number, file_type="pdf", language="lv"):
+    return {"company": "SIA Kārkliņš", "invoice_number": f"INV-2024-{number:03d}", "date": "12.03.2024",
+            "items": "[{'name': 'Galds', 'quantity': 2, 'price': 50.0, 'total': 100.0}]", "total_amount": "100.0",
+            "currency": "EUR", "language": language, "invoice_text": "Pavadzīme Nr.", "date_text": "Datums:",
+            "total_text": "Kopsumma:", "file_path": f"invoice_{number}.{file_type}", "file_type": file_type}
+
+def stored(number, file_type="pdf", language="lv"):
+    """Ieraksts append formātā (preču rindas - saraksts, summa - skaitlis)"""
+    return dict(record(number, file_type, language), items=[], total_amount=100.0)
+
+def write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def test_append_and_filter(tmp_path):
+    store = str(tmp_path / "metadata")
+    rows = [stored(1), stored(2, "png", "en")]
+    assert metadata_store.append(rows, store) == 2
+    assert metadata_store.append([stored(3)], store) == 1
+
+    assert len(metadata_store.part_files(store)) == 3
+    assert metadata_store.count(store) == {os.path.join("language=lv", "file_type=pdf"): 2,
+                                           os.path.join("language=en", "file_type=png"): 1}
+    paths = metadata_store.read(store, ["file_path"], languages=["lv"]).column("file_path").to_pylist()
+    assert sorted(paths) == ["invoice_1.pdf", "invoice_3.pdf"]
+
+def test_migrate_only_new_rows(tmp_path):
+    store = str(tmp_path / "metadata")
+    csv_path = str(tmp_path / "invoices_metadata.csv")
+    write_csv(csv_path, [record(1), record(2)])
+    assert metadata_store.migrate_csv(csv_path, store) == 2
+    assert metadata_store.migrate_csv(csv_path, store) == 0
+
+    write_csv(csv_path, [record(1), record(2), record(3)])
+    assert metadata_store.migrate_csv(csv_path, store) == 1
+    rows = list(metadata_store.iter_records(store))
+    assert sorted(row["file_path"] for row in rows) == ["invoice_1.pdf", "invoice_2.pdf", "invoice_3.pdf"]
+    assert rows[0]["items"][0]["name"] == "Galds"
+
+def test_ensure_store_picks_up_csv_additions(tmp_path):
+    store = str(tmp_path / "metadata")
+    csv_path = str(tmp_path / "invoices_metadata.csv")
+    write_csv(csv_path, [record(1)])
+    assert metadata_store.ensure_store(store) == 1
+    assert metadata_store.ensure_store(store) == 0
+
+    write_csv(csv_path, [record(1), record(2)])
+    newest = max(os.path.getmtime(p) for p in metadata_store.part_files(store))
+    os.utime(csv_path, (newest + 1, newest + 1))
+    assert metadata_store.ensure_store(store) == 1
+
+def test_update_state_imports_new_invoices(tmp_path):
+    store = str(tmp_path / "metadata")
+    csv_path = str(tmp_path / "invoices_metadata.csv")
+    state = UpdateState(str(tmp_path / "state.sqlite"))
+    try:
+        write_csv(csv_path, [record(1), record(2)])
+        metadata_store.migrate_csv(csv_path, store)
+        assert state.import_metadata(store) == 2
+        assert state.import_metadata(store) == 0
+        state.set_status(["invoice_1.pdf", "invoice_2.pdf"], "trained")
+
+        write_csv(csv_path, [record(1), record(2), record(3)])
+        metadata_store.migrate_csv(csv_path, store)
+        assert state.import_metadata(store) == 1
+        assert [row["file_path"] for row in state.pending()] == ["invoice_3.pdf"]
+        assert state.counts() == {"trained": 2, "pending": 1}
+    finally:
+        state.close()
+
+def test_update_state_rereads_rewritten_part(tmp_path):
+    store = str(tmp_path / "metadata")
+    state = UpdateState(str(tmp_path / "state.sqlite"))
+    try:
+        metadata_store.append([stored(1)], store, part_name="fixed")
+        assert state.import_metadata(store) == 1
+        metadata_store.append([stored(1), stored(2)], store, part_name="fixed")
+        assert state.import_metadata(store) == 1
+    finally:
+        state.close()
+
+def test_update_state_processed_dir(tmp_path):
+    store = str(tmp_path / "metadata")
+    processed = tmp_path / "processed"
+    processed.mkdir()
+    (processed / "invoice_1.pdf").write_bytes(b"")
+    (processed / "invoice_9.pdf").write_bytes(b"")
+    state = UpdateState(str(tmp_path / "state.sqlite"))
+    try:
+        metadata_store.append([stored(1), stored(2)], store)
+        state.import_metadata(store)
+        state.sync_processed_dir(str(processed))
+        assert [row["file_path"] for row in state.pending()] == ["invoice_2.pdf"]
+        assert state.counts() == {"pending": 1, "processed": 2}
+
+        state.set_status(["invoice_2.pdf"], "labeled", shard="shard_00001.spacy")
+        assert [row[:2] for row in state.labeled()] == [("invoice_2.pdf", "shard_00001.spacy")]
+        with pytest.raises(ValueError):
+            state.set_status(["invoice_2.pdf"], "nezināms")
+    finally:
+        state.close()
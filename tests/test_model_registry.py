@@ -0,0 +1,49 @@
+"""
+Modeļu versiju reģistrs (model_registry.py): secība, aktivizēšana, pārbaude un vecāko versiju dzēšana.
+"""
+import json
+import os
+
+import spacy
+
+import model_registry
+
+def fake_version(registry_dir, name, created):
+    directory = os.path.join(registry_dir, "versions", name)
+    os.makedirs(directory)
+    with open(os.path.join(directory, model_registry.VERSION_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump({"version": name, "created": created, "scores": {}, "source": None}, f)
+
+def test_versions_sorted_numerically(tmp_path):
+    registry_dir = str(tmp_path)
+    for n in (1, 2, 9, 10, 11):
+        fake_version(registry_dir, f"20250101-120000-{n}", created=1000.0)
+    fake_version(registry_dir, "20241231-235959", created=900.0)
+
+    names = [v["version"] for v in model_registry.list_versions(registry_dir)]
+    assert names == ["20241231-235959"] + [f"20250101-120000-{n}" for n in (1, 2, 9, 10, 11)]
+
+def test_prune_keeps_newest_and_current(tmp_path):
+    registry_dir = str(tmp_path)
+    for n in range(1, 12):
+        fake_version(registry_dir, f"v{n}", created=float(n))
+    model_registry.activate("v2", registry_dir)
+
+    removed = model_registry.prune(registry_dir, keep=3)
+    assert sorted(removed, key=lambda name: int(name[1:])) == ["v1", "v3", "v4", "v5", "v6", "v7", "v8"]
+    assert [v["version"] for v in model_registry.list_versions(registry_dir)] == ["v2", "v9", "v10", "v11"]
+
+def test_publish_gate(tmp_path):
+    registry_dir = str(tmp_path)
+    nlp = spacy.blank("lv")
+    assert model_registry.resolve_model_path(registry_dir, fallback="vecais") == "vecais"
+
+    first, promoted = model_registry.publish(nlp, {"ents_f": 0.9}, registry_dir=registry_dir)
+    assert promoted and model_registry.current_version(registry_dir) == first
+
+    worse, promoted = model_registry.publish(nlp, {"ents_f": 0.8}, registry_dir=registry_dir)
+    assert not promoted and model_registry.current_version(registry_dir) == first
+
+    forced, promoted = model_registry.publish(nlp, {"ents_f": 0.8}, force=True, registry_dir=registry_dir)
+    assert promoted and model_registry.current_version(registry_dir) == forced
+    assert [v["version"] for v in model_registry.list_versions(registry_dir)] == [first, worse, forced]
@@ -0,0 +1,66 @@
+"""
+OCR kešatmiņa (ocr_cache.py): atslēga, LRU izmešana un ierakstu dzēšana.
+"""
+import pytest
+
+from ocr_cache import OCRCache
+
+SETTINGS = {"dpi": 200, "langs": "lav+eng+rus"}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache.sqlite"))
+    yield cache
+    cache.close()
+
+def extract(text):
+    calls = []
+    def extract_fn(file_path):
+        calls.append(file_path)
+        return {"text": text, "pages": [{"page": 1, "source": "ocr"}]}
+    return extract_fn, calls
+
+def test_get_or_extract_uses_content_and_settings(cache, tmp_path):
+    first, copy = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    first.write_bytes(b"saturs")
+    copy.write_bytes(b"saturs")
+    extract_fn, calls = extract("Pavadzīme")
+
+    assert cache.get_or_extract(str(first), SETTINGS, extract_fn)["text"] == "Pavadzīme"
+    document = cache.get_or_extract(str(copy), SETTINGS, extract_fn)
+    assert document["cache_hit"] and document["pages"] == [{"page": 1, "source": "ocr"}]
+    cache.get_or_extract(str(first), dict(SETTINGS, dpi=300), extract_fn)
+    assert len(calls) == 2
+
+def test_empty_text_is_not_cached(cache, tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"saturs")
+    extract_fn, calls = extract("")
+    cache.get_or_extract(str(path), SETTINGS, extract_fn)
+    cache.get_or_extract(str(path), SETTINGS, extract_fn)
+    assert len(calls) == 2
+
+def test_invalidate_missing_and_changed_files(cache, tmp_path):
+    path = tmp_path / "a.pdf"
+    path.write_bytes(b"saturs")
+    cache.get_or_extract(str(path), SETTINGS, extract("Pavadzīme")[0])
+    path.unlink()
+    assert cache.invalidate([str(path)]) == 1
+    assert cache.stats()["entries"] == 0
+
+    path.write_bytes(b"vecais saturs")
+    cache.get_or_extract(str(path), SETTINGS, extract("Pavadzīme")[0])
+    path.write_bytes(b"jaunais saturs")
+    assert cache.invalidate([str(path)]) == 1
+    assert cache.invalidate([str(tmp_path / "nekad_nav_bijis.pdf")]) == 0
+
+def test_lru_eviction(tmp_path):
+    cache = OCRCache(str(tmp_path / "cache.sqlite"), max_bytes=200)
+    try:
+        for n in range(5):
+            cache.put(f"hash{n}", SETTINGS, {"text": "x" * 60})
+        assert cache.get("hash0", SETTINGS) is None
+        assert cache.get("hash4", SETTINGS)["text"] == "x" * 60
+        assert cache.stats()["size_bytes"] <= 200
+    finally:
+        cache.close()
@@ -0,0 +1,25 @@
+"""
+3.invoices_processor.py startēšanas budžets (benchmarks/startup.py) kā tests:
+ātrajiem izsaukumiem (--help, neeksistējošs fails) importu laiks nepārsniedz IMPORT_BUDGET_MS
+un netiek ielādētas smagās atkarības (spaCy, OpenCV, pyarrow u.c.).
+
+Palaišana no projekta saknes:
+    python -m pytest tests
+"""
+import pytest
+
+from benchmarks.startup import HEAVY_MODULES, IMPORT_BUDGET_MS, SCENARIOS, measure
+
+REPEAT = 3
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_no_heavy_imports(scenario):
+    _, heavy = measure(SCENARIOS[scenario], repeat=1)
+    for module in ("cv2", "spacy", "pyarrow"):
+        assert module not in heavy, f"{scenario}: ielādēts {module}"
+    assert not heavy, f"{scenario}: ielādēti {', '.join(heavy)} (HEAVY_MODULES: {', '.join(HEAVY_MODULES)})"
+
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+def test_import_budget(scenario):
+    import_ms, _ = measure(SCENARIOS[scenario], repeat=REPEAT)
+    assert import_ms <= IMPORT_BUDGET_MS, f"{scenario}: {import_ms:.1f} ms > {IMPORT_BUDGET_MS} ms"
@@ -0,0 +1,171 @@
+import glob
+import os
+import random
+import zlib
+
+from spacy.tokens import Doc, DocBin
+from spacy.training import Example
+from spacy.util import filter_spans
+
+from ocr_cache import file_digest
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+CORPUS_DIR = "invoices/corpus"   # Sagatavotās anotācijas (DocBin šķembas)
+SHARD_SIZE = 1000                # Dokumentu skaits vienā .spacy failā
+DEV_SHARE = 0.2                  # Daļa dokumentu, kas paliek novērtēšanai
+
+INDEX_FILE = "index.txt"         # Korpusā esošie faili: "ceļš<TAB>satura kontrolsumma" (pēdējā rinda ir spēkā)
+
+# =============================================
+# KORPUSA RAKSTĪŠANA
+# =============================================
+
+class CorpusWriter:
+    """
+    Pievieno anotētus dokumentus korpusam kā jaunas DocBin šķembas.
+    Tokenizācija un entītiju izlīdzināšana notiek vienreiz - šeit.
+    Esošās šķembas netiek pārrakstītas, katra sesija sāk jaunu šķembu.
+    """
+
+    def __init__(self, nlp, corpus_dir=CORPUS_DIR, shard_size=SHARD_SIZE):
+        self.nlp = nlp
+        self.corpus_dir = corpus_dir
+        self.shard_size = shard_size
+        self.files = corpus_files(corpus_dir)   # Faila ceļš -> satura kontrolsumma
+        self.shards = []          # Šajā sesijā uzrakstītās šķembas
+        self.file_shards = {}     # Faila ceļš -> šķemba, kurā tas saglabāts
+        self.count = 0
+        self._doc_bin = DocBin(store_user_data=True)
+        self._pending_files = []
+        self._next_shard = len(shard_paths(corpus_dir))
+        os.makedirs(corpus_dir, exist_ok=True)
+
+    def add(self, text, entities, file_path, digest=None):
+        """
+        Pievieno dokumentu; atgriež False, ja neviena entītija nesakrīt ar tokenu robežām.
+        digest: faila satura kontrolsumma - ja fails vēlāk mainās, vecā anotācija vairs netiek lasīta
+        """
+        doc = self.nlp.make_doc(text)
+        spans = [doc.char_span(start, end, label=label, alignment_mode="contract")
+                 for start, end, label in entities]
+        spans = filter_spans([span for span in spans if span is not None])
+        if not spans:
+            return False
+
+        doc.ents = spans
+        doc.user_data["file_path"] = file_path
+        doc.user_data["digest"] = digest
+        self._doc_bin.add(doc)
+        self._pending_files.append((file_path, digest))
+        self.count += 1
+        if len(self._doc_bin) >= self.shard_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Saglabā uzkrātos dokumentus jaunā šķembā"""
+        if not len(self._doc_bin):
+            return
+        shard_path = os.path.join(self.corpus_dir, f"shard_{self._next_shard:05d}.spacy")
+        tmp_path = shard_path + ".tmp"
+        self._doc_bin.to_disk(tmp_path)
+        os.replace(tmp_path, shard_path)
+
+        # Indeksā tikai pēc tam, kad šķemba ir diskā
+        with open(os.path.join(self.corpus_dir, INDEX_FILE), "a", encoding="utf-8") as f:
+            f.writelines(f"{path}\t{digest or ''}\n" for path, digest in self._pending_files)
+        self.files.update(self._pending_files)
+        self.file_shards.update((path, shard_path) for path, _ in self._pending_files)
+
+        self.shards.append(shard_path)
+        self._next_shard += 1
+        self._doc_bin = DocBin(store_user_data=True)
+        self._pending_files = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# =============================================
+# KORPUSA LASĪŠANA
+# =============================================
+
+def shard_paths(corpus_dir=CORPUS_DIR):
+    return sorted(glob.glob(os.path.join(corpus_dir, "shard_*.spacy")))
+
+def corpus_files(corpus_dir=CORPUS_DIR):
+    """
+    Faili, kuru anotācijas jau ir korpusā: {ceļš: satura kontrolsumma}.
+    Ja fails pievienots atkārtoti (saturs mainījies), spēkā ir pēdējā kontrolsumma;
+    vecā formāta rindām (tikai ceļš) kontrolsumma ir None
+    """
+    index_path = os.path.join(corpus_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return {}
+    files = {}
+    with open(index_path, encoding="utf-8") as f:
+        for line in f:
+            path, _, digest = line.rstrip("\n").partition("\t")
+            if path.strip():
+                files[path] = digest or None
+    return files
+
+def content_digest(file_path):
+    """Faila satura kontrolsumma (kā OCR kešatmiņā) vai None, ja failu nevar nolasīt"""
+    try:
+        return file_digest(file_path)
+    except OSError:
+        return None
+
+def is_stale(files, file_path, digest):
+    """Vai korpusa anotācija neatbilst failam (fails pēc tam mainīts vai vēl nav korpusā)"""
+    return file_path not in files or files[file_path] != digest
+
+def is_dev(file_path, dev_share=DEV_SHARE):
+    """Stabils sadalījums pēc faila ceļa - papildinot korpusu, dokumenti nepārceļas starp kopām"""
+    return zlib.crc32(file_path.encode("utf-8")) % 1000 < dev_share * 1000
+
+def iter_docs(vocab, corpus_dir=CORPUS_DIR, shards=None, split=None, shuffle=False, seed=None, only=None):
+    """
+    Straumē dokumentus pa vienai šķembai (atmiņā vienlaikus tikai viena šķemba).
+    split: None (visi), "train" vai "dev"; shuffle - šķembu un dokumentu secība šķembā
+    only: tikai šo failu ceļu dokumenti (piem., izvēlētie metadatu nodalījumi)
+    """
+    paths = list(shards) if shards is not None else shard_paths(corpus_dir)
+    files = corpus_files(corpus_dir)
+    rng = random.Random(seed)
+    if shuffle:
+        rng.shuffle(paths)
+
+    for path in paths:
+        docs = list(DocBin().from_disk(path).get_docs(vocab))
+        if shuffle:
+            rng.shuffle(docs)
+        for doc in docs:
+            # Anotācija failam, kura saturs kopš tam mainījies un kas korpusā pievienots no jauna
+            file_path = doc.user_data.get("file_path", "")
+            if file_path in files and files[file_path] != doc.user_data.get("digest"):
+                continue
+            if only is not None and file_path not in only:
+                continue
+            if split is not None and is_dev(file_path, DEV_SHARE) != (split == "dev"):
+                continue
+            yield doc
+
+def make_example(nlp, reference):
+    """Example ar jau saglabāto tokenizāciju - bez atkārtotas tokenizācijas un izlīdzināšanas"""
+    predicted = Doc(nlp.vocab, words=[t.text for t in reference],
+                    spaces=[bool(t.whitespace_) for t in reference])
+    return Example(predicted, reference)
+
+def iter_examples(nlp, corpus_dir=CORPUS_DIR, shards=None, split=None, shuffle=False, seed=None, only=None):
+    for doc in iter_docs(nlp.vocab, corpus_dir, shards, split, shuffle, seed, only):
+        yield make_example(nlp, doc)
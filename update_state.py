@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from metadata_store import iter_records, part_files
+
+# =============================================
+# KONFIGURĀCIJA
+# =============================================
+
+DEFAULT_STATE_PATH = "invoices/update_state.sqlite"
+
+# Faila stāvokļi:
+#   pending - metadati ir, fails gaida apstrādi (vai vēl nav ienācis)
+#   skipped - OCR neizdevās vai neviena vērtība netika atrasta tekstā
+#   labeled - anotācija pievienota korpusam, fails pārvietots uz processed
+#   trained - iekļauts modeļa papildināšanā
+#   processed - fails atrasts processed mapē bez ieraksta (piem., apstrādāts pirms stāvokļa datubāzes)
+STATUSES = ("pending", "skipped", "labeled", "trained", "processed")
+
+# =============================================
+# PAPILDINĀŠANAS STĀVOKLIS
+# =============================================
+
+class UpdateState:
+    """
+    Jauno pavadzīmju apstrādes stāvoklis SQLite datubāzē (metadatu krātuve netiek pārrakstīta).
+    Stāvoklis saglabājas starp restartiem, tāpēc neviens fails netiek apstrādāts divreiz.
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                file_name TEXT PRIMARY KEY,
+                file_type TEXT,
+                metadata TEXT,
+                status TEXT NOT NULL,
+                shard TEXT,
+                error TEXT,
+                updated REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_status ON files(status, updated)")
+        # Jau nolasītās metadatu krātuves daļas ar to izmēru un laiku - pārrakstīta daļa tiek nolasīta vēlreiz
+        self._conn.execute("CREATE TABLE IF NOT EXISTS imported_parts (path TEXT PRIMARY KEY)")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(imported_parts)")]
+        if "signature" not in columns:
+            self._conn.execute("ALTER TABLE imported_parts ADD COLUMN signature TEXT")
+        self._conn.commit()
+
+    def import_metadata(self, store_path):
+        """
+        Pievieno ierakstus no krātuves daļām, kas vēl nav nolasītas (vai kopš tam mainītas).
+        Faili tiek atpazīti pēc nosaukuma, tāpēc jau zināmie ieraksti netiek mainīti. Atgriež pievienoto skaitu
+        """
+        with self._lock:
+            imported = dict(self._conn.execute("SELECT path, signature FROM imported_parts"))
+        parts = {}
+        for path in part_files(store_path):
+            stat = os.stat(path)
+            parts[path] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        new_parts = [path for path, signature in parts.items() if imported.get(path) != signature]
+        if not new_parts:
+            return 0
+
+        now = time.time()
+        added = 0
+        for record in iter_records(store_path, files=new_parts):
+            with self._lock:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO files (file_name, file_type, metadata, status, updated) "
+                    "VALUES (?, ?, ?, 'pending', ?)",
+                    (record["file_path"], record["file_type"], json.dumps(record, ensure_ascii=False, default=str), now)
+                )
+                added += cursor.rowcount
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO imported_parts (path, signature) VALUES (?, ?)",
+                                   [(path, parts[path]) for path in new_parts])
+            self._conn.commit()
+        return added
+
+    def sync_processed_dir(self, processed_dir):
+        """Faili, kas jau atrodas processed mapē, nekad netiek apstrādāti atkārtoti"""
+        if not os.path.isdir(processed_dir):
+            return 0
+        names = os.listdir(processed_dir)
+        now = time.time()
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "UPDATE files SET status = 'processed', updated = ? "
+                "WHERE file_name = ? AND status IN ('pending', 'skipped')",
+                [(now, name) for name in names]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO files (file_name, status, updated) VALUES (?, 'processed', ?)",
+                [(name, now) for name in names]
+            )
+            self._conn.commit()
+            return self._conn.total_changes - before
+
+    def pending(self):
+        """Metadatu rindas, kuru faili vēl nav apstrādāti"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT metadata FROM files WHERE status = 'pending' ORDER BY file_name"
+            ).fetchall()
+        return [json.loads(metadata) for (metadata,) in rows]
+
+    def set_status(self, file_names, status, shard=None, error=None):
+        if status not in STATUSES:
+            raise ValueError(f"Nezināms stāvoklis: {status}")
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE files SET status = ?, shard = COALESCE(?, shard), error = ?, updated = ? "
+                "WHERE file_name = ?",
+                [(status, shard, error, now, name) for name in file_names]
+            )
+            self._conn.commit()
+
+    def labeled(self):
+        """Anotētie, vēl neapmācītie faili: [(file_name, shard, updated)]"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT file_name, shard, updated FROM files WHERE status = 'labeled' ORDER BY updated"
+            ).fetchall()
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM files GROUP BY status"))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()